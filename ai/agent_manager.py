@@ -1,25 +1,55 @@
 import os
 import json
+import time
+import asyncio
 from dotenv import load_dotenv
-from mistralai import Mistral
 
 try:
     # When package is used (python -m ai.agent_manager)
     from .precheck import TicketPrechecker
-    from .queryanalyser import analyse_query
-    from .solutionfinder import solution_finder
+    from .sentiment import SentimentScorer, LOCAL_SENTIMENT_ENABLED, sentiment_agrees
+    from .queryanalyser import analyse_query_async, optimize_query_async
+    from .local_classifier import load_local_classifier, LOCAL_CLASSIFIER_MODE
+    from .solutionfinder import (
+        embed_query_async, retrieve_from_chroma_async, retrieve_with_fallback_async,
+        generate_with_fallback_async, select_hits,
+        build_rag_result, query_differs_async, get_kb_version, get_vector_store, get_lexical_index, SPECULATIVE_FETCH_K
+    )
+    from .fused_responder import fused_answer_async
+    from .faq_index import FAQIndex
+    from .semantic_cache import SemanticCache
     from .deterministic_evaluation import DeterministicEvaluator
-    from .response_composer import compose_response
+    from .response_composer import compose_response_async, compose_response_stream_async, detect_language
+    from . import pipeline_metrics
+    from .llm_concurrency import limit_llm_calls
+    from .deadline import Deadline, current_deadline, budget_allows
+    from .pipeline_dag import Node, Outcome, PipelineDAG
+    from .mistral_client import get_client
 except Exception:
     # When running the file directly (python agent_manager.py) the package context
     # may not be set; fall back to plain imports from the same directory.
     from precheck import TicketPrechecker
-    from queryanalyser import analyse_query
-    from solutionfinder import solution_finder
+    from sentiment import SentimentScorer, LOCAL_SENTIMENT_ENABLED, sentiment_agrees
+    from queryanalyser import analyse_query_async, optimize_query_async
+    from local_classifier import load_local_classifier, LOCAL_CLASSIFIER_MODE
+    from solutionfinder import (
+        embed_query_async, retrieve_from_chroma_async, retrieve_with_fallback_async,
+        generate_with_fallback_async, select_hits,
+        build_rag_result, query_differs_async, get_kb_version, get_vector_store, get_lexical_index, SPECULATIVE_FETCH_K
+    )
+    from fused_responder import fused_answer_async
+    from faq_index import FAQIndex
+    from semantic_cache import SemanticCache
     from deterministic_evaluation import DeterministicEvaluator
-    from response_composer import compose_response
+    from response_composer import compose_response_async, compose_response_stream_async, detect_language
+    import pipeline_metrics
+    from llm_concurrency import limit_llm_calls
+    from deadline import Deadline, current_deadline, budget_allows
+    from pipeline_dag import Node, Outcome, PipelineDAG
+    from mistral_client import get_client
 
 import uuid
+from dataclasses import dataclass
 import structlog
 from tenacity import retry, stop_after_attempt, wait_exponential
 from circuitbreaker import circuit
@@ -48,193 +78,268 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
+# Keep-alive connections opened by warm_up_async (a ticket makes up to ~3 concurrent calls)
+AI_WARM_UP_CONNECTIONS = int(os.getenv("AI_WARM_UP_CONNECTIONS", "4"))
+
+
+@dataclass
+class _TicketRun:
+    """
+    Per-ticket context handed to the pipeline nodes.
+    """
+    trace_id: str
+    on_event: object = None
+    speculative_composition: bool = False
+
 class AgentManager:
     def __init__(self):
         self.api_key = os.getenv("MISTRAL_API_KEY")
         if not self.api_key:
             raise ValueError("MISTRAL_API_KEY not found in .env file")
         
-        self.client = Mistral(api_key=self.api_key)
+        self.client = get_client()
         self.prechecker = TicketPrechecker()
+        # Lexicon sentiment scored with the precheck: clearly angry tickets skip the LLM calls
+        self.sentiment_scorer = SentimentScorer() if LOCAL_SENTIMENT_ENABLED else None
+        # Category / agent_role classifier trained offline on the logged analyses (see local_classifier.py);
+        # None until it has been trained
+        self.local_classifier = load_local_classifier()
+        if LOCAL_CLASSIFIER_MODE not in ("optimize", "skip"):
+            raise ValueError(f"Unknown LOCAL_CLASSIFIER_MODE: {LOCAL_CLASSIFIER_MODE}")
         self.evaluator = DeterministicEvaluator()
         self.model = "mistral-large-latest"
         self.confidence_threshold = 0.6
-        
-        # Mock Knowledge Base
-        self.knowledge_base = [
-            {"id": "kb1", "content": "Pour réinitialiser votre mot de passe, cliquez sur 'Mot de passe oublié' sur la page de connexion."},
-            {"id": "kb2", "content": "Nos délais de livraison standard sont de 3 à 5 jours ouvrables."},
-            {"id": "kb3", "content": "Le support technique est disponible de 9h à 18h, du lundi au vendredi."},
-            {"id": "kb4", "content": "Vous pouvez retourner un article dans les 30 jours suivant l'achat s'il est dans son emballage d'origine."}
-        ]
+        # Start a category-agnostic retrieval on the raw ticket while the analyser runs
+        self.speculative_retrieval = os.getenv("AI_SPECULATIVE_RETRIEVAL", "1") == "1"
+        # Also search the raw ticket, the summary and the keywords next to the optimized query
+        # (embedded in one request, fused by reciprocal rank)
+        self.multi_query_retrieval = os.getenv("AI_MULTI_QUERY_RETRIEVAL", "1") == "1"
+        # Opt-in: compose the final answer while the evaluator runs (thrown away on escalation)
+        self.speculative_composition = os.getenv("AI_SPECULATIVE_COMPOSITION", "0") == "1"
+        # "staged": generate_answer -> evaluate -> compose_response (4 LLM calls with the analyser)
+        # "fused": one JSON completion answers, self-evaluates and composes (2 LLM calls)
+        self.pipeline_mode = os.getenv("AI_PIPELINE_MODE", "staged")
+        if self.pipeline_mode not in ("staged", "fused"):
+            raise ValueError(f"Unknown AI_PIPELINE_MODE: {self.pipeline_mode}")
+        # Private event loop used by the sync entry points, kept alive between calls
+        # so the async Mistral client can reuse its pooled connections.
+        self._loop = None
+
+        # Curated FAQ checked before RAG: near-identical questions get the vetted answer
+        # without generation or evaluation (see faq_index.py)
+        self.faq_enabled = os.getenv("FAQ_ENABLED", "1") == "1"
+        self.faq_index = FAQIndex()
+        # Answers of recent successful tickets, served again to near-duplicates of the same category
+        self.semantic_cache = SemanticCache() if os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1" else None
+
+        self.pipeline = self._build_pipeline()
+
+    def _run_sync(self, coro):
+        """
+        Runs a coroutine to completion on the manager's private event loop.
+        Must not be called from a thread that already runs an event loop.
+        """
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+
+    async def warm_up_async(self, connections: int = AI_WARM_UP_CONNECTIONS) -> dict:
+        """
+        Pays the first-ticket costs ahead of time, on the event loop that will serve the tickets:
+        opens the vector store and the lexical index, runs language detection once, opens `connections` keep-alive
+        connections to the Mistral endpoint (shared by chat and embedding calls) and embeds the
+        FAQ questions. Returns the duration of each step in seconds.
+        """
+        steps = {}
+
+        async def _step(name, awaitable):
+            start = time.perf_counter()
+            await awaitable
+            steps[name] = round(time.perf_counter() - start, 4)
+
+        await _step("vector_store", asyncio.to_thread(lambda: get_vector_store().count()))
+        await _step("lexical_index", asyncio.to_thread(get_lexical_index))
+        await _step("language_detection", asyncio.to_thread(detect_language, "Bonjour, je n'arrive pas à me connecter à mon compte."))
+        await _step("connections", asyncio.gather(*[self.client.models.list_async() for _ in range(connections)]))
+        if self.faq_enabled:
+            await _step("faq_embeddings", self.faq_index.warm_up_async())
+        return steps
+
+    def warm_up(self) -> dict:
+        """
+        Blocking wrapper around warm_up_async, for the sync entry points (private event loop).
+        """
+        return self._run_sync(self.warm_up_async())
 
     def process_ticket(self, ticket_content):
+        """
+        Orchestrate the full ticket processing pipeline (blocking wrapper around process_ticket_async).
+        """
+        return self._run_sync(self.process_ticket_async(ticket_content))
+
+    async def process_ticket_async(self, ticket_content, on_event=None, deadline: Deadline | None = None):
         """
         Orchestrate the full ticket processing pipeline.
+        Every LLM, embedding and vector-search call is awaited, so a single event loop
+        can keep many tickets in flight without holding one thread per ticket.
+        The result carries a "timings" entry with the per-stage latency breakdown
+        (see pipeline_metrics.StageTimings).
+
+        `on_event`, if given, is an async callable `on_event(event, payload)` receiving
+        progress events ("precheck", "analysed", "retrieved", "evaluated") and then one
+        "token" event per chunk of the final response as the composer streams it.
+
+        `deadline`, if given, bounds the whole pipeline: optional stages (category
+        fallback, LLM composer) are skipped when their budget is short, and when it
+        expires a best-effort result is returned (see _deadline_result).
         """
-        trace_id = str(uuid.uuid4())
+        timings = pipeline_metrics.StageTimings()
+        token = pipeline_metrics.current_timings.set(timings)
+        deadline_token = current_deadline.set(deadline)
         try:
-            logger.info("Starting ticket processing", trace_id=trace_id, ticket_content=ticket_content[:100])
-            print("\n" + "="*50)
-            print("DÉBUT DU TRAITEMENT DU TICKET")
-            print("="*50)
+            result = await self._process_ticket_async(ticket_content, on_event, deadline)
+        finally:
+            current_deadline.reset(deadline_token)
+            pipeline_metrics.current_timings.reset(token)
+        result["timings"] = timings.as_dict()
+        return result
 
-            # Step 1: Precheck
-            print("\n[Étape 1] Pré-vérification...")
-            precheck_results = self.prechecker.run_precheck(ticket_content)
-            logger.info("Precheck completed", trace_id=trace_id, passed=precheck_results["passed"], reason=precheck_results.get("reason"))
-            
-            if not precheck_results["passed"]:
-                print(f"❌ Échec de la pré-vérification : {', '.join(precheck_results['reason'])}")
-                return {
-                    "status": "rejected",
-                    "reason": precheck_results["reason"],
-                    "details": precheck_results
-                }
-            
-            print("✅ Pré-vérification réussie.")
-
-            # Step 1.1: Immediate Sensitive Data Check (Regex) - BEFORE any LLM call
-            if self.evaluator._detect_sensitive_data(ticket_content):
-                print(f"🚨 Données sensibles détectées dans la requête ! Escalade immédiate vers un agent humain...")
-                escalation_msg = "Votre demande contient des informations sensibles (comme un numéro de carte ou des données personnelles). Pour votre sécurité, nous avons transmis votre dossier directement à un agent humain qui vous répondra par email sécurisé."
-                print("\n" + "-"*30)
-                print("RÉPONSE FINALE :")
-                print(escalation_msg)
-                print("-"*30)
-                return {
-                    "status": "escalated",
-                    "reason": "Sensitive data detected in query (Regex)",
-                    "final_response": escalation_msg,
-                    "precheck": precheck_results,
-                    "evaluation": {
-                        "confidence_score": 0.0,
-                        "sensitive_data": True,
-                        "sentiment": "neutral",
-                        "reason": "Sensitive data detected in query (Regex)"
-                    }
-                }
+    def process_tickets(self, batch, max_concurrency=8):
+        """
+        Processes many tickets concurrently (blocking wrapper around process_tickets_async).
+        """
+        return self._run_sync(self.process_tickets_async(batch, max_concurrency=max_concurrency))
 
-            # Use raw content for the AI agent (Masking moved to evaluation)
-            content_to_process = ticket_content
-            
-            # Step 2: Query Analyser (LLM CALL)
-            print("\n[Étape 2] Analyse de la requête...")
-            analysis = analyse_query(content_to_process)
-            logger.info("Query analysis completed", trace_id=trace_id, summary=analysis.get("summary"), category=analysis.get("category"))
-            print(f"📝 Résumé : {analysis.get('summary')}")
-            print(f"Catégorie : {analysis.get('category')}")
-            print(f"🔑 Mots-clés : {', '.join(analysis.get('keywords', []))}")
-            
-            # Check if the query is in scope for the company
-            if not analysis.get("is_in_scope", True):
-                print("🚫 Requête hors sujet (Hors périmètre Doxa).")
-                out_of_scope_msg = "Désolé, je ne peux répondre qu'aux questions liées à Doxa et à nos services techniques. Votre demande semble être hors sujet."
-                print("\n" + "-"*30)
-                print("RÉPONSE FINALE :")
-                print(out_of_scope_msg)
-                print("-"*30)
-                return {
-                    "status": "rejected",
-                    "reason": "Out of scope",
-                    "final_response": out_of_scope_msg,
-                    "analysis": analysis,
-                    "precheck": precheck_results
-                }
+    async def process_tickets_async(self, batch, max_concurrency=8):
+        """
+        Processes a batch of tickets concurrently, with at most `max_concurrency` Mistral
+        calls in flight across the whole batch.
+        Results are returned in input order; a ticket that raises gets an
+        {"status": "error", "reason": ...} result without affecting the others.
+        """
+        with limit_llm_calls(max_concurrency):
+            results = await asyncio.gather(
+                *(self.process_ticket_async(ticket_content) for ticket_content in batch),
+                return_exceptions=True
+            )
 
-            # Optimization logic
-            query_for_rag = content_to_process
+        for i, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.error("Batch ticket failed", index=i, error=str(result))
+                results[i] = {"status": "error", "reason": f"Processing error: {result}"}
+        return results
 
-            if not analysis.get("is_sufficient", True):
-                print("⚠️ Requête jugée trop courte ou vague. Optimisation en cours...")
-                query_for_rag = analysis.get("optimized_query", content_to_process)
-                print(f"🔍 Requête optimisée : {query_for_rag}")
-            else:
-                # Even if sufficient, we can use the optimized version if it exists for better synonyms
-                query_for_rag = analysis.get("optimized_query", content_to_process)
+    @staticmethod
+    async def _emit(on_event, event, payload):
+        """
+        Sends a progress event to the caller; a failing listener never breaks the pipeline.
+        """
+        if on_event is None:
+            return
+        try:
+            await on_event(event, payload)
+        except Exception as e:
+            logger.warning("Progress event listener failed", event=event, error=str(e))
 
-            # Step 3: Solution Finder (LLM CALL - RAG)
-            print("\n[Étape 3] Recherche de solution (RAG)...")
-            rag_result = solution_finder(query_for_rag, category=analysis.get("category"))
-            logger.info("Solution finder completed", trace_id=trace_id, fallback_used=rag_result.get("fallback_used"), used_docs=len(rag_result["used_documents"]))
-            
-            if rag_result.get("fallback_used"):
-                print("ℹ️ Note : La recherche a été étendue à d'autres catégories car aucun document pertinent n'a été trouvé dans la catégorie initiale.")
+    def _build_pipeline(self) -> PipelineDAG:
+        """
+        Declares the pipeline stages as DAG nodes. A node runs as soon as its inputs are
+        available, so overlaps are expressed through the inputs: the speculative retrieval
+        only needs the ticket and runs next to the FAQ lookup and the analyser; the analyser
+        waits for a FAQ miss, so a FAQ hit costs no LLM call. A FAQ or semantic cache hit
+        answers the ticket and cancels the rest. With speculative composition
+        the composer does not wait for the evaluation.
+        Terminal nodes (rejection, escalation, response) return an Outcome that stops the run.
+        """
+        nodes = [
+            Node("precheck", self._node_precheck,
+                 inputs=("ticket", "run"), outputs=("precheck",)),
+            Node("sensitive_data", self._node_sensitive_data,
+                 inputs=("ticket", "precheck"), outputs=("content",)),
+            Node("ticket_embedding", self._node_ticket_embedding,
+                 inputs=("content", "run"), outputs=("ticket_embedding",),
+                 when=lambda content, run: self.faq_enabled or self.semantic_cache is not None),
+            Node("faq", self._node_faq,
+                 inputs=("content", "ticket_embedding", "precheck", "run"), outputs=("faq_miss",),
+                 when=lambda ticket_embedding, **_: self.faq_enabled and ticket_embedding is not None),
+            Node("speculative_retrieval", self._node_speculative_retrieval,
+                 inputs=("content", "run"), outputs=("speculative_hits",),
+                 when=lambda content, run: self.speculative_retrieval),
+            Node("analysis", self._node_analysis,
+                 inputs=("content", "precheck", "faq_miss", "run"), outputs=("analysis",)),
+            Node("semantic_cache", self._node_semantic_cache,
+                 inputs=("analysis", "ticket_embedding", "precheck", "run"),
+                 when=lambda ticket_embedding, **_: self.semantic_cache is not None and ticket_embedding is not None),
+            Node("retrieval", self._node_retrieval,
+                 inputs=("content", "analysis", "speculative_hits", "run"),
+                 outputs=("query_for_rag", "prefetched", "retrieved", "retrieved_global")),
+        ]
 
-            proposed_answer = rag_result["answer"]
-            print(f"💡 Solution proposée : {proposed_answer[:100]}...")
-            
-            # Get context used for evaluation
-            context_used = "\n".join([doc["content"] for doc in rag_result["used_documents"]])
-            # Get the best retrieval score (similarity)
-            best_retrieval_score = rag_result["used_documents"][0].get("score", 0.5) if rag_result["used_documents"] else 0.0
-
-            # Step 4: Deterministic Evaluation (Hugging Face model)
-            print("\n[Étape 4] Évaluation de la confiance...")
-            evaluation = self.evaluator.evaluate(
-                query=query_for_rag,
-                context=context_used,
-                response=proposed_answer,
-                retrieval_score=best_retrieval_score
-            )
-            logger.info("Evaluation completed", trace_id=trace_id, confidence_score=evaluation["confidence_score"], sensitive_data=evaluation.get("sensitive_data"))
-            print(f"📊 Score de confiance global : {evaluation['confidence_score']}")
-            print(f"   - Données sensibles détectées : {evaluation.get('sensitive_data', False)}")
-            print(f"   - Raison de l'évaluation : {evaluation.get('reason', 'N/A')}")
-            print(f"   - Sentiment détecté : {evaluation.get('sentiment', 'neutral')}")
-            print(f"   - Non standard : {evaluation.get('non_standard', False)}")
-            
-            # Step 5 & 5.1: Logic based on confidence and safety
-            # Escalation triggers: 
-            # 1. Sensitive data detected (100% escalation)
-            # 2. Confidence score < 0.6
-            # 3. LLM refused to answer (no info found)
-            # 4. User is angry
-            
-            should_escalate = (
-                evaluation.get("sensitive_data", False) or 
-                evaluation["confidence_score"] < self.confidence_threshold or
-                evaluation.get("is_refusal", False) or
-                evaluation.get("sentiment") == "angry"
+        if self.pipeline_mode == "fused":
+            nodes.append(
+                Node("fused_answer", self._node_fused_answer,
+                     inputs=("content", "query_for_rag", "analysis", "retrieved", "retrieved_global", "prefetched", "run"),
+                     outputs=("rag_result", "evaluation", "final_response_data"))
             )
+        else:
+            if self.speculative_composition:
+                # Most tickets are not escalated: compose while the evaluator runs
+                composition = Node("composition", self._node_composition,
+                                   inputs=("content", "rag_result", "run"), outputs=("final_response_data",))
+            else:
+                composition = Node("composition", self._node_composition,
+                                   inputs=("content", "rag_result", "run", "evaluation", "escalation_reason"),
+                                   outputs=("final_response_data",),
+                                   when=lambda escalation_reason, **_: escalation_reason is None)
+            nodes += [
+                Node("generation", self._node_generation,
+                     inputs=("query_for_rag", "analysis", "precheck", "retrieved", "retrieved_global", "prefetched", "run"),
+                     outputs=("rag_result",)),
+                Node("evaluation", self._node_evaluation,
+                     inputs=("query_for_rag", "rag_result", "run"), outputs=("evaluation",)),
+                composition,
+            ]
 
-            if not should_escalate:
-                print(f"✅ Confiance élevée et sécurité validée. Composition de la réponse finale...")
-                # Step 5: Response Composer (LLM)
-                final_response_data = compose_response(content_to_process, proposed_answer, evaluation)
-                
-                print("\n" + "-"*30)
-                print("RÉPONSE FINALE :")
-                print(final_response_data["final_response"])
-                print("-"*30)
-
-                return {
-                    "status": "success",
-                    "final_response": final_response_data["final_response"],
-                    "confidence": evaluation["confidence_score"],
-                    "analysis": analysis,
-                    "precheck": precheck_results,
-                    "proposed_answer": proposed_answer
-                }
+        nodes += [
+            Node("decision", self._node_decision,
+                 inputs=("evaluation", "run"), outputs=("escalation_reason",)),
+            Node("orientation", self._node_orientation,
+                 inputs=("analysis", "precheck", "rag_result", "evaluation", "escalation_reason"),
+                 when=lambda escalation_reason, **_: escalation_reason is not None),
+            Node("response", self._node_response,
+                 inputs=("analysis", "precheck", "rag_result", "evaluation", "final_response_data", "escalation_reason"),
+                 when=lambda escalation_reason, **_: escalation_reason is None),
+        ]
+        return PipelineDAG(nodes, initial_inputs=("ticket", "run"))
+
+    async def _process_ticket_async(self, ticket_content, on_event=None, deadline=None):
+        run = _TicketRun(trace_id=str(uuid.uuid4()), on_event=on_event)
+        try:
+            logger.info("Starting ticket processing", trace_id=run.trace_id, ticket_content=ticket_content[:100])
+            print("\n" + "="*50)
+            print("DÉBUT DU TRAITEMENT DU TICKET")
+            print("="*50)
+
+            dag_run = await self.pipeline.run(
+                {"ticket": ticket_content, "run": run},
+                timeout=deadline.remaining() if deadline is not None else None
+            )
+            if dag_run.timed_out:
+                result = self._deadline_result(dag_run, ticket_content, run)
+            elif dag_run.outcome is None:
+                raise RuntimeError("Pipeline finished without an outcome")
             else:
-                # Step 5.1: Orient to specialist human agent (NO LLM)
-                if evaluation.get("sensitive_data", False):
-                    print(f"🚨 Données sensibles détectées ! Escalade immédiate vers un agent humain...")
-                    reason = "Sensitive data detected (PII)"
-                elif evaluation.get("sentiment") == "angry":
-                    print(f"🚨 Utilisateur en colère ! Escalade immédiate vers un agent humain...")
-                    reason = "User is angry"
-                elif evaluation.get("is_refusal"):
-                    print(f"⚠️ L'IA n'a pas trouvé de réponse dans les documents. Orientation vers un agent humain...")
-                    reason = "No information found in KB"
+                result = dag_run.outcome.result
+                self._cache_result(result, dag_run.values)
+
+            if run.speculative_composition:
+                if result["status"] == "success" and not dag_run.timed_out:
+                    pipeline_metrics.increment("speculative_composition_used")
                 else:
-                    print(f"⚠️ Confiance faible ({evaluation['confidence_score']}). Orientation vers un agent humain...")
-                    reason = f"Low confidence score ({evaluation['confidence_score']})"
-                
-                result = self.orient_to_human(analysis, precheck_results)
-                result["reason"] = reason
-                print(f"👨‍💼 Orienté vers : {result['orientation']['target_department']}")
-                return result
+                    pipeline_metrics.increment("speculative_composition_wasted")
+                    logger.info("Speculative composition wasted", trace_id=run.trace_id,
+                                waste_rate=pipeline_metrics.ratio("speculative_composition_wasted", "speculative_composition_started"))
+            return result
 
         except Exception as e:
             print(f"❌ Erreur critique lors du traitement : {e}")
@@ -242,6 +347,461 @@ class AgentManager:
             error_analysis = {"summary": "Error during processing", "agent_role": "agt_tech"}
             return self.orient_to_human(error_analysis, {"passed": True, "masked_content": ticket_content})
 
+    def _cache_result(self, result, values):
+        """
+        Stores a fully processed successful answer in the semantic cache.
+        """
+        embedding = values.get("ticket_embedding")
+        if (self.semantic_cache is None or embedding is None or result.get("status") != "success"
+                or result.get("faq_id") or result.get("cache_hit")):
+            return
+        self.semantic_cache.put(
+            embedding,
+            result["analysis"].get("category"),
+            {key: result.get(key) for key in ("final_response", "confidence", "proposed_answer")},
+            get_kb_version()
+        )
+
+    def _deadline_result(self, dag_run, ticket_content, run):
+        """
+        Best-effort result when the deadline expires mid-pipeline: the proposed answer
+        if it was already evaluated as safe to send, otherwise an escalation.
+        """
+        values = dag_run.values
+        pipeline_metrics.increment("deadline_exceeded")
+        logger.warning("Ticket deadline exceeded", trace_id=run.trace_id, cancelled=dag_run.cancelled)
+        print(f"⏱️ Délai dépassé pendant : {', '.join(dag_run.cancelled) or 'N/A'}")
+
+        analysis = values.get("analysis") or {"summary": "Deadline exceeded during processing", "agent_role": "agt_tech"}
+        precheck = values.get("precheck") or {"passed": True, "masked_content": ticket_content}
+        rag_result = values.get("rag_result")
+        evaluation = values.get("evaluation")
+
+        if rag_result is not None and evaluation is not None and values.get("escalation_reason", "") is None:
+            print("⚠️ Réponse proposée envoyée sans composition finale.")
+            return {
+                "status": "success",
+                "final_response": rag_result["answer"],
+                "confidence": evaluation["confidence_score"],
+                "analysis": analysis,
+                "precheck": precheck,
+                "proposed_answer": rag_result["answer"],
+                "deadline_exceeded": True
+            }
+
+        result = self.orient_to_human(analysis, precheck)
+        result["reason"] = f"Deadline exceeded ({', '.join(dag_run.cancelled) or 'pipeline'})"
+        result["deadline_exceeded"] = True
+        return result
+
+    # -----------------------------
+    # Pipeline nodes
+    # -----------------------------
+    async def _node_precheck(self, ticket, run):
+        # Step 1: Precheck
+        print("\n[Étape 1] Pré-vérification...")
+        # langdetect is CPU-bound: keep it off the event loop
+        precheck_results = await asyncio.to_thread(self.prechecker.run_precheck, ticket)
+        if self.sentiment_scorer is not None:
+            precheck_results["sentiment"] = self.sentiment_scorer.score(ticket)
+        logger.info("Precheck completed", trace_id=run.trace_id, passed=precheck_results["passed"], reason=precheck_results.get("reason"))
+        await self._emit(run.on_event, "precheck", {"passed": precheck_results["passed"], "reason": precheck_results["reason"]})
+
+        if not precheck_results["passed"]:
+            print(f"❌ Échec de la pré-vérification : {', '.join(precheck_results['reason'])}")
+            return Outcome({
+                "status": "rejected",
+                "reason": precheck_results["reason"],
+                "details": precheck_results
+            })
+
+        print("✅ Pré-vérification réussie.")
+        return {"precheck": precheck_results}
+
+    async def _node_sensitive_data(self, ticket, precheck):
+        # Step 1.1: Immediate Sensitive Data Check (Regex) - BEFORE any LLM call
+        if self.evaluator._detect_sensitive_data(ticket):
+            print(f"🚨 Données sensibles détectées dans la requête ! Escalade immédiate vers un agent humain...")
+            escalation_msg = "Votre demande contient des informations sensibles (comme un numéro de carte ou des données personnelles). Pour votre sécurité, nous avons transmis votre dossier directement à un agent humain qui vous répondra par email sécurisé."
+            print("\n" + "-"*30)
+            print("RÉPONSE FINALE :")
+            print(escalation_msg)
+            print("-"*30)
+            return Outcome({
+                "status": "escalated",
+                "reason": "Sensitive data detected in query (Regex)",
+                "final_response": escalation_msg,
+                "precheck": precheck,
+                "evaluation": {
+                    "confidence_score": 0.0,
+                    "sensitive_data": True,
+                    "sentiment": "neutral",
+                    "reason": "Sensitive data detected in query (Regex)"
+                }
+            })
+
+        # Step 1.1b: Clearly angry ticket (local sentiment) - BEFORE any LLM call
+        sentiment = precheck.get("sentiment")
+        if sentiment is not None and self.sentiment_scorer.should_escalate(sentiment):
+            print(f"🚨 Utilisateur en colère (score local {sentiment['score']}) ! Escalade immédiate vers un agent humain...")
+            pipeline_metrics.increment("local_sentiment_escalations")
+            analysis = {"summary": "Angry customer detected before analysis", "keywords": [], "agent_role": "agt_tech", "source": "local"}
+            prediction = self.local_classifier.predict(ticket) if self.local_classifier is not None else None
+            if prediction is not None and self.local_classifier.is_confident(prediction):
+                analysis.update(category=prediction["category"], agent_role=prediction["agent_role"])
+            result = self.orient_to_human(analysis, precheck)
+            result["reason"] = "User is angry (local sentiment)"
+            print(f"👨‍💼 Orienté vers : {result['orientation']['target_department']}")
+            return Outcome(result)
+
+        # Use raw content for the AI agent (Masking moved to evaluation)
+        return {"content": ticket}
+
+    async def _node_ticket_embedding(self, content, run):
+        # Embedding of the raw ticket, shared by the FAQ lookup and the semantic cache
+        try:
+            return {"ticket_embedding": await embed_query_async(content)}
+        except Exception as e:
+            logger.warning("Ticket embedding failed", trace_id=run.trace_id, error=str(e))
+            return {"ticket_embedding": None}
+
+    async def _node_faq(self, content, ticket_embedding, precheck, run):
+        # Step 1.2: FAQ fast path (NO LLM)
+        try:
+            match = await self.faq_index.match_async(ticket_embedding)
+        except Exception as e:
+            logger.warning("FAQ lookup failed", trace_id=run.trace_id, error=str(e))
+            return {"faq_miss": True}
+        logger.info("FAQ lookup completed", trace_id=run.trace_id, hit=match is not None,
+                    hit_rate=pipeline_metrics.ratio("faq_hits", "faq_lookups"))
+        if match is None:
+            return {"faq_miss": True}
+
+        entry, similarity = match
+        answer = self.faq_index.answer_for(entry, content)
+        print(f"⚡ Question fréquente reconnue ({entry['id']}, similarité {similarity:.2f}). Réponse validée envoyée.")
+        print("\n" + "-"*30)
+        print("RÉPONSE FINALE :")
+        print(answer)
+        print("-"*30)
+        return Outcome({
+            "status": "success",
+            "final_response": answer,
+            "confidence": round(similarity, 2),
+            "analysis": {
+                "summary": entry["question"],
+                "category": entry.get("category"),
+                "keywords": [],
+                "agent_role": entry.get("agent_role", "agt_tech"),
+                "is_in_scope": True,
+                "source": "faq"
+            },
+            "precheck": precheck,
+            "proposed_answer": answer,
+            "faq_id": entry["id"]
+        })
+
+    async def _node_semantic_cache(self, analysis, ticket_embedding, precheck, run):
+        # Step 2.1: a near-duplicate of a recently answered ticket of the same category (NO LLM)
+        hit = self.semantic_cache.get(ticket_embedding, analysis.get("category"), get_kb_version())
+        logger.info("Semantic cache lookup completed", trace_id=run.trace_id, hit=hit is not None,
+                    hit_rate=pipeline_metrics.ratio("semantic_cache_hits", "semantic_cache_lookups"))
+        if hit is None:
+            return {}
+
+        cached, similarity = hit
+        print(f"⚡ Ticket similaire déjà traité (similarité {similarity:.2f}). Réponse en cache envoyée.")
+        print("\n" + "-"*30)
+        print("RÉPONSE FINALE :")
+        print(cached["final_response"])
+        print("-"*30)
+        return Outcome({
+            "status": "success",
+            "final_response": cached["final_response"],
+            "confidence": cached["confidence"],
+            "analysis": analysis,
+            "precheck": precheck,
+            "proposed_answer": cached["proposed_answer"],
+            "cache_hit": True
+        })
+
+    async def _node_speculative_retrieval(self, content, run):
+        # The raw ticket is searched (all categories, over-fetched) while the analyser runs,
+        # so retrieval is usually done by the time the analysis comes back.
+        try:
+            hits = await retrieve_from_chroma_async(content, category=None, k=SPECULATIVE_FETCH_K)
+        except Exception as e:
+            logger.warning("Speculative retrieval failed", trace_id=run.trace_id, error=str(e))
+            return {"speculative_hits": None}
+        return {"speculative_hits": hits}
+
+    async def _node_analysis(self, content, precheck, faq_miss, run):
+        # Step 2: Query Analyser (LLM CALL)
+        print("\n[Étape 2] Analyse de la requête...")
+        prediction = self.local_classifier.predict(content) if self.local_classifier is not None else None
+        if prediction is not None:
+            pipeline_metrics.increment("local_classifier_lookups")
+        if prediction is not None and self.local_classifier.is_confident(prediction):
+            # Routed locally: no analyser call, or only the short query-optimization prompt
+            pipeline_metrics.increment("local_classifier_hits")
+            print(f"⚡ Catégorie prédite localement (confiance {prediction['confidence']:.2f}).")
+            analysis = await self._local_analysis(content, prediction)
+        else:
+            analysis = await analyse_query_async(content)
+        logger.info("Query analysis completed", trace_id=run.trace_id, summary=analysis.get("summary"), category=analysis.get("category"), source=analysis.get("source", "llm"))
+        await self._emit(run.on_event, "analysed", {
+            "summary": analysis.get("summary"),
+            "category": analysis.get("category"),
+            "keywords": analysis.get("keywords", [])
+        })
+        print(f"📝 Résumé : {analysis.get('summary')}")
+        print(f"Catégorie : {analysis.get('category')}")
+        print(f"🔑 Mots-clés : {', '.join(analysis.get('keywords', []))}")
+
+        # Check if the query is in scope for the company
+        if not analysis.get("is_in_scope", True):
+            print("🚫 Requête hors sujet (Hors périmètre Doxa).")
+            out_of_scope_msg = "Désolé, je ne peux répondre qu'aux questions liées à Doxa et à nos services techniques. Votre demande semble être hors sujet."
+            print("\n" + "-"*30)
+            print("RÉPONSE FINALE :")
+            print(out_of_scope_msg)
+            print("-"*30)
+            return Outcome({
+                "status": "rejected",
+                "reason": "Out of scope",
+                "final_response": out_of_scope_msg,
+                "analysis": analysis,
+                "precheck": precheck
+            })
+        return {"analysis": analysis}
+
+    @staticmethod
+    async def _local_analysis(content, prediction):
+        local = {
+            "category": prediction["category"],
+            "agent_role": prediction["agent_role"],
+            "confidence": prediction["confidence"],
+            "source": "local"
+        }
+        if LOCAL_CLASSIFIER_MODE == "skip":
+            return {
+                "summary": content[:200],
+                "keywords": prediction["keywords"],
+                "is_sufficient": True,
+                "is_in_scope": True,
+                "optimized_query": content,
+                **local
+            }
+        analysis = await optimize_query_async(content)
+        analysis.update(local)
+        return analysis
+
+    async def _node_retrieval(self, content, analysis, speculative_hits, run):
+        # Optimization logic
+        query_for_rag = content
+
+        if not analysis.get("is_sufficient", True):
+            print("⚠️ Requête jugée trop courte ou vague. Optimisation en cours...")
+            query_for_rag = analysis.get("optimized_query", content)
+            print(f"🔍 Requête optimisée : {query_for_rag}")
+        else:
+            # Even if sufficient, we can use the optimized version if it exists for better synonyms
+            query_for_rag = analysis.get("optimized_query", content)
+
+        # Reuse the speculative hits unless the optimized query means something else than the raw ticket
+        prefetched = None
+        if speculative_hits is not None:
+            pipeline_metrics.increment("speculative_retrieval_checks")
+            if not await query_differs_async(content, query_for_rag):
+                prefetched = speculative_hits
+                pipeline_metrics.increment("speculative_retrieval_used")
+
+        variants = None
+        if self.multi_query_retrieval:
+            variants = [content, analysis.get("summary"), " ".join(analysis.get("keywords") or [])]
+
+        # Step 3: Solution Finder (RAG) - category and global searches together, before generating
+        print("\n[Étape 3] Recherche de solution (RAG)...")
+        retrieved, retrieved_global = await retrieve_with_fallback_async(
+            query_for_rag, category=analysis.get("category"), prefetched=prefetched,
+            keywords=analysis.get("keywords"), variants=variants
+        )
+        return {"query_for_rag": query_for_rag, "prefetched": prefetched,
+                "retrieved": retrieved, "retrieved_global": retrieved_global}
+
+    async def _emit_retrieved(self, run, rag_result, speculative_hit):
+        logger.info("Solution finder completed", trace_id=run.trace_id, fallback_used=rag_result.get("fallback_used"), used_docs=len(rag_result["used_documents"]), speculative_hit=speculative_hit, pipeline_mode=self.pipeline_mode)
+        await self._emit(run.on_event, "retrieved", {
+            "documents": len(rag_result["used_documents"]),
+            "best_score": max((doc["score"] for doc in rag_result["used_documents"]), default=0.0),
+            "fallback_used": rag_result.get("fallback_used", False)
+        })
+
+        if rag_result.get("fallback_used"):
+            print("ℹ️ Note : La recherche a été étendue à d'autres catégories car aucun document pertinent n'a été trouvé dans la catégorie initiale.")
+        print(f"💡 Solution proposée : {rag_result['answer'][:100]}...")
+
+    async def _node_generation(self, query_for_rag, analysis, precheck, retrieved, retrieved_global, prefetched, run):
+        # Step 3 (LLM CALL - RAG): a single generation, on the hits chosen from both searches
+        rag_result = await generate_with_fallback_async(query_for_rag, analysis.get("category"), retrieved, retrieved_global)
+        await self._emit_retrieved(run, rag_result, prefetched is not None)
+
+        if rag_result["refusal"]:
+            # No answer in the chosen documents: escalate without evaluating or generating again
+            print(f"⚠️ L'IA n'a pas trouvé de réponse dans les documents. Orientation vers un agent humain...")
+            pipeline_metrics.increment("refusal_escalations")
+            result = self.orient_to_human(analysis, precheck)
+            result["reason"] = "No information found in KB"
+            result["analysis"] = analysis
+            result["rag_result"] = rag_result
+            print(f"👨‍💼 Orienté vers : {result['orientation']['target_department']}")
+            return Outcome(result)
+        return {"rag_result": rag_result}
+
+    @staticmethod
+    def _evaluation_inputs(rag_result):
+        # Context used for evaluation and the best retrieval score (similarity)
+        context_used = "\n".join([doc["content"] for doc in rag_result["used_documents"]])
+        best_retrieval_score = max((doc.get("score", 0.5) for doc in rag_result["used_documents"]), default=0.0)
+        return context_used, best_retrieval_score
+
+    async def _node_fused_answer(self, content, query_for_rag, analysis, retrieved, retrieved_global, prefetched, run):
+        # Steps 3-5 fused: a single completion that answers, self-evaluates and composes the final response
+        print("🧩 Réponse fusionnée (un seul appel LLM)...")
+        hits, fallback_used = select_hits(retrieved, retrieved_global, analysis.get("category"))
+        fused = await fused_answer_async(content, hits)
+        rag_result = build_rag_result(query_for_rag, hits, fused["answer"], fallback_used)
+        await self._emit_retrieved(run, rag_result, prefetched is not None)
+
+        # Step 4: the fused self-evaluation goes through the evaluator's rules (no extra LLM call)
+        print("\n[Étape 4] Évaluation de la confiance (auto-évaluation fusionnée)...")
+        context_used, best_retrieval_score = self._evaluation_inputs(rag_result)
+        evaluation = self.evaluator.assess(
+            fused,
+            query=query_for_rag,
+            context=context_used,
+            response=fused["final_response"],
+            retrieval_score=best_retrieval_score
+        )
+        return {
+            "rag_result": rag_result,
+            "evaluation": evaluation,
+            "final_response_data": {"final_response": fused["final_response"], "escalated": False}
+        }
+
+    async def _node_evaluation(self, query_for_rag, rag_result, run):
+        # Step 4: Deterministic Evaluation
+        print("\n[Étape 4] Évaluation de la confiance...")
+        context_used, best_retrieval_score = self._evaluation_inputs(rag_result)
+        evaluation = await self.evaluator.evaluate_async(
+            query=query_for_rag,
+            context=context_used,
+            response=rag_result["answer"],
+            retrieval_score=best_retrieval_score
+        )
+        return {"evaluation": evaluation}
+
+    async def _node_decision(self, evaluation, run):
+        logger.info("Evaluation completed", trace_id=run.trace_id, confidence_score=evaluation["confidence_score"], sensitive_data=evaluation.get("sensitive_data"))
+        print(f"📊 Score de confiance global : {evaluation['confidence_score']}")
+        print(f"   - Données sensibles détectées : {evaluation.get('sensitive_data', False)}")
+        print(f"   - Raison de l'évaluation : {evaluation.get('reason', 'N/A')}")
+        print(f"   - Sentiment détecté : {evaluation.get('sentiment', 'neutral')}")
+        print(f"   - Non standard : {evaluation.get('non_standard', False)}")
+
+        # Step 5 & 5.1: Logic based on confidence and safety
+        # Escalation triggers:
+        # 1. Sensitive data detected (100% escalation)
+        # 2. Confidence score < 0.6
+        # 3. LLM refused to answer (no info found)
+        # 4. User is angry
+        if evaluation.get("sensitive_data", False):
+            print(f"🚨 Données sensibles détectées ! Escalade immédiate vers un agent humain...")
+            reason = "Sensitive data detected (PII)"
+        elif evaluation.get("sentiment") == "angry":
+            print(f"🚨 Utilisateur en colère ! Escalade immédiate vers un agent humain...")
+            reason = "User is angry"
+        elif evaluation.get("is_refusal", False):
+            print(f"⚠️ L'IA n'a pas trouvé de réponse dans les documents. Orientation vers un agent humain...")
+            reason = "No information found in KB"
+        elif evaluation["confidence_score"] < self.confidence_threshold:
+            print(f"⚠️ Confiance faible ({evaluation['confidence_score']}). Orientation vers un agent humain...")
+            reason = f"Low confidence score ({evaluation['confidence_score']})"
+        else:
+            print(f"✅ Confiance élevée et sécurité validée. Composition de la réponse finale...")
+            reason = None
+
+        await self._emit(run.on_event, "evaluated", {
+            "confidence_score": evaluation["confidence_score"],
+            "sentiment": evaluation.get("sentiment", "neutral"),
+            "escalate": reason is not None
+        })
+        return {"escalation_reason": reason}
+
+    async def _node_composition(self, content, rag_result, run, evaluation=None, escalation_reason=None):
+        # Step 5: Response Composer (LLM)
+        proposed_answer = rag_result["answer"]
+        if not budget_allows("composition"):
+            # Not enough time left for the composer: send the proposed answer as is
+            print("⏱️ Budget insuffisant : composition finale ignorée.")
+            pipeline_metrics.increment("composition_skipped_deadline")
+            final_response_data = {"final_response": proposed_answer, "escalated": False}
+        elif self.speculative_composition:
+            run.speculative_composition = True
+            pipeline_metrics.increment("speculative_composition_started")
+            final_response_data = await compose_response_async(content, proposed_answer, {"escalate": False})
+        elif run.on_event is not None:
+            # Stream the composer's tokens to the listener as they arrive
+            parts = []
+            async for delta in compose_response_stream_async(content, proposed_answer):
+                parts.append(delta)
+                await self._emit(run.on_event, "token", {"text": delta})
+            final_response_data = {"final_response": "".join(parts), "escalated": False}
+        else:
+            final_response_data = await compose_response_async(content, proposed_answer, evaluation)
+        return {"final_response_data": final_response_data}
+
+    @staticmethod
+    def _sentiment_agreement(precheck, evaluation):
+        """
+        Compares the local sentiment with the LLM evaluator's label (tracked to calibrate the local scorer).
+        """
+        agreement = sentiment_agrees((precheck.get("sentiment") or {}).get("label"), evaluation.get("sentiment"))
+        if agreement is not None:
+            pipeline_metrics.increment("sentiment_comparisons")
+            if agreement:
+                pipeline_metrics.increment("sentiment_agreements")
+        return agreement
+
+    async def _node_orientation(self, analysis, precheck, rag_result, evaluation, escalation_reason):
+        # Step 5.1: Orient to specialist human agent (NO LLM)
+        result = self.orient_to_human(analysis, precheck)
+        result["reason"] = escalation_reason
+        result["analysis"] = analysis
+        result["rag_result"] = rag_result
+        result["evaluation"] = evaluation
+        result["sentiment_agreement"] = self._sentiment_agreement(precheck, evaluation)
+        print(f"👨‍💼 Orienté vers : {result['orientation']['target_department']}")
+        return Outcome(result)
+
+    async def _node_response(self, analysis, precheck, rag_result, evaluation, final_response_data, escalation_reason):
+        print("\n" + "-"*30)
+        print("RÉPONSE FINALE :")
+        print(final_response_data["final_response"])
+        print("-"*30)
+
+        return Outcome({
+            "status": "success",
+            "final_response": final_response_data["final_response"],
+            "confidence": evaluation["confidence_score"],
+            "analysis": analysis,
+            "precheck": precheck,
+            "proposed_answer": rag_result["answer"],
+            "rag_result": rag_result,
+            "evaluation": evaluation,
+            "sentiment_agreement": self._sentiment_agreement(precheck, evaluation)
+        })
+
     def orient_to_human(self, analysis, precheck_results):
         """
         Orient the ticket to a specialist human agent using summary and keywords.
@@ -0,0 +1,196 @@
+# bm25_index.py
+import os
+import re
+import json
+import math
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+# Okapi BM25 parameters
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Reciprocal rank fusion constant: score = sum(1 / (RRF_K + rank)) over the rankings
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+STOPWORDS = {
+    # French
+    "le", "la", "les", "un", "une", "des", "du", "de", "au", "aux", "et", "ou", "en", "dans", "sur",
+    "pour", "par", "avec", "sans", "ce", "cet", "cette", "ces", "se", "sa", "son", "ses", "mon", "ma",
+    "mes", "ton", "ta", "tes", "notre", "nos", "votre", "vos", "leur", "leurs", "je", "tu", "il", "elle",
+    "nous", "vous", "ils", "elles", "on", "qui", "que", "quoi", "dont", "est", "sont", "ai", "as", "avez",
+    "avons", "ont", "etre", "avoir", "pas", "ne", "plus", "tres", "comment", "quel", "quelle", "quels",
+    "quelles", "bonjour", "merci", "svp",
+    # English
+    "the", "an", "and", "or", "of", "to", "in", "on", "for", "with", "without", "by", "at", "from",
+    "is", "are", "was", "were", "be", "been", "it", "its", "this", "that", "these", "those", "my", "your",
+    "our", "their", "we", "they", "he", "she", "do", "does", "did", "not", "no", "how", "what", "which",
+    "can", "could", "hello", "thanks", "please",
+}
+# Light stemming: at most one suffix removed (longest first), keeping a stem of 3+ characters
+SUFFIXES = sorted([
+    "issements", "issement", "ations", "ation", "ements", "ement", "ments", "ment", "euses", "euse",
+    "eux", "ables", "able", "ibles", "ible", "iques", "ique", "ances", "ance", "ences", "ence", "ites",
+    "ite", "ings", "ing", "ies", "ied", "ers", "es", "ed", "ly", "s", "x",
+], key=len, reverse=True)
+# Words, and compound terms such as error codes or versions ("err-1042", "v2.3")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def stem(token: str) -> str:
+    # Codes and short words are kept as they are
+    if len(token) <= 4 or any(c.isdigit() for c in token):
+        return token
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+    return token[:-1] if token.endswith("e") and len(token) > 4 else token
+
+
+def tokenize(text: str) -> list:
+    """
+    French/English terms: lowercased, accent-folded, stop words removed, lightly stemmed.
+    Compound terms are kept whole and also split into their parts.
+    """
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    terms = []
+    for token in TOKEN_PATTERN.findall(text):
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            terms.append(token)
+        terms.extend(stem(p) for p in parts if len(p) >= 2 and p not in STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """
+    In-memory inverted index over the knowledge base chunks (same ids, contents and
+    category metadata as the Chroma collection), persisted as JSON with the KB version
+    it was built for.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.kb_version = None
+        self._docs = {}
+        self._postings = defaultdict(dict)
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _remove(self, doc_id: str) -> None:
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc["length"]
+        for term in doc["terms"]:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def add(self, ids: list, documents: list, metadatas: list | None = None) -> None:
+        """
+        Adds (or replaces) chunks.
+        """
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            for doc_id, content, metadata in zip(ids, documents, metadatas):
+                self._remove(doc_id)
+                counts = Counter(tokenize(content))
+                length = sum(counts.values())
+                self._docs[doc_id] = {
+                    "content": content,
+                    "category": (metadata or {}).get("category"),
+                    "terms": list(counts),
+                    "length": length
+                }
+                self._total_length += length
+                for term, tf in counts.items():
+                    self._postings[term][doc_id] = tf
+
+    def remove(self, ids: list) -> None:
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def search(self, query: str, k: int = 5, category: str = None, extra_terms: list | None = None) -> list:
+        """
+        Returns up to k (bm25_score, doc) hits, best first; `extra_terms` (e.g. the analyser
+        keywords) are added to the query terms. Only hits of `category` when given.
+        """
+        terms = set(tokenize(query))
+        for term in extra_terms or []:
+            terms.update(tokenize(term))
+        with self._lock:
+            n = len(self._docs)
+            if not n or not terms:
+                return []
+            average_length = self._total_length / n or 1.0
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    length = self._docs[doc_id]["length"]
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average_length))
+
+            hits = []
+            for doc_id, score in scores.most_common():
+                doc = self._docs[doc_id]
+                if category and doc["category"] != category:
+                    continue
+                hits.append((score, {"id": doc_id, "content": doc["content"], "category": doc["category"]}))
+                if len(hits) >= k:
+                    break
+            return hits
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            data = {
+                "kb_version": self.kb_version,
+                "documents": [
+                    {"id": doc_id, "content": doc["content"], "category": doc["category"]}
+                    for doc_id, doc in self._docs.items()
+                ]
+            }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls()
+        documents = data.get("documents", [])
+        index.add(
+            [d["id"] for d in documents],
+            [d["content"] for d in documents],
+            [{"category": d.get("category")} for d in documents]
+        )
+        index.kb_version = data.get("kb_version")
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K) -> list:
+    """
+    Fuses several rankings of (score, doc) hits (best first) by reciprocal rank.
+    Returns (rrf_score, doc) for every document, best first; the doc is taken from the
+    first ranking that contains it.
+    """
+    fused = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, (_, doc) in enumerate(ranking, start=1):
+            fused[doc["id"]] = fused.get(doc["id"], 0.0) + 1.0 / (k + rank)
+            docs.setdefault(doc["id"], doc)
+    return sorted(((score, docs[doc_id]) for doc_id, score in fused.items()), key=lambda hit: hit[0], reverse=True)
@@ -0,0 +1,51 @@
+import os
+import time
+import contextvars
+
+# Minimum remaining budget (seconds) for optional stages to start.
+# Below it the stage is skipped: no LLM composer (the proposed answer is sent as is).
+STAGE_BUDGETS = {
+    "composition": float(os.getenv("AI_COMPOSER_MIN_BUDGET", "5")),
+}
+
+
+class Deadline:
+    """
+    Time limit of one ticket, shared by all its stages.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def allows(self, stage: str) -> bool:
+        """
+        True when enough budget is left to start the optional `stage` (see STAGE_BUDGETS).
+        """
+        return self.remaining() >= STAGE_BUDGETS.get(stage, 0.0)
+
+
+# Deadline of the ticket being processed (None: no limit)
+current_deadline: contextvars.ContextVar = contextvars.ContextVar("current_deadline", default=None)
+
+
+def remaining_budget() -> float | None:
+    """
+    Seconds left for the current ticket, or None when it has no deadline.
+    """
+    deadline = current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def budget_allows(stage: str) -> bool:
+    """
+    Checks the current ticket's deadline before starting an optional stage.
+    """
+    deadline = current_deadline.get()
+    return deadline is None or deadline.allows(stage)
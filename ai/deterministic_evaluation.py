@@ -2,7 +2,13 @@ import os
 import json
 import re
 from dotenv import load_dotenv
-from mistralai import Mistral
+
+try:
+    from .llm_calls import chat_complete, chat_complete_async
+    from .mistral_client import get_client
+except ImportError:
+    from llm_calls import chat_complete, chat_complete_async
+    from mistral_client import get_client
 
 # Load environment variables
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
@@ -17,24 +23,24 @@ class DeterministicEvaluator:
     - Escalates if needed
     """
 
-    # Patterns for sensitive data
+    # Patterns for sensitive data (compiled once, at import)
     SENSITIVE_PATTERNS = [
-        r"\b(?:\d[ -]*?){12,18}\d\b",  # credit card numbers (13-19 digits with spaces/dashes)
-        r"\b[\w\.-]+@[\w\.-]+\.\w{2,4}\b",  # emails
-        r"\b(?:\+?\d{1,3}[-.\s]?)?\(?\d{2,4}\)?(?:[-.\s]?\d{2,4}){3,5}\b"  # phone numbers
+        re.compile(r"\b(?:\d[ -]*?){12,18}\d\b"),  # credit card numbers (13-19 digits with spaces/dashes)
+        re.compile(r"\b[\w\.-]+@[\w\.-]+\.\w{2,4}\b"),  # emails
+        re.compile(r"\b(?:\+?\d{1,3}[-.\s]?)?\(?\d{2,4}\)?(?:[-.\s]?\d{2,4}){3,5}\b")  # phone numbers
     ]
 
     def __init__(self, confidence_threshold: float = 0.6):
         if not API_KEY:
             raise ValueError("MISTRAL_API_KEY not found in .env file")
 
-        self.client = Mistral(api_key=API_KEY)
+        self.client = get_client()
         self.model = "mistral-small-latest"
         self.threshold = confidence_threshold
 
     def _detect_sensitive_data(self, text: str) -> bool:
         for i, p in enumerate(self.SENSITIVE_PATTERNS):
-            matches = re.finditer(p, text)
+            matches = p.finditer(text)
             for m in matches:
                 match_text = m.group()
                 # For phone numbers (index 2), ensure at least 10 digits in the match itself
@@ -56,17 +62,55 @@ class DeterministicEvaluator:
 
         # Auto escalate if context too weak
         if not context or len(context.strip()) < 20:
-            return self._escalation_payload(
-                confidence=0.0,
-                sentiment="neutral",
-                sensitive_data=False,
-                non_standard=True,
-                is_refusal=False,
-                reason="No reliable context",
-                query=query,
-                response=response
+            return self._weak_context_payload(query, response)
+
+        try:
+            raw = chat_complete(
+                "evaluation", self.client,
+                model=self.model,
+                messages=self._build_messages(query, context, response),
+                response_format={"type": "json_object"}
+            )
+
+            return self._interpret(json.loads(raw), query, response, retrieval_score)
+
+        except Exception as e:
+            return self._failure_payload(e, query, response)
+
+    async def evaluate_async(self, query: str, context: str, response: str, retrieval_score: float = 0.5) -> dict:
+        """
+        Async variant of evaluate, built on the async Mistral client.
+        """
+        if not context or len(context.strip()) < 20:
+            return self._weak_context_payload(query, response)
+
+        try:
+            raw = await chat_complete_async(
+                "evaluation", self.client,
+                model=self.model,
+                messages=self._build_messages(query, context, response),
+                response_format={"type": "json_object"}
             )
 
+            return self._interpret(json.loads(raw), query, response, retrieval_score)
+
+        except Exception as e:
+            return self._failure_payload(e, query, response)
+
+    def assess(self, judgement: dict, query: str, context: str, response: str, retrieval_score: float = 0.5) -> dict:
+        """
+        Applies the evaluation rules to a judgement produced by another LLM call
+        (e.g. the self-evaluation of the fused responder) instead of a dedicated evaluator call.
+        """
+        if not context or len(context.strip()) < 20:
+            return self._weak_context_payload(query, response)
+
+        try:
+            return self._interpret(judgement, query, response, retrieval_score)
+        except Exception as e:
+            return self._failure_payload(e, query, response)
+
+    def _build_messages(self, query: str, context: str, response: str) -> list:
         system_prompt = """
 You are an expert evaluator for a support RAG system.
 
@@ -98,7 +142,7 @@ Respond ONLY in valid JSON:
 }
 """
 
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {
                 "role": "user",
@@ -115,75 +159,81 @@ AI RESPONSE:
             }
         ]
 
-        try:
-            completion = self.client.chat.complete(
-                model=self.model,
-                messages=messages,
-                response_format={"type": "json_object"}
-            )
-
-            raw = completion.choices[0].message.content
-            result = json.loads(raw)
-
-            # Confidence + soft retrieval bonus
-            confidence = round((0.8 * float(result.get("confidence", 0.0)) + 0.2 * retrieval_score), 2)
-
-            # Detect sensitive data (Regex on query/response + LLM check)
-            regex_sensitive = self._detect_sensitive_data(query) or self._detect_sensitive_data(response)
-            llm_sensitive = result.get("sensitive_data", False)
-            
-            # Trust LLM more for emails/phones (often support info), but keep Regex for credit cards
-            sensitive_data_detected = llm_sensitive
-            reason = result.get("reason", "")
-
-            if regex_sensitive and not llm_sensitive:
-                # Check if it's a credit card (Pattern 0)
-                if any(re.search(self.SENSITIVE_PATTERNS[0], t) for t in [query, response]):
-                    sensitive_data_detected = True
-                    reason = f"Credit card pattern detected (Regex). {reason}".strip()
-                else:
-                    # If it's just email/phone and LLM says it's fine, we trust the LLM (likely support info)
-                    # But we still log it in the reason for transparency
-                    reason = f"Note: Potential contact info detected by Regex but cleared by LLM. {reason}".strip()
-
-            # Decide escalation
-            sentiment = result.get("sentiment", "neutral")
-            escalate = confidence < self.threshold or sensitive_data_detected or sentiment == "angry"
-
-            if escalate:
-                return self._escalation_payload(
-                    confidence=confidence,
-                    sentiment=sentiment,
-                    sensitive_data=sensitive_data_detected,
-                    non_standard=result.get("non_standard", False),
-                    is_refusal=result.get("is_refusal", False),
-                    reason=reason,
-                    query=query,
-                    response=response
-                )
-
-            return {
-                "confidence_score": confidence,
-                "escalate": False,
-                "sentiment": sentiment,
-                "sensitive_data": sensitive_data_detected,
-                "non_standard": result.get("non_standard", False),
-                "is_refusal": result.get("is_refusal", False),
-                "reason": reason
-            }
-
-        except Exception as e:
+    def _interpret(self, result: dict, query: str, response: str, retrieval_score: float) -> dict:
+        """
+        Turns the raw LLM judgement into the evaluation object (regex checks + escalation decision).
+        """
+        # Confidence + soft retrieval bonus
+        confidence = round((0.8 * float(result.get("confidence", 0.0)) + 0.2 * retrieval_score), 2)
+
+        # Detect sensitive data (Regex on query/response + LLM check)
+        regex_sensitive = self._detect_sensitive_data(query) or self._detect_sensitive_data(response)
+        llm_sensitive = result.get("sensitive_data", False)
+        
+        # Trust LLM more for emails/phones (often support info), but keep Regex for credit cards
+        sensitive_data_detected = llm_sensitive
+        reason = result.get("reason", "")
+
+        if regex_sensitive and not llm_sensitive:
+            # Check if it's a credit card (Pattern 0)
+            if any(self.SENSITIVE_PATTERNS[0].search(t) for t in [query, response]):
+                sensitive_data_detected = True
+                reason = f"Credit card pattern detected (Regex). {reason}".strip()
+            else:
+                # If it's just email/phone and LLM says it's fine, we trust the LLM (likely support info)
+                # But we still log it in the reason for transparency
+                reason = f"Note: Potential contact info detected by Regex but cleared by LLM. {reason}".strip()
+
+        # Decide escalation
+        sentiment = result.get("sentiment", "neutral")
+        escalate = confidence < self.threshold or sensitive_data_detected or sentiment == "angry"
+
+        if escalate:
             return self._escalation_payload(
-                confidence=0.0,
-                sentiment="neutral",
-                sensitive_data=False,
-                non_standard=True,
-                is_refusal=False,
-                reason=f"Evaluation failure: {str(e)}",
+                confidence=confidence,
+                sentiment=sentiment,
+                sensitive_data=sensitive_data_detected,
+                non_standard=result.get("non_standard", False),
+                is_refusal=result.get("is_refusal", False),
+                reason=reason,
                 query=query,
                 response=response
             )
 
+        return {
+            "confidence_score": confidence,
+            "escalate": False,
+            "sentiment": sentiment,
+            "sensitive_data": sensitive_data_detected,
+            "non_standard": result.get("non_standard", False),
+            "is_refusal": result.get("is_refusal", False),
+            "reason": reason
+        }
+
+    def _weak_context_payload(self, query: str, response: str) -> dict:
+        return self._escalation_payload(
+            confidence=0.0,
+            sentiment="neutral",
+            sensitive_data=False,
+            non_standard=True,
+            is_refusal=False,
+            reason="No reliable context",
+            query=query,
+            response=response
+        )
+
+    def _failure_payload(self, error: Exception, query: str, response: str) -> dict:
+        return self._escalation_payload(
+            confidence=0.0,
+            sentiment="neutral",
+            sensitive_data=False,
+            non_standard=True,
+            is_refusal=False,
+            reason=f"Evaluation failure: {str(error)}",
+            query=query,
+            response=response
+        )
+
     def _escalation_payload(
         self,
         confidence: float,
@@ -0,0 +1,118 @@
+# embedding_cache.py
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+import numpy as np
+from chromadb.api.types import Documents, Embeddings, EmbeddingFunction, Space
+
+try:
+    from . import pipeline_metrics
+except ImportError:
+    import pipeline_metrics
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+# Optional SQLite file keeping the embeddings across restarts (memory only when unset)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+
+
+class EmbeddingCache:
+    """
+    Text -> embedding cache keyed by sha256(model, text).
+    In-process LRU of `max_entries` vectors, backed by an optional on-disk store.
+    Vectors are kept as float32.
+    """
+
+    def __init__(self, model: str, max_entries: int = EMBEDDING_CACHE_SIZE, path: str | None = EMBEDDING_CACHE_PATH):
+        self.model = model
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB NOT NULL)")
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts: list) -> list:
+        """
+        Cached vectors in input order (None for misses).
+        """
+        results = []
+        with self._lock:
+            for text in texts:
+                key = self.key(text)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                elif self._conn is not None:
+                    row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        vector = np.frombuffer(row[0], dtype=np.float32)
+                        self._remember(key, vector)
+                results.append(vector)
+        hits = sum(vector is not None for vector in results)
+        pipeline_metrics.increment("embedding_cache_lookups", len(results))
+        pipeline_metrics.increment("embedding_cache_hits", hits)
+        return results
+
+    def put_many(self, texts: list, vectors: list) -> list:
+        """
+        Stores the vectors and returns them as float32 arrays.
+        """
+        stored = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+        with self._lock:
+            rows = []
+            for text, vector in zip(texts, stored):
+                key = self.key(text)
+                self._remember(key, vector)
+                rows.append((key, self.model, vector.tobytes()))
+            if self._conn is not None:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+        return stored
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function that serves known texts from an EmbeddingCache and
+    sends only the missing ones, in one request, to the wrapped function.
+    Reports the wrapped function's name and config, so it can stand in for it: a collection
+    persisted with it is rebuilt by Chroma as the wrapped function (build_from_config of the
+    registered class of that name).
+    """
+
+    def __init__(self, inner: EmbeddingFunction, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+
+    def __call__(self, input: Documents) -> Embeddings:
+        texts = list(input)
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            fetched = dict(zip(missing, self.cache.put_many(missing, self.inner(missing))))
+            vectors = [vector if vector is not None else fetched[text] for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def name(self) -> str:
+        return self.inner.name()
+
+    def default_space(self) -> Space:
+        return self.inner.default_space()
+
+    def supported_spaces(self) -> List[Space]:
+        return self.inner.supported_spaces()
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.inner.get_config()
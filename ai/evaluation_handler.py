@@ -1,3 +1,4 @@
+import os
 import sys
 import json
 import io
@@ -98,25 +99,23 @@ def main():
 
     manager = AgentManager()
     answers = []
+    max_concurrency = int(os.getenv("AI_BATCH_MAX_CONCURRENCY", "8"))
 
     # Suppress stdout/stderr while processing tickets to ensure only the final
     # JSON is printed (automated evaluators rely on exact output).
-    for q in questions:
-        qid = q.get("id")
-        query = q.get("query", "")
-
-        # Suppress noisy prints/logs from the pipeline
-        with contextlib.redirect_stdout(io.StringIO()), \
-             contextlib.redirect_stderr(io.StringIO()):
-            try:
-                result = manager.process_ticket(query)
-            except Exception as e:
-                result = {"status": "error", "reason": f"Processing error: {e}"}
-
+    # The tickets run concurrently; results come back in question order.
+    with contextlib.redirect_stdout(io.StringIO()), \
+         contextlib.redirect_stderr(io.StringIO()):
+        results = manager.process_tickets(
+            [q.get("query", "") for q in questions],
+            max_concurrency=max_concurrency
+        )
+
+    for q, result in zip(questions, results):
         answer_text = extract_answer_from_result(result)
-        
+
         answers.append({
-            "id": qid,
+            "id": q.get("id"),
             "answer": answer_text
         })
 
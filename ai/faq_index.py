@@ -0,0 +1,101 @@
+# faq_index.py
+import os
+import json
+import numpy as np
+
+try:
+    from .solutionfinder import embed_texts_async
+    from .response_composer import detect_language
+    from . import pipeline_metrics
+except ImportError:
+    from solutionfinder import embed_texts_async
+    from response_composer import detect_language
+    import pipeline_metrics
+
+# Cosine similarity above which a ticket is answered with the vetted FAQ answer
+FAQ_SIMILARITY_THRESHOLD = float(os.getenv("FAQ_SIMILARITY_THRESHOLD", "0.9"))
+# Optional JSON file (list of entries, same format as FAQ_ENTRIES) replacing the built-in entries
+FAQ_FILE = os.getenv("FAQ_FILE")
+
+# Curated FAQ (formerly AgentManager.knowledge_base): the vetted answer of each entry
+# ("content") and the reference question it answers. Entries of FAQ_FILE may also carry
+# "answers" per language ({"fr": ..., "en": ...}), a "category" and an "agent_role".
+FAQ_ENTRIES = [
+    {"id": "kb1", "question": "Comment réinitialiser mon mot de passe ?",
+     "content": "Pour réinitialiser votre mot de passe, cliquez sur 'Mot de passe oublié' sur la page de connexion."},
+    {"id": "kb2", "question": "Quels sont vos délais de livraison ?",
+     "content": "Nos délais de livraison standard sont de 3 à 5 jours ouvrables."},
+    {"id": "kb3", "question": "Quels sont les horaires du support technique ?",
+     "content": "Le support technique est disponible de 9h à 18h, du lundi au vendredi."},
+    {"id": "kb4", "question": "Comment retourner un article ?",
+     "content": "Vous pouvez retourner un article dans les 30 jours suivant l'achat s'il est dans son emballage d'origine."}
+]
+
+
+def load_faq_entries() -> list:
+    """
+    Returns the FAQ entries from FAQ_FILE when set, otherwise the built-in ones.
+    """
+    if FAQ_FILE:
+        with open(FAQ_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return FAQ_ENTRIES
+
+
+class FAQIndex:
+    """
+    Question embedding -> vetted answer.
+    The questions are embedded once, on the first lookup; each lookup then costs
+    a dot product with the ticket's embedding.
+    """
+
+    def __init__(self, entries: list | None = None, threshold: float = FAQ_SIMILARITY_THRESHOLD):
+        self.entries = entries if entries is not None else load_faq_entries()
+        self.threshold = threshold
+        self._vectors = None
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    async def _question_vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            self._vectors = self._normalize(await embed_texts_async([e["question"] for e in self.entries]))
+        return self._vectors
+
+    async def warm_up_async(self) -> None:
+        """
+        Embeds the FAQ questions ahead of the first lookup.
+        """
+        if self.entries:
+            await self._question_vectors()
+
+    async def match_async(self, query_embedding):
+        """
+        Returns (entry, similarity) for the closest FAQ question to the ticket embedding
+        when it is above the threshold, otherwise None. Updates the faq_lookups / faq_hits counters.
+        """
+        if not self.entries:
+            return None
+        pipeline_metrics.increment("faq_lookups")
+
+        vectors = await self._question_vectors()
+        query_vector = self._normalize(query_embedding)
+        similarities = vectors @ query_vector
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.threshold:
+            return None
+
+        pipeline_metrics.increment("faq_hits")
+        return self.entries[best], similarity
+
+    @staticmethod
+    def answer_for(entry: dict, query: str) -> str:
+        """
+        Vetted answer, in the ticket's language when the entry has a translation.
+        """
+        answers = entry.get("answers") or {}
+        return answers.get(detect_language(query)) or entry.get("content") or next(iter(answers.values()))
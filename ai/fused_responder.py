@@ -0,0 +1,113 @@
+# fused_responder.py
+import os
+import json
+from dotenv import load_dotenv
+from tenacity import retry, stop_after_attempt, wait_exponential
+from circuitbreaker import circuit
+try:
+    from .solutionfinder import format_context, NO_DOCUMENTS_ANSWER
+    from .response_composer import detect_language
+    from .pipeline_metrics import timed_stage, retry_recorder
+    from .llm_calls import chat_complete_async
+    from .rate_limiter import budgeted_retry
+    from .mistral_client import get_client
+except ImportError:
+    from solutionfinder import format_context, NO_DOCUMENTS_ANSWER
+    from response_composer import detect_language
+    from pipeline_metrics import timed_stage, retry_recorder
+    from llm_calls import chat_complete_async
+    from rate_limiter import budgeted_retry
+    from mistral_client import get_client
+
+# Load env
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+API_KEY = os.getenv("MISTRAL_API_KEY")
+if not API_KEY:
+    raise ValueError("MISTRAL_API_KEY not found")
+
+client = get_client()
+
+
+def _build_fused_messages(user_query: str, retrieved_docs) -> list:
+    """
+    Builds one prompt covering generation, self-evaluation and final composition.
+    """
+    response_lang = "French" if detect_language(user_query) == 'fr' else "English"
+
+    system_prompt = f"""You are the support AI of Doxa. In ONE pass you must:
+
+1. Write a grounded 'answer': a clear solution with a short explanation in French.
+   Use ONLY the provided documents. If the information is not in the documents, say clearly that you don't have the information.
+2. Evaluate your own answer:
+   - "confidence": GLOBAL CONFIDENCE SCORE (0.0 to 1.0) that the answer is correct and supported by the documents.
+   - "sentiment" of the USER QUERY: "positive" | "neutral" | "frustrated" | "angry".
+   - "sensitive_data": true if the user query or your answer contains private data (credit cards, private emails, private phone numbers).
+     Do NOT flag public support emails, support phone numbers or company contact info.
+   - "non_standard": true for non-standard or ambiguous requests.
+   - "is_refusal": true if the answer says the information is not available.
+   - "reason": short explanation of the evaluation.
+3. Write the 'final_response' sent to the user, in {response_lang}, with the structure:
+   polite acknowledgement, restatement of the problem, proposed solution, optional next steps.
+   Use ONLY the information of your answer, do not invent anything, and do NOT mention internal systems or evaluation scores.
+
+Respond ONLY in valid JSON:
+{{
+  "answer": "...",
+  "confidence": 0.0-1.0,
+  "sentiment": "positive" | "neutral" | "frustrated" | "angry",
+  "sensitive_data": true/false,
+  "non_standard": true/false,
+  "is_refusal": true/false,
+  "reason": "...",
+  "final_response": "..."
+}}
+"""
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user",
+            "content": f"""
+Context documents:
+{format_context(retrieved_docs)}
+
+User query:
+{user_query}
+"""
+        }
+    ]
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=budgeted_retry, before_sleep=retry_recorder("fused_completion"))
+@circuit(failure_threshold=3, recovery_timeout=60)
+async def fused_answer_async(user_query: str, retrieved_docs) -> dict:
+    """
+    Answers, self-evaluates and composes the final response in a single JSON completion.
+    Output format:
+    {
+        "answer": "grounded solution (same role as generate_answer)",
+        "confidence", "sentiment", "sensitive_data", "non_standard", "is_refusal", "reason": evaluator fields,
+        "final_response": "customer-facing message (same role as compose_response)"
+    }
+    """
+    if not retrieved_docs:
+        return {
+            "answer": NO_DOCUMENTS_ANSWER,
+            "final_response": NO_DOCUMENTS_ANSWER,
+            "confidence": 0.0,
+            "is_refusal": True,
+            "reason": "No documents retrieved"
+        }
+
+    with timed_stage("fused_completion"):
+        content = await chat_complete_async(
+            "fused_completion", client,
+            model="mistral-small-latest",
+            messages=_build_fused_messages(user_query, retrieved_docs),
+            response_format={"type": "json_object"}
+        )
+
+    result = json.loads(content)
+    result["answer"] = result.get("answer") or ""
+    result["final_response"] = result.get("final_response") or result["answer"]
+    return result
@@ -0,0 +1,130 @@
+# hedging.py
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+
+try:
+    from . import pipeline_metrics
+    from .llm_concurrency import slot_available
+except ImportError:
+    import pipeline_metrics
+    from llm_concurrency import slot_available
+
+# Hedged chat completions (opt-in): when a call has not answered after the stage's
+# live latency percentile, a duplicate is sent and the first answer wins.
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "0") == "1"
+LLM_HEDGE_STAGES = {s.strip() for s in os.getenv(
+    "LLM_HEDGE_STAGES", "analysis,query_optimization,generation,evaluation,composition,fused_completion"
+).split(",") if s.strip()}
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+# Latency samples kept per stage, and needed before the first hedge
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Never hedge sooner than this (seconds), whatever the percentile
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.2"))
+# Extra cost cap: hedges / calls over the last LLM_HEDGE_RATE_WINDOW_SECONDS
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.1"))
+LLM_HEDGE_RATE_WINDOW_SECONDS = float(os.getenv("LLM_HEDGE_RATE_WINDOW_SECONDS", "60"))
+
+
+class HedgePolicy:
+    """
+    Per-stage latency samples (time to the first answer) and the hedge rate cap.
+    """
+
+    def __init__(self, percentile: float = LLM_HEDGE_PERCENTILE, window: int = LLM_HEDGE_WINDOW,
+                 min_samples: int = LLM_HEDGE_MIN_SAMPLES, min_delay: float = LLM_HEDGE_MIN_DELAY,
+                 max_rate: float = LLM_HEDGE_MAX_RATE, rate_window_seconds: float = LLM_HEDGE_RATE_WINDOW_SECONDS):
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.rate_window_seconds = rate_window_seconds
+        self._latencies = {}
+        self._calls = deque()
+        self._hedges = deque()
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def delay(self, stage: str) -> float | None:
+        """
+        Seconds to wait before hedging a call of `stage`, or None while there are too few samples.
+        """
+        with self._lock:
+            samples = sorted(self._latencies.get(stage, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_delay, samples[index])
+
+    def _trim(self, now: float) -> None:
+        for events in (self._calls, self._hedges):
+            while events and now - events[0] > self.rate_window_seconds:
+                events.popleft()
+
+    def record_call(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._calls.append(now)
+
+    def try_hedge(self) -> bool:
+        """
+        Takes a hedge within the rate cap; False when the cap is reached.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._hedges) + 1 > self.max_rate * len(self._calls):
+                return False
+            self._hedges.append(now)
+            return True
+
+
+policy = HedgePolicy()
+
+
+async def hedged(stage: str, start):
+    """
+    Awaits `start()` (a coroutine factory for the call); when hedging is enabled for `stage`
+    and the call is slower than the stage's percentile, starts a second one and returns the
+    first successful answer. The other call is cancelled.
+    Each call takes its own in-flight slot (see llm_concurrency.py): no hedge is sent while
+    every slot is taken.
+    """
+    if not LLM_HEDGING_ENABLED or stage not in LLM_HEDGE_STAGES:
+        return await start()
+
+    policy.record_call()
+    started = time.perf_counter()
+    delay = policy.delay(stage)
+    tasks = [asyncio.ensure_future(start())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and slot_available() and policy.try_hedge():
+            tasks.append(asyncio.ensure_future(start()))
+            pipeline_metrics.increment("hedges_sent")
+            pipeline_metrics.increment(f"hedges_sent_{stage}")
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    policy.record(stage, time.perf_counter() - started)
+                    if task is not tasks[0]:
+                        pipeline_metrics.increment("hedges_won")
+                    return task.result()
+        # Every call failed: surface the original call's error
+        return tasks[0].result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
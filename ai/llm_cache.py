@@ -0,0 +1,158 @@
+# llm_cache.py
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+
+try:
+    from . import pipeline_metrics
+except ImportError:
+    import pipeline_metrics
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(current_dir, "llm_cache.sqlite3"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+# Age (seconds) after which a completion is asked again; 0 keeps completions until evicted
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Comma-separated stages that always call the model (e.g. "composition,evaluation")
+LLM_CACHE_BYPASS = {s.strip() for s in os.getenv("LLM_CACHE_BYPASS", "").split(",") if s.strip()}
+
+
+def cache_key(model: str, messages: list, response_format=None, temperature=None) -> str:
+    """
+    Content address of a chat request: sha256 of its canonical JSON form.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "response_format": response_format, "temperature": temperature},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    On-disk (SQLite) cache of chat completions, keyed by cache_key().
+    Least recently used entries are evicted beyond `max_entries` or `max_bytes` of stored text;
+    entries older than `ttl_seconds` are never returned.
+    The prompts of the knowledge base stages (generation, evaluation, composition) carry the
+    retrieved chunks, so a knowledge base change gives them new keys; the TTL bounds how long
+    any other answer (model or prompt drift) is replayed.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES, ttl_seconds: float = LLM_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, stage TEXT, content TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_used ON completions(last_used)")
+        # Running totals, so a put only scans the table when a limit is exceeded
+        self._count, self._bytes = self._totals()
+
+    def _totals(self) -> tuple:
+        return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, size, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._count -= 1
+                self._bytes -= row[1]
+                pipeline_metrics.increment("llm_cache_expired")
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, stage: str, content: str) -> None:
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, stage, content, size, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, content, size, now, now)
+            )
+            if replaced is None:
+                self._count += 1
+            self._bytes += size - (replaced[0] if replaced is not None else 0)
+            if self._count > self.max_entries or self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Exact totals (other processes may share the file), then back to the running ones
+        count, total = self._totals()
+        self._count, self._bytes = count, total
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk from the least recently used entry until both limits hold again
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY last_used ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM completions WHERE key = ?", victims)
+        self._count, self._bytes = count, total
+        pipeline_metrics.increment("llm_cache_evictions", len(victims))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._count, self._bytes = 0, 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache | None:
+    """
+    Process-wide cache, opened on first use (None when LLM_CACHE_ENABLED=0).
+    """
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+def lookup(stage: str, key: str) -> str | None:
+    """
+    Cached content for `key`, or None (miss, bypassed stage or disabled cache).
+    """
+    cache = get_cache()
+    if cache is None or stage in LLM_CACHE_BYPASS:
+        return None
+    content = cache.get(key)
+    pipeline_metrics.increment("llm_cache_lookups")
+    pipeline_metrics.increment("llm_cache_hits" if content is not None else "llm_cache_misses")
+    return content
+
+
+def store(stage: str, key: str, content: str) -> None:
+    cache = get_cache()
+    if cache is None or stage in LLM_CACHE_BYPASS or not content:
+        return
+    cache.put(key, stage, content)
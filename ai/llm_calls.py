@@ -0,0 +1,179 @@
+# llm_calls.py
+import json
+import time
+import asyncio
+
+try:
+    from . import llm_cache
+    from .llm_concurrency import llm_slot
+    from .rate_limiter import limiter, retry_budget, retry_delay, estimate_tokens
+    from .pipeline_metrics import retry_recorder
+    from .hedging import hedged
+except ImportError:
+    import llm_cache
+    from llm_concurrency import llm_slot
+    from rate_limiter import limiter, retry_budget, retry_delay, estimate_tokens
+    from pipeline_metrics import retry_recorder
+    from hedging import hedged
+
+# Single entry point for the pipeline's Mistral calls: chat completions go through the
+# content-addressed cache (llm_cache.py); every request goes through the process-wide
+# rate limiter and retry budget (rate_limiter.py) and, for async calls, the in-flight
+# cap (llm_concurrency.py) and optional hedging (hedging.py). `stage` names the caller
+# for cache bypass, hedging and metrics. Async calls reach the SQLite cache from a worker
+# thread, off the event loop.
+
+
+def _request_kwargs(response_format, temperature) -> dict:
+    kwargs = {}
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    return kwargs
+
+
+def _store(stage: str, key: str, content: str, response_format) -> None:
+    # A JSON completion is only kept once it parses, so a malformed answer is never replayed
+    if response_format is not None and response_format.get("type") == "json_object":
+        try:
+            json.loads(content)
+        except (TypeError, ValueError):
+            return
+    llm_cache.store(stage, key, content)
+
+
+def _send(stage: str, tokens: int, request):
+    """
+    Sends `request()` once the limiter allows it, retrying throttled and transient
+    failures (429, 5xx, network) within the shared retry budget.
+    """
+    attempt = 0
+    while True:
+        limiter.acquire(tokens)
+        retry_budget.record_request()
+        try:
+            return request()
+        except Exception as e:
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                raise
+        retry_recorder(stage)(None)
+        attempt += 1
+        time.sleep(delay)
+
+
+async def _send_async(stage: str, tokens: int, request):
+    """
+    Async variant of _send: `request()` returns the awaitable to send.
+    """
+    attempt = 0
+    while True:
+        await limiter.acquire_async(tokens)
+        retry_budget.record_request()
+        try:
+            return await request()
+        except Exception as e:
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                raise
+        retry_recorder(stage)(None)
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def _settle(tokens: int, response) -> None:
+    usage = getattr(response, "usage", None)
+    limiter.settle(tokens, getattr(usage, "total_tokens", None))
+
+
+def chat_complete(stage: str, client, *, model: str, messages: list, response_format=None, temperature=None) -> str:
+    """
+    client.chat.complete through the cache; returns the message content.
+    """
+    key = llm_cache.cache_key(model, messages, response_format, temperature)
+    content = llm_cache.lookup(stage, key)
+    if content is not None:
+        return content
+
+    tokens = estimate_tokens(messages)
+    response = _send(stage, tokens, lambda: client.chat.complete(
+        model=model, messages=messages, **_request_kwargs(response_format, temperature)
+    ))
+    _settle(tokens, response)
+    content = response.choices[0].message.content
+    _store(stage, key, content, response_format)
+    return content
+
+
+async def chat_complete_async(stage: str, client, *, model: str, messages: list, response_format=None, temperature=None) -> str:
+    """
+    client.chat.complete_async through the cache and the in-flight cap; returns the message content.
+    A slow call may be hedged with a duplicate request (see hedging.py).
+    """
+    key = llm_cache.cache_key(model, messages, response_format, temperature)
+    content = await asyncio.to_thread(llm_cache.lookup, stage, key)
+    if content is not None:
+        return content
+
+    tokens = estimate_tokens(messages)
+
+    async def attempt():
+        # One slot per attempt: a hedge never runs on the original call's slot
+        async with llm_slot():
+            return await _send_async(stage, tokens, lambda: client.chat.complete_async(
+                model=model, messages=messages, **_request_kwargs(response_format, temperature)
+            ))
+
+    response = await hedged(stage, attempt)
+    _settle(tokens, response)
+    content = response.choices[0].message.content
+    await asyncio.to_thread(_store, stage, key, content, response_format)
+    return content
+
+
+async def chat_stream_async(stage: str, client, *, model: str, messages: list, temperature=None):
+    """
+    client.chat.stream_async through the cache: yields the content chunk by chunk.
+    A cached completion is yielded as a single chunk; a streamed one is stored once complete.
+    """
+    key = llm_cache.cache_key(model, messages, None, temperature)
+    content = await asyncio.to_thread(llm_cache.lookup, stage, key)
+    if content is not None:
+        yield content
+        return
+
+    parts = []
+    # The slot is held until the stream is drained
+    async with llm_slot():
+        # Only opening the stream is retried: once chunks are yielded the call cannot be replayed
+        stream = await _send_async(stage, estimate_tokens(messages), lambda: client.chat.stream_async(
+            model=model, messages=messages, **_request_kwargs(None, temperature)
+        ))
+        async for chunk in stream:
+            delta = chunk.data.choices[0].delta.content
+            if isinstance(delta, str) and delta:
+                parts.append(delta)
+                yield delta
+    await asyncio.to_thread(llm_cache.store, stage, key, "".join(parts))
+
+
+def embed(stage: str, client, *, model: str, inputs: list) -> list:
+    """
+    client.embeddings.create through the rate limiter; returns one vector per input.
+    """
+    tokens = sum(len(text) for text in inputs) // 4 + len(inputs)
+    response = _send(stage, tokens, lambda: client.embeddings.create(model=model, inputs=inputs))
+    _settle(tokens, response)
+    return [item.embedding for item in response.data]
+
+
+async def embed_async(stage: str, client, *, model: str, inputs: list) -> list:
+    """
+    client.embeddings.create_async through the rate limiter and the in-flight cap.
+    """
+    tokens = sum(len(text) for text in inputs) // 4 + len(inputs)
+    async with llm_slot():
+        response = await _send_async(stage, tokens, lambda: client.embeddings.create_async(model=model, inputs=inputs))
+    _settle(tokens, response)
+    return [item.embedding for item in response.data]
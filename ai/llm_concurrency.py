@@ -0,0 +1,45 @@
+import asyncio
+import contextlib
+import contextvars
+
+# Cap on in-flight Mistral calls (chat completions, streams, embeddings) for the
+# tickets started in the current context. Tasks copy the context when they are
+# created, so every stage of every ticket of a batch shares the same semaphore.
+# None means no cap (single tickets, API requests).
+_llm_semaphore: contextvars.ContextVar = contextvars.ContextVar("llm_semaphore", default=None)
+
+
+@contextlib.contextmanager
+def limit_llm_calls(max_in_flight: int):
+    """
+    Caps the Mistral calls made by the tickets started inside the block.
+    Must be entered from a running event loop (the semaphore belongs to it).
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+    token = _llm_semaphore.set(asyncio.Semaphore(max_in_flight))
+    try:
+        yield
+    finally:
+        _llm_semaphore.reset(token)
+
+
+@contextlib.asynccontextmanager
+async def llm_slot():
+    """
+    Holds one of the in-flight slots (if a cap is set) around a Mistral call.
+    """
+    semaphore = _llm_semaphore.get()
+    if semaphore is None:
+        yield
+        return
+    async with semaphore:
+        yield
+
+
+def slot_available() -> bool:
+    """
+    True when no cap is set or one of the in-flight slots is free right now.
+    """
+    semaphore = _llm_semaphore.get()
+    return semaphore is None or not semaphore.locked()
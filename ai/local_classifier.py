@@ -0,0 +1,216 @@
+# local_classifier.py
+"""
+Local category / agent_role classifier (TF-IDF nearest centroid), trained offline from the
+analyses logged by the backend, so confident tickets skip the analyser LLM call.
+
+    python local_classifier.py --db ../backend/database.db --holdout 0.2
+"""
+import os
+import re
+import json
+import math
+import random
+import sqlite3
+import argparse
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "1") == "1"
+LOCAL_CLASSIFIER_PATH = os.getenv(
+    "LOCAL_CLASSIFIER_PATH", os.path.join(os.path.dirname(__file__), "local_classifier.json")
+)
+# Both predictions must reach this confidence for the analyser call to be skipped
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.8"))
+# "optimize": a short prompt still writes the summary, scope and optimized query
+# "skip": no LLM call at all, the raw ticket is used for retrieval
+LOCAL_CLASSIFIER_MODE = os.getenv("LOCAL_CLASSIFIER_MODE", "optimize")
+# Never routed locally: the analyser decides whether these tickets are in scope
+UNROUTABLE_CATEGORIES = {"Other", "other"}
+
+TARGETS = ("category", "agent_role")
+# Softmax temperature applied to the cosine similarities of the centroids
+DEFAULT_TEMPERATURE = 20.0
+MIN_TERM_DOCUMENTS = 2
+MAX_CENTROID_TERMS = 2000
+TOKEN_PATTERN = re.compile(r"[a-z0-9]{2,}")
+
+
+def tokenize(text: str) -> list:
+    """
+    Lowercased, accent-folded words and word bigrams.
+    """
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    words = TOKEN_PATTERN.findall("".join(c for c in text if not unicodedata.combining(c)))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _normalize(vector: dict) -> dict:
+    norm = math.sqrt(sum(w * w for w in vector.values()))
+    return {term: w / norm for term, w in vector.items()} if norm else {}
+
+
+class LocalClassifier:
+    """
+    One L2-normalized TF-IDF centroid per label and target; the confidence of a prediction
+    is the softmax of the cosine similarities to every centroid of the target.
+    """
+
+    def __init__(self, idf: dict, centroids: dict, temperature: float = DEFAULT_TEMPERATURE, trained_on: int = 0):
+        self.idf = idf
+        self.centroids = centroids
+        self.temperature = temperature
+        self.trained_on = trained_on
+
+    def vectorize(self, text: str) -> dict:
+        counts = Counter(t for t in tokenize(text) if t in self.idf)
+        return _normalize({t: (1 + math.log(n)) * self.idf[t] for t, n in counts.items()})
+
+    def _classify(self, vector: dict, target: str) -> tuple:
+        similarities = {
+            label: sum(w * centroid.get(t, 0.0) for t, w in vector.items())
+            for label, centroid in self.centroids[target].items()
+        }
+        best = max(similarities, key=similarities.get)
+        top = similarities[best]
+        total = sum(math.exp(self.temperature * (s - top)) for s in similarities.values())
+        return best, 1.0 / total
+
+    def predict(self, text: str) -> dict:
+        """
+        {"category", "agent_role", "category_confidence", "agent_role_confidence", "confidence", "keywords"}
+        ("confidence" is the lowest of both). Confidences are 0 for a ticket with no known term.
+        """
+        vector = self.vectorize(text)
+        prediction = {}
+        for target in TARGETS:
+            label, confidence = self._classify(vector, target) if vector else (None, 0.0)
+            prediction[target] = label
+            prediction[f"{target}_confidence"] = round(confidence, 3)
+        prediction["confidence"] = min(prediction[f"{target}_confidence"] for target in TARGETS)
+        single_words = sorted((t for t in vector if " " not in t and len(t) > 3), key=vector.get, reverse=True)
+        prediction["keywords"] = single_words[:7]
+        return prediction
+
+    def is_confident(self, prediction: dict, threshold: float = LOCAL_CLASSIFIER_THRESHOLD) -> bool:
+        return prediction["confidence"] >= threshold and prediction["category"] not in UNROUTABLE_CATEGORIES
+
+    @classmethod
+    def train(cls, examples: list, temperature: float = DEFAULT_TEMPERATURE) -> "LocalClassifier":
+        """
+        examples: [{"text", "category", "agent_role"}], e.g. from load_history().
+        """
+        documents = [Counter(tokenize(e["text"])) for e in examples]
+        document_frequency = Counter(t for counts in documents for t in counts)
+        n = len(documents)
+        idf = {
+            t: math.log((1 + n) / (1 + df)) + 1
+            for t, df in document_frequency.items() if df >= MIN_TERM_DOCUMENTS
+        }
+        classifier = cls(idf, {}, temperature, trained_on=n)
+
+        vectors = [classifier.vectorize(e["text"]) for e in examples]
+        for target in TARGETS:
+            sums = defaultdict(Counter)
+            for example, vector in zip(examples, vectors):
+                if example.get(target):
+                    sums[example[target]].update(vector)
+            classifier.centroids[target] = {
+                label: _normalize(dict(total.most_common(MAX_CENTROID_TERMS))) for label, total in sums.items()
+            }
+        return classifier
+
+    def save(self, path: str = LOCAL_CLASSIFIER_PATH) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "trained_on": self.trained_on,
+                "temperature": self.temperature,
+                "idf": self.idf,
+                "centroids": self.centroids
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str = LOCAL_CLASSIFIER_PATH) -> "LocalClassifier":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["idf"], data["centroids"], data.get("temperature", DEFAULT_TEMPERATURE), data.get("trained_on", 0))
+
+
+def load_local_classifier(path: str = LOCAL_CLASSIFIER_PATH) -> LocalClassifier | None:
+    """
+    The trained classifier, or None when it is disabled or has not been trained yet.
+    """
+    if not LOCAL_CLASSIFIER_ENABLED or not os.path.exists(path):
+        return None
+    return LocalClassifier.load(path)
+
+
+def load_history(db_path: str) -> list:
+    """
+    Tickets analysed by the LLM analyser (not by this classifier) with their category and routing.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        rows = connection.execute("""
+            SELECT t.title, t.description, l.category, l.agent_role
+            FROM ai_pipeline_logs l JOIN tickets t ON t.id = l.ticket_id
+            WHERE l.status = 'completed' AND l.category IS NOT NULL AND l.agent_role IS NOT NULL
+              AND (l.analysis_source IS NULL OR l.analysis_source = 'llm')
+        """).fetchall()
+    finally:
+        connection.close()
+    # Same text as the one sent to the pipeline (see backend/app/api/endpoints/tickets.py)
+    return [
+        {"text": f"{title}\n\n{description}", "category": category, "agent_role": agent_role}
+        for title, description, category, agent_role in rows
+    ]
+
+
+def evaluate(classifier: LocalClassifier, examples: list, threshold: float) -> dict:
+    """
+    Accuracy on all examples, and coverage / accuracy of the confident predictions.
+    """
+    predictions = [(classifier.predict(e["text"]), e) for e in examples]
+    confident = [(p, e) for p, e in predictions if classifier.is_confident(p, threshold)]
+
+    def accuracy(pairs):
+        if not pairs:
+            return None
+        return sum(p["category"] == e["category"] and p["agent_role"] == e["agent_role"] for p, e in pairs) / len(pairs)
+
+    return {
+        "examples": len(examples),
+        "accuracy": accuracy(predictions),
+        "coverage": len(confident) / len(examples) if examples else None,
+        "confident_accuracy": accuracy(confident)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local category / agent_role classifier")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(__file__), "..", "backend", "database.db"))
+    parser.add_argument("--output", default=LOCAL_CLASSIFIER_PATH)
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of the history kept for evaluation")
+    parser.add_argument("--threshold", type=float, default=LOCAL_CLASSIFIER_THRESHOLD)
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    args = parser.parse_args()
+
+    history = load_history(args.db)
+    if not history:
+        raise SystemExit(f"No analysed ticket in {args.db}")
+    random.Random(0).shuffle(history)
+    split = int(len(history) * (1 - args.holdout))
+    train_set, test_set = history[:split], history[split:]
+
+    if test_set:
+        report = evaluate(LocalClassifier.train(train_set, args.temperature), test_set, args.threshold)
+        print(f"Hold-out ({report['examples']} tickets): accuracy {report['accuracy']:.1%}, "
+              f"confident coverage {report['coverage']:.1%} at threshold {args.threshold}")
+        if report["confident_accuracy"] is not None:
+            print(f"Accuracy of the confident predictions: {report['confident_accuracy']:.1%}")
+
+    # The saved model is trained on the whole history
+    classifier = LocalClassifier.train(history, args.temperature)
+    classifier.save(args.output)
+    print(f"✅ Classifier trained on {len(history)} tickets -> {args.output}")
@@ -0,0 +1,105 @@
+# mistral_client.py
+import os
+import asyncio
+import threading
+import weakref
+import httpx
+from mistralai import Mistral
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
+# HTTP connection pool shared by every AI module (one Mistral client per process)
+MISTRAL_MAX_CONNECTIONS = int(os.getenv("MISTRAL_MAX_CONNECTIONS", "64"))
+MISTRAL_MAX_KEEPALIVE = int(os.getenv("MISTRAL_MAX_KEEPALIVE", "32"))
+MISTRAL_KEEPALIVE_EXPIRY = float(os.getenv("MISTRAL_KEEPALIVE_EXPIRY", "60"))
+MISTRAL_CONNECT_TIMEOUT = float(os.getenv("MISTRAL_CONNECT_TIMEOUT", "5"))
+# Whole-request timeout (the SDK's timeout_ms), applied to reads, writes and pool waits
+MISTRAL_TIMEOUT = float(os.getenv("MISTRAL_TIMEOUT", "60"))
+# Optional base URL (proxy, gateway or local mock server) instead of the public API
+MISTRAL_SERVER_URL = os.getenv("MISTRAL_SERVER_URL") or None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MISTRAL_MAX_CONNECTIONS,
+        max_keepalive_connections=MISTRAL_MAX_KEEPALIVE,
+        keepalive_expiry=MISTRAL_KEEPALIVE_EXPIRY
+    )
+
+
+def _request_timeout(timeout):
+    # The SDK passes its per-request timeout as seconds (or None): keep the shorter connect timeout
+    if timeout is None or isinstance(timeout, (int, float)):
+        return httpx.Timeout(timeout or MISTRAL_TIMEOUT, connect=MISTRAL_CONNECT_TIMEOUT)
+    return timeout
+
+
+class _PooledClient(httpx.Client):
+    def build_request(self, *args, timeout=httpx.USE_CLIENT_DEFAULT, **kwargs) -> httpx.Request:
+        return super().build_request(*args, timeout=_request_timeout(timeout), **kwargs)
+
+
+class _PooledAsyncClient(httpx.AsyncClient):
+    def build_request(self, *args, timeout=httpx.USE_CLIENT_DEFAULT, **kwargs) -> httpx.Request:
+        return super().build_request(*args, timeout=_request_timeout(timeout), **kwargs)
+
+
+class _LoopAsyncClient:
+    """
+    Async HTTP client for the SDK, with one connection pool per event loop: httpx async
+    connections cannot be reused across loops (the backend's loop, the AgentManager loop
+    used by the sync entry points, asyncio.run in scripts).
+    """
+
+    def __init__(self):
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _current(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = _PooledAsyncClient(follow_redirects=True, limits=_limits())
+                self._clients[loop] = client
+            return client
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self._current().send(request, **kwargs)
+
+    def build_request(self, *args, **kwargs) -> httpx.Request:
+        return self._current().build_request(*args, **kwargs)
+
+    async def aclose(self) -> None:
+        # Closes the pool of the running loop; the other loops' pools go with their loop
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Mistral:
+    """
+    Process-wide Mistral client, created on first use. Every module (analysis, retrieval,
+    generation, evaluation, composition, OCR, embeddings) shares its keep-alive connections.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = os.getenv("MISTRAL_API_KEY")
+            if not api_key:
+                raise ValueError("MISTRAL_API_KEY not found in .env file")
+            _client = Mistral(
+                api_key=api_key,
+                server_url=MISTRAL_SERVER_URL,
+                client=_PooledClient(follow_redirects=True, limits=_limits()),
+                async_client=_LoopAsyncClient(),
+                timeout_ms=int(MISTRAL_TIMEOUT * 1000)
+            )
+        return _client
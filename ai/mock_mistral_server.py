@@ -0,0 +1,184 @@
+# mock_mistral_server.py
+"""
+Local stand-in for the Mistral API, with injected latency, to exercise hedging,
+rate limiting and retries without calling (or paying for) the real service.
+
+    python mock_mistral_server.py --port 8090 --latency 0.3 --slow-rate 0.05 --slow-latency 5
+    MISTRAL_SERVER_URL=http://127.0.0.1:8090 LLM_HEDGING_ENABLED=1 python evaluation_handler.py
+
+Serves /v1/chat/completions (JSON and streamed), /v1/embeddings and /v1/models.
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+EMBEDDING_DIM = 1024
+
+# One JSON object carrying the fields of every JSON stage (analysis, evaluation, fused answer)
+JSON_COMPLETION = {
+    "summary": "Demande de support",
+    "keywords": ["support"],
+    "category": "Support and Reference Documentation",
+    "agent_role": "agt_tech",
+    "is_sufficient": True,
+    "is_in_scope": True,
+    "optimized_query": "",
+    "answer": "Voici la procédure décrite dans la documentation.",
+    "confidence": 0.9,
+    "sentiment": "neutral",
+    "sensitive_data": False,
+    "non_standard": False,
+    "is_refusal": False,
+    "reason": "mock",
+    "final_response": "Bonjour, voici la procédure décrite dans la documentation."
+}
+TEXT_COMPLETION = "Bonjour, voici la procédure décrite dans la documentation."
+
+
+class MockSettings:
+    def __init__(self, latency: float, jitter: float, slow_rate: float, slow_latency: float,
+                 throttle_rate: float, retry_after: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def delay(self) -> float:
+        if random.random() < self.slow_rate:
+            return self.slow_latency
+        return self.latency + random.uniform(0, self.jitter)
+
+
+def embedding(text: str) -> list:
+    """
+    Deterministic pseudo-embedding: identical texts get identical vectors.
+    """
+    rng = random.Random(int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16))
+    return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIM)]
+
+
+class MockMistralHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings: MockSettings = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        # Model list, used to open connections when warming up
+        if self.path.endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": model, "object": "model", "created": 0, "owned_by": "mock", "type": "base",
+                 "capabilities": {"completion_chat": model != "mistral-embed"}}
+                for model in ("mistral-small-latest", "mistral-large-latest", "mistral-embed")
+            ]})
+        else:
+            self._send_json(404, {"message": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            self._handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request (e.g. the losing call of a hedge was cancelled)
+            self.close_connection = True
+
+    def _handle(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        settings = self.settings
+        with settings.lock:
+            settings.requests += 1
+
+        if random.random() < settings.throttle_rate:
+            self._send_json(429, {"message": "Requests rate limit exceeded"},
+                            {"Retry-After": str(settings.retry_after)})
+            return
+        time.sleep(settings.delay())
+
+        if self.path.endswith("/embeddings"):
+            inputs = body.get("input") or body.get("inputs") or []
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json(200, {
+                "id": "mock-embd", "object": "list", "model": body.get("model"),
+                "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+                "data": [{"object": "embedding", "embedding": embedding(text), "index": i} for i, text in enumerate(inputs)]
+            })
+        elif self.path.endswith("/chat/completions"):
+            self._chat(body)
+        else:
+            self._send_json(404, {"message": f"Unknown path {self.path}"})
+
+    def _chat(self, body: dict) -> None:
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        content = json.dumps(JSON_COMPLETION, ensure_ascii=False) if json_mode else TEXT_COMPLETION
+        usage = {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "mock-chat", "object": "chat.completion", "model": body.get("model"), "created": int(time.time()),
+                "usage": usage,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}]
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in content.split(" "):
+            chunk = {
+                "id": "mock-chat", "object": "chat.completion.chunk", "model": body.get("model"), "created": int(time.time()),
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": word + " "}, "finish_reason": None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def serve(port: int, settings: MockSettings) -> ThreadingHTTPServer:
+    """
+    Starts the mock server in a background thread and returns it (server.shutdown() stops it).
+    """
+    handler = type("Handler", (MockMistralHandler,), {"settings": settings})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Mistral API with injected latency")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.3, help="base latency of every request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="uniform extra latency (seconds)")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="share of requests answered after --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of the 429 responses (seconds)")
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.jitter, args.slow_rate, args.slow_latency,
+                            args.throttle_rate, args.retry_after)
+    server = serve(args.port, settings)
+    print(f"Mock Mistral API on http://127.0.0.1:{args.port} (MISTRAL_SERVER_URL)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,6 +1,9 @@
 import os
-from mistralai import Mistral
 from dotenv import load_dotenv
+try:
+    from .mistral_client import get_client
+except ImportError:
+    from mistral_client import get_client
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
 
@@ -12,7 +15,7 @@ def convert_pdf_to_markdown(pdf_path: str) -> str:
     if not api_key:
         raise ValueError("MISTRAL_API_KEY not found in .env file")
 
-    client = Mistral(api_key=api_key)
+    client = get_client()
 
     # Upload the file to Mistral with purpose="ocr"
     print(f"Uploading {pdf_path} to Mistral...")
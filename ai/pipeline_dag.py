@@ -0,0 +1,152 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+try:
+    from .pipeline_metrics import timed_stage
+except ImportError:
+    from pipeline_metrics import timed_stage
+
+
+class Outcome:
+    """
+    Terminal result returned by a node (rejected, escalated, answered).
+    The scheduler stops at the first outcome and cancels the nodes still running.
+    """
+
+    def __init__(self, result: dict):
+        self.result = result
+
+
+@dataclass
+class Node:
+    """
+    One pipeline stage.
+    - run: coroutine function called with the declared inputs as keyword arguments.
+      It returns a dict holding exactly the declared outputs, or an Outcome.
+    - when: optional guard called with the same inputs; when it returns False the node
+      is skipped and its outputs are set to None.
+    """
+    name: str
+    run: Callable[..., Awaitable["dict | Outcome"]]
+    inputs: tuple = ()
+    outputs: tuple = ()
+    when: Callable[..., bool] | None = None
+
+
+@dataclass
+class DAGRun:
+    """
+    What happened during one PipelineDAG.run().
+    """
+    values: dict
+    outcome: Outcome | None = None
+    started: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+    cancelled: list = field(default_factory=list)
+    timed_out: bool = False
+
+
+class PipelineDAG:
+    """
+    Runs nodes as soon as all their inputs are available, so independent nodes
+    run concurrently. Each node is timed as a stage of the current ticket
+    (pipeline_metrics.timed_stage) under its own name.
+    """
+
+    def __init__(self, nodes: list, initial_inputs: tuple = ()):
+        self.nodes = list(nodes)
+        self.initial_inputs = tuple(initial_inputs)
+        self._validate()
+
+    def _validate(self) -> None:
+        producers = {name: None for name in self.initial_inputs}
+        names = set()
+        for node in self.nodes:
+            if node.name in names:
+                raise ValueError(f"Duplicate pipeline node: {node.name}")
+            names.add(node.name)
+            for output in node.outputs:
+                if output in producers:
+                    raise ValueError(f"'{output}' is produced twice (node {node.name})")
+                producers[output] = node.name
+
+        for node in self.nodes:
+            missing = [i for i in node.inputs if i not in producers]
+            if missing:
+                raise ValueError(f"Node {node.name} needs {missing}, which no node produces")
+
+        # Kahn's algorithm: every node must be reachable in topological order
+        available = set(self.initial_inputs)
+        remaining = list(self.nodes)
+        while remaining:
+            ready = [n for n in remaining if all(i in available for i in n.inputs)]
+            if not ready:
+                raise ValueError(f"Cycle between pipeline nodes: {[n.name for n in remaining]}")
+            for node in ready:
+                available.update(node.outputs)
+                remaining.remove(node)
+
+    async def _run_node(self, node: Node, kwargs: dict):
+        with timed_stage(node.name):
+            result = await node.run(**kwargs)
+        if isinstance(result, Outcome):
+            return result
+        result = result or {}
+        unexpected = set(result) - set(node.outputs)
+        if unexpected:
+            raise ValueError(f"Node {node.name} returned undeclared outputs {sorted(unexpected)}")
+        return {output: result.get(output) for output in node.outputs}
+
+    async def run(self, initial: dict, timeout: float | None = None) -> DAGRun:
+        """
+        Runs the nodes until an Outcome is returned or every node is done.
+        After `timeout` seconds the running nodes are cancelled and the run is returned
+        with timed_out set, holding the values produced so far.
+        """
+        run = DAGRun(values=dict(initial))
+        pending = list(self.nodes)
+        running = {}
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + timeout if timeout is not None else None
+
+        try:
+            while pending or running:
+                for node in [n for n in pending if all(i in run.values for i in n.inputs)]:
+                    pending.remove(node)
+                    kwargs = {i: run.values[i] for i in node.inputs}
+                    if node.when is not None and not node.when(**kwargs):
+                        run.skipped.append(node.name)
+                        run.values.update({output: None for output in node.outputs})
+                        continue
+                    run.started.append(node.name)
+                    running[asyncio.create_task(self._run_node(node, kwargs))] = node
+
+                # Skipped nodes may have unlocked others: schedule them before waiting
+                if any(all(i in run.values for i in n.inputs) for n in pending):
+                    continue
+
+                if not running:
+                    if pending:
+                        raise RuntimeError(f"Pipeline stalled before {[n.name for n in pending]}")
+                    break
+
+                wait_for = max(0.0, expires_at - loop.time()) if expires_at is not None else None
+                done, _ = await asyncio.wait(running, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    run.timed_out = True
+                    return run
+                for task in done:
+                    running.pop(task)
+                    result = task.result()
+                    if isinstance(result, Outcome):
+                        run.outcome = result
+                        return run
+                    run.values.update(result)
+            return run
+        finally:
+            for task, node in running.items():
+                task.cancel()
+                run.cancelled.append(node.name)
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
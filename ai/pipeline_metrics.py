@@ -0,0 +1,114 @@
+import time
+import threading
+import contextlib
+import contextvars
+from collections import Counter
+
+# Process-wide counters for the AI pipeline (speculation outcomes, cache hits, ...).
+# Tickets run concurrently on the event loop and in worker threads, hence the lock.
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def increment(name: str, value: int = 1) -> None:
+    """
+    Adds `value` to the named counter.
+    """
+    with _lock:
+        _counters[name] += value
+
+
+def get_counters() -> dict:
+    """
+    Returns a snapshot of all counters.
+    """
+    with _lock:
+        return dict(_counters)
+
+
+def ratio(numerator: str, denominator: str) -> float | None:
+    """
+    Returns counters[numerator] / counters[denominator], or None when the denominator is zero.
+    """
+    with _lock:
+        total = _counters[denominator]
+        return _counters[numerator] / total if total else None
+
+
+class StageTimings:
+    """
+    Per-ticket latency breakdown: wall time, number of calls and tenacity retries per stage.
+    Stages can overlap (pipeline nodes running concurrently) or nest (a retrieval node
+    contains its own embedding and vector search), so durations are not meant to add up.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        # Decisions taken while processing the ticket (e.g. "fallback_used")
+        self.flags = set()
+
+    def _entry(self, name: str) -> dict:
+        return self.stages.setdefault(name, {"duration_seconds": 0.0, "calls": 0, "retries": 0})
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self._entry(name)
+            entry["duration_seconds"] += time.perf_counter() - start
+            entry["calls"] += 1
+
+    def add_retry(self, name: str) -> None:
+        self._entry(name)["retries"] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "fallback_ran": "fallback_used" in self.flags,
+            "stages": {
+                name: {**entry, "duration_seconds": round(entry["duration_seconds"], 4)}
+                for name, entry in self.stages.items()
+            },
+        }
+
+
+# Timings of the ticket being processed. Context variables are copied into the tasks
+# and threads started by the pipeline, so nested calls record into the same object.
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+
+@contextlib.contextmanager
+def timed_stage(name: str):
+    """
+    Times a block as stage `name` of the current ticket (no-op outside process_ticket_async).
+    """
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    with timings.stage(name):
+        yield
+
+
+def mark_stage_flag(flag: str) -> None:
+    """
+    Records a decision for the current ticket (no-op outside process_ticket_async).
+    """
+    timings = current_timings.get()
+    if timings is not None:
+        timings.flags.add(flag)
+
+
+def retry_recorder(stage: str):
+    """
+    Returns a tenacity `before_sleep` hook counting retries of `stage` for the current ticket.
+    """
+    def _record(retry_state) -> None:
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add_retry(stage)
+        increment(f"retries_{stage}")
+    return _record
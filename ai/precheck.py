@@ -1,9 +1,13 @@
 import re
 from langdetect import detect_langs, DetectorFactory
 from langdetect.lang_detect_exception import LangDetectException
+from langdetect.detector_factory import init_factory
 
 # Ensure consistent results for language detection
 DetectorFactory.seed = 0
+# Load the language profiles up front: langdetect loads them lazily on first use,
+# which is not thread-safe, and prechecks of concurrent tickets run in worker threads.
+init_factory()
 
 class TicketPrechecker:
     def __init__(self):
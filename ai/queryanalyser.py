@@ -1,10 +1,19 @@
 # queryanalyser.py
 import os
 import json
-from mistralai import Mistral
 from dotenv import load_dotenv, find_dotenv
 from tenacity import retry, stop_after_attempt, wait_exponential
 from circuitbreaker import circuit
+try:
+    from .pipeline_metrics import retry_recorder
+    from .llm_calls import chat_complete, chat_complete_async
+    from .rate_limiter import budgeted_retry
+    from .mistral_client import get_client
+except ImportError:
+    from pipeline_metrics import retry_recorder
+    from llm_calls import chat_complete, chat_complete_async
+    from rate_limiter import budgeted_retry
+    from mistral_client import get_client
 
 # Load environment variables from .env
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
@@ -12,23 +21,12 @@ API_KEY = os.environ.get("MISTRAL_API_KEY")
 if not API_KEY:
     raise ValueError("Please set MISTRAL_API_KEY in your .env file")
 
-# Initialize Mistral client
-client = Mistral(api_key=API_KEY)
+# Shared, connection-pooled Mistral client
+client = get_client()
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-@circuit(failure_threshold=3, recovery_timeout=60)
-def analyse_query(query: str) -> dict:
+def _build_messages(query: str) -> list:
     """
-    Sends a query to Mistral and returns a summary, keywords, and an optimized version.
-    Output format:
-    {
-        "summary": "short summary of the query",
-        "keywords": ["key", "words", "here"],
-        "category": "category_name",
-        "is_sufficient": true/false,
-        "is_in_scope": true/false,
-        "optimized_query": "expanded query with synonyms and details"
-    }
+    Builds the chat messages shared by analyse_query and analyse_query_async.
     """
     # Prompt for the model
     system_prompt = """You are an expert query analyzer for a technical support system (Company: Doxa).
@@ -70,29 +68,126 @@ Respond ONLY in JSON format:
     "optimized_query": "..."
 }"""
 
-    messages = [
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": query}
+    ]
+
+
+def _build_optimization_messages(query: str) -> list:
+    """
+    Shorter prompt used when the category and agent_role come from the local classifier.
+    """
+    system_prompt = """You are an expert query analyzer for a technical support system (Company: Doxa).
+Your task is to:
+1. Provide a short summary of less than 100 words of the query in French.
+2. Evaluate if the query is sufficient (detailed enough) to find a precise solution.
+3. Evaluate if the query is 'is_in_scope' (related to Doxa, technical support, user guides, or professional services).
+4. Provide an 'optimized_query' for search (RAG): expand short or vague queries with the likely technical context and technical synonyms.
+5. Extract from 5 to 10 key keywords.
+
+Respond ONLY in JSON format:
+{
+    "summary": "...",
+    "keywords": ["...", "..."],
+    "is_sufficient": true,
+    "is_in_scope": true,
+    "optimized_query": "..."
+}"""
+
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": query}
     ]
 
+
+def _error_result(query: str, error: Exception) -> dict:
+    """
+    Fallback analysis returned when the Mistral call fails.
+    """
+    print(f"Erreur lors de l'appel à l'API Mistral : {error}")
+    return {
+        "summary": "[Erreur de connexion ou de traitement]", 
+        "keywords": [],
+        "is_sufficient": False,
+        "optimized_query": query,
+        "error": str(error)
+    }
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=budgeted_retry)
+@circuit(failure_threshold=3, recovery_timeout=60)
+def analyse_query(query: str) -> dict:
+    """
+    Sends a query to Mistral and returns a summary, keywords, and an optimized version.
+    Output format:
+    {
+        "summary": "short summary of the query",
+        "keywords": ["key", "words", "here"],
+        "category": "category_name",
+        "is_sufficient": true/false,
+        "is_in_scope": true/false,
+        "optimized_query": "expanded query with synonyms and details"
+    }
+    """
+    messages = _build_messages(query)
+
     try:
-        response = client.chat.complete(
+        content = chat_complete(
+            "analysis", client,
             model="mistral-small-latest",
             messages=messages,
             response_format={"type": "json_object"}  # Force JSON output
         )
         # Extract JSON from model
-        content = response.choices[0].message.content
         result = json.loads(content)
     except Exception as e:
-        print(f"Erreur lors de l'appel à l'API Mistral : {e}")
-        result = {
-            "summary": "[Erreur de connexion ou de traitement]", 
-            "keywords": [],
-            "is_sufficient": False,
-            "optimized_query": query,
-            "error": str(e)
-        }
+        result = _error_result(query, e)
+
+    return result
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=budgeted_retry, before_sleep=retry_recorder("analysis"))
+@circuit(failure_threshold=3, recovery_timeout=60)
+async def analyse_query_async(query: str) -> dict:
+    """
+    Async variant of analyse_query, built on the async Mistral client.
+    Same output format as analyse_query.
+    """
+    messages = _build_messages(query)
+
+    try:
+        content = await chat_complete_async(
+            "analysis", client,
+            model="mistral-small-latest",
+            messages=messages,
+            response_format={"type": "json_object"}  # Force JSON output
+        )
+        result = json.loads(content)
+    except Exception as e:
+        result = _error_result(query, e)
+
+    return result
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=budgeted_retry, before_sleep=retry_recorder("query_optimization"))
+@circuit(failure_threshold=3, recovery_timeout=60)
+async def optimize_query_async(query: str) -> dict:
+    """
+    Summary, keywords, scope and optimized query only (no category or agent_role):
+    used when the local classifier already routed the ticket.
+    """
+    messages = _build_optimization_messages(query)
+
+    try:
+        content = await chat_complete_async(
+            "query_optimization", client,
+            model="mistral-small-latest",
+            messages=messages,
+            response_format={"type": "json_object"}  # Force JSON output
+        )
+        result = json.loads(content)
+    except Exception as e:
+        result = _error_result(query, e)
 
     return result
 
@@ -0,0 +1,234 @@
+# rate_limiter.py
+import os
+import time
+import asyncio
+import random
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+import httpx
+
+try:
+    from . import pipeline_metrics
+    from .pipeline_metrics import timed_stage
+    from .deadline import remaining_budget
+except ImportError:
+    import pipeline_metrics
+    from pipeline_metrics import timed_stage
+    from deadline import remaining_budget
+
+# Process-wide limits on the Mistral traffic (chat completions, streams, embeddings); 0 disables a limit
+MISTRAL_MAX_RPS = float(os.getenv("MISTRAL_MAX_RPS", "10"))
+MISTRAL_MAX_TPM = float(os.getenv("MISTRAL_MAX_TPM", "500000"))
+# Tokens charged up front for the completion, settled against the reported usage afterwards
+LLM_OUTPUT_TOKENS_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "300"))
+
+# Retries of throttled (429) or failed (5xx, network) calls, shared by all stages and tickets:
+# over the last window, at most max(LLM_RETRY_BUDGET_MIN, ratio * requests) retries.
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.1"))
+LLM_RETRY_BUDGET_MIN = int(os.getenv("LLM_RETRY_BUDGET_MIN", "3"))
+LLM_RETRY_BUDGET_WINDOW_SECONDS = float(os.getenv("LLM_RETRY_BUDGET_WINDOW_SECONDS", "60"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Refills `rate` tokens per second, up to `capacity`.
+    reserve() takes the tokens immediately (the balance can go negative) and returns how
+    long the caller has to wait for them, so callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            # A request larger than the bucket only waits for a full bucket
+            self._tokens -= min(amount, self.capacity)
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        """
+        Gives back `amount` tokens (negative to charge more).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-second and tokens-per-minute buckets in front of every Mistral call.
+    A 429 with Retry-After pauses all callers until the provider accepts requests again.
+    """
+
+    def __init__(self, max_rps: float = MISTRAL_MAX_RPS, max_tpm: float = MISTRAL_MAX_TPM):
+        self.requests = TokenBucket(max_rps, max(1.0, max_rps)) if max_rps > 0 else None
+        self.tokens = TokenBucket(max_tpm / 60.0, max_tpm) if max_tpm > 0 else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(tokens))
+        with self._lock:
+            return max(delay, self._paused_until - time.monotonic())
+
+    @staticmethod
+    def _record_wait(delay: float) -> None:
+        pipeline_metrics.increment("rate_limit_waits")
+        # Counters are integers (see AIPipelineMetricsResponse): the wait is recorded in milliseconds
+        pipeline_metrics.increment("rate_limit_wait_ms", round(delay * 1000))
+
+    def acquire(self, tokens: int) -> None:
+        delay = self._reserve(tokens)
+        if delay > 0:
+            self._record_wait(delay)
+            with timed_stage("rate_limit_wait"):
+                time.sleep(delay)
+
+    async def acquire_async(self, tokens: int) -> None:
+        delay = self._reserve(tokens)
+        if delay > 0:
+            self._record_wait(delay)
+            with timed_stage("rate_limit_wait"):
+                await asyncio.sleep(delay)
+
+    def settle(self, estimated: int, actual: int | None) -> None:
+        """
+        Corrects the tokens charged for a call once its real usage is known.
+        """
+        if self.tokens is not None and actual is not None:
+            self.tokens.refund(estimated - actual)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        pipeline_metrics.increment("rate_limit_pauses")
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of the traffic over a sliding window, so that throttling
+    does not turn every stage's retries into a retry storm.
+    """
+
+    def __init__(self, ratio: float = LLM_RETRY_BUDGET_RATIO, min_retries: int = LLM_RETRY_BUDGET_MIN,
+                 window_seconds: float = LLM_RETRY_BUDGET_WINDOW_SECONDS):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_seconds = window_seconds
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window_seconds:
+                events.popleft()
+
+    def record_request(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+        pipeline_metrics.increment("llm_requests")
+
+    def try_retry(self) -> bool:
+        """
+        Takes one retry from the budget; False when it is spent.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._retries) < max(self.min_retries, self.ratio * len(self._requests)):
+                self._retries.append(now)
+                pipeline_metrics.increment("llm_retries")
+                return True
+        pipeline_metrics.increment("retry_budget_exhausted")
+        return False
+
+
+limiter = RateLimiter()
+retry_budget = RetryBudget()
+
+
+def estimate_tokens(messages: list) -> int:
+    """
+    Rough token count of a request (~4 characters per token) plus the expected completion.
+    """
+    chars = sum(len(str(m.get("content", ""))) if isinstance(m, dict) else len(str(m)) for m in messages)
+    return chars // 4 + 4 * len(messages) + LLM_OUTPUT_TOKENS_ESTIMATE
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """
+    Seconds requested by the Retry-After header of an HTTP error, if any.
+    """
+    headers = getattr(error, "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_date = parsedate_to_datetime(value)
+        return max(0.0, retry_date.timestamp() - time.time())
+    except (ValueError, TypeError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.TransportError):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def retry_delay(error: Exception, attempt: int) -> float | None:
+    """
+    Seconds to wait before retrying a failed call, or None when it must not be retried
+    (permanent error, attempts exhausted, retry budget spent or not enough deadline left).
+    A Retry-After on a 429 also pauses the limiter for every caller.
+    """
+    if not is_retryable(error):
+        return None
+    retry_after = retry_after_seconds(error)
+    if retry_after is not None and getattr(error, "status_code", None) == 429:
+        limiter.pause(retry_after)
+    if attempt >= LLM_MAX_RETRIES:
+        return None
+    if retry_after is not None:
+        delay = retry_after
+    else:
+        delay = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+    remaining = remaining_budget()
+    if remaining is not None and delay >= remaining:
+        return None
+    if not retry_budget.try_retry():
+        return None
+    return delay
+
+
+def budgeted_retry(retry_state) -> bool:
+    """
+    tenacity `retry` predicate: retries a failed attempt only while the shared budget allows it.
+    """
+    return retry_state.outcome.failed and retry_budget.try_retry()
@@ -1,10 +1,19 @@
 # response_composer.py
 import os
 import json
-from mistralai import Mistral
 from dotenv import load_dotenv, find_dotenv
 from tenacity import retry, stop_after_attempt, wait_exponential
 from circuitbreaker import circuit
+try:
+    from .pipeline_metrics import retry_recorder
+    from .llm_calls import chat_complete, chat_complete_async, chat_stream_async
+    from .rate_limiter import budgeted_retry
+    from .mistral_client import get_client
+except ImportError:
+    from pipeline_metrics import retry_recorder
+    from llm_calls import chat_complete, chat_complete_async, chat_stream_async
+    from rate_limiter import budgeted_retry
+    from mistral_client import get_client
 from langdetect import detect, DetectorFactory
 from langdetect.lang_detect_exception import LangDetectException
 
@@ -17,7 +26,7 @@ API_KEY = os.getenv("MISTRAL_API_KEY")
 if not API_KEY:
     raise ValueError("MISTRAL_API_KEY not found")
 
-client = Mistral(api_key=API_KEY)
+client = get_client()
 
 def detect_language(text: str) -> str:
     """
@@ -31,24 +40,17 @@ def detect_language(text: str) -> str:
     except LangDetectException:
         return 'unknown'
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-@circuit(failure_threshold=3, recovery_timeout=60)
-def compose_response(
-    user_query: str,
-    solution: str,
-    evaluation: dict,
-    escalation_context: dict | None = None
-) -> dict:
-    """
-    Compose final structured response.
-    """
+def _response_language(user_query: str) -> str:
+    detected_lang = detect_language(user_query)
+    return "French" if detected_lang == 'fr' else "English"
 
-    if evaluation.get("escalate"):
-        return compose_escalation_response(user_query, evaluation)
 
+def _build_compose_messages(user_query: str, solution: str) -> list:
+    """
+    Builds the chat messages for the final (non-escalated) response.
+    """
     # Detect language
-    detected_lang = detect_language(user_query)
-    response_lang = "French" if detected_lang == 'fr' else "English"
+    response_lang = _response_language(user_query)
 
     system_prompt = f"""You are a response composer for a technical support AI.
 
@@ -69,7 +71,7 @@ IMPORTANT RULES:
 Do NOT mention internal systems or evaluation scores.
 """
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {
             "role": "user",
@@ -83,25 +85,13 @@ Proposed solution:
         }
     ]
 
-    response = client.chat.complete(
-        model="mistral-small-latest",
-        messages=messages
-    )
-
-    return {
-        "final_response": response.choices[0].message.content,
-        "escalated": False
-    }
-
 
-def compose_escalation_response(user_query: str, evaluation: dict) -> dict:
+def _build_escalation_messages(user_query: str, evaluation: dict) -> list:
     """
-    Safe response when escalation is required
+    Builds the chat messages for the escalation response.
     """
-
     # Detect language
-    detected_lang = detect_language(user_query)
-    response_lang = "French" if detected_lang == 'fr' else "English"
+    response_lang = _response_language(user_query)
 
     system_prompt = f"""You are a support assistant.
 
@@ -116,7 +106,7 @@ Tone:
 - Professional
 """
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {
             "role": "user",
@@ -130,13 +120,106 @@ Detected issues:
         }
     ]
 
-    response = client.chat.complete(
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=budgeted_retry)
+@circuit(failure_threshold=3, recovery_timeout=60)
+def compose_response(
+    user_query: str,
+    solution: str,
+    evaluation: dict,
+    escalation_context: dict | None = None
+) -> dict:
+    """
+    Compose final structured response.
+    """
+
+    if evaluation.get("escalate"):
+        return compose_escalation_response(user_query, evaluation)
+
+    content = chat_complete(
+        "composition", client,
+        model="mistral-small-latest",
+        messages=_build_compose_messages(user_query, solution)
+    )
+
+    return {
+        "final_response": content,
+        "escalated": False
+    }
+
+
+def compose_escalation_response(user_query: str, evaluation: dict) -> dict:
+    """
+    Safe response when escalation is required
+    """
+
+    content = chat_complete(
+        "escalation_composition", client,
+        model="mistral-small-latest",
+        messages=_build_escalation_messages(user_query, evaluation)
+    )
+
+    return {
+        "final_response": content,
+        "escalated": True
+    }
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=budgeted_retry, before_sleep=retry_recorder("composition"))
+@circuit(failure_threshold=3, recovery_timeout=60)
+async def compose_response_async(
+    user_query: str,
+    solution: str,
+    evaluation: dict,
+    escalation_context: dict | None = None
+) -> dict:
+    """
+    Async variant of compose_response, built on the async Mistral client.
+    """
+
+    if evaluation.get("escalate"):
+        return await compose_escalation_response_async(user_query, evaluation)
+
+    content = await chat_complete_async(
+        "composition", client,
+        model="mistral-small-latest",
+        messages=_build_compose_messages(user_query, solution)
+    )
+
+    return {
+        "final_response": content,
+        "escalated": False
+    }
+
+
+@circuit(failure_threshold=3, recovery_timeout=60)
+async def compose_response_stream_async(user_query: str, solution: str):
+    """
+    Streaming variant of compose_response_async: yields the final response text
+    chunk by chunk as Mistral produces it.
+    Not retried, since the first chunks may already have been sent to the client.
+    """
+    async for delta in chat_stream_async(
+        "composition", client,
+        model="mistral-small-latest",
+        messages=_build_compose_messages(user_query, solution)
+    ):
+        yield delta
+
+
+async def compose_escalation_response_async(user_query: str, evaluation: dict) -> dict:
+    """
+    Async variant of compose_escalation_response.
+    """
+
+    content = await chat_complete_async(
+        "escalation_composition", client,
         model="mistral-small-latest",
-        messages=messages
+        messages=_build_escalation_messages(user_query, evaluation)
     )
 
     return {
-        "final_response": response.choices[0].message.content,
+        "final_response": content,
         "escalated": True
     }
 
@@ -0,0 +1,100 @@
+# semantic_cache.py
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+try:
+    from . import pipeline_metrics
+except ImportError:
+    import pipeline_metrics
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+
+class SemanticCache:
+    """
+    Recently answered tickets, looked up by embedding similarity.
+    - An entry is only returned for the same category and above `threshold` (cosine).
+    - Entries expire after `ttl_seconds`; beyond `max_entries` the least recently used is evicted.
+    - Every entry records the knowledge base version it was answered with; when the
+      current version differs (see solutionfinder.get_kb_version) the cache is emptied.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._kb_version = None
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _check_version(self, kb_version) -> None:
+        if kb_version != self._kb_version:
+            if self._entries:
+                pipeline_metrics.increment("semantic_cache_invalidations")
+            self._entries.clear()
+            self._kb_version = kb_version
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, embedding, category, kb_version):
+        """
+        Returns (cached result, similarity) for the closest entry of `category`, or None.
+        """
+        query = self._normalize(embedding)
+        pipeline_metrics.increment("semantic_cache_lookups")
+        with self._lock:
+            self._check_version(kb_version)
+            self._expire(time.monotonic())
+
+            candidates = [(key, entry) for key, entry in self._entries.items() if entry["category"] == category]
+            if candidates:
+                similarities = np.stack([entry["vector"] for _, entry in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    pipeline_metrics.increment("semantic_cache_hits")
+                    return entry["result"], float(similarities[best])
+
+        pipeline_metrics.increment("semantic_cache_misses")
+        return None
+
+    def put(self, embedding, category, result: dict, kb_version) -> None:
+        """
+        Stores a successful result for later near-duplicate tickets.
+        """
+        with self._lock:
+            self._check_version(kb_version)
+            self._entries[self._next_key] = {
+                "vector": self._normalize(embedding),
+                "category": category,
+                "result": result,
+                "created_at": time.monotonic()
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                pipeline_metrics.increment("semantic_cache_evictions")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,162 @@
+# sentiment.py
+import os
+import re
+import math
+import unicodedata
+
+# Local (no network) sentiment scorer for French and English tickets, run next to the precheck.
+# Tickets scored "angry" at or above SENTIMENT_ESCALATION_THRESHOLD go to a human before any LLM call.
+LOCAL_SENTIMENT_ENABLED = os.getenv("LOCAL_SENTIMENT_ENABLED", "1") == "1"
+SENTIMENT_ANGRY_THRESHOLD = float(os.getenv("SENTIMENT_ANGRY_THRESHOLD", "0.6"))
+SENTIMENT_ESCALATION_THRESHOLD = float(os.getenv("SENTIMENT_ESCALATION_THRESHOLD", "0.85"))
+
+# Phrases are matched on lowercased, accent-stripped text; weights add up before squashing to [0, 1].
+# Subject-matter words ("arnaque", "fraud", "lawyer", ...) are not anger on their own: reporting a
+# scam is a normal support request. They only appear inside accusing or threatening phrases.
+ANGER_TERMS = {
+    # French
+    "inadmissible": 1.0, "inacceptable": 1.0, "scandaleux": 1.0, "scandaleuse": 1.0, "scandale": 1.0,
+    "honteux": 1.0, "honteuse": 1.0, "c'est une honte": 1.0, "furieux": 1.0, "furieuse": 1.0,
+    "en colere": 1.0, "exaspere": 1.0, "exasperee": 1.0, "lamentable": 1.0, "minable": 1.0,
+    "est une arnaque": 1.0, "c'est de l'arnaque": 1.0, "bande d'escrocs": 1.0, "vous etes des escrocs": 1.0,
+    "vous etes des voleurs": 1.0, "bande de voleurs": 1.0, "incompetent": 1.0, "incompetents": 1.0,
+    "incompetence": 1.0, "ras le bol": 1.0, "j'en ai marre": 1.0, "marre": 0.6,
+    "je vais porter plainte": 1.0, "porter plainte contre vous": 1.0, "mon avocat va": 1.0, "mon avocat": 0.5,
+    "foutez": 1.0, "foutage de gueule": 1.0, "ridicule": 0.6,
+    "nul": 0.5, "nuls": 0.5, "pas normal": 0.5, "merde": 1.0, "putain": 1.0, "bordel": 0.8,
+    "connard": 1.0, "connards": 1.0,
+    # English
+    "unacceptable": 1.0, "outrageous": 1.0, "disgusting": 1.0, "disgrace": 1.0, "furious": 1.0,
+    "i am angry": 1.0, "i'm angry": 1.0, "so angry": 1.0, "very angry": 1.0, "pissed": 1.0,
+    "is a scam": 1.0, "total scam": 1.0, "you are scammers": 1.0, "you're scammers": 1.0, "pathetic": 1.0,
+    "fed up": 1.0, "sick of": 1.0, "sue you": 1.0, "take legal action": 1.0, "my lawyer will": 1.0,
+    "my lawyer": 0.5, "worst": 0.8, "useless": 0.8,
+    "ridiculous": 0.6, "terrible": 0.6, "awful": 0.6, "wtf": 1.0, "shit": 1.0, "fuck": 1.0,
+    "fucking": 1.0, "bullshit": 1.0, "damn": 0.6, "crap": 0.8,
+}
+# Insults, profanity and threats: without one of them (or shouting) an angry ticket is not
+# escalated before the LLM sees it
+ANGER_MARKERS = {
+    "foutez", "foutage de gueule", "merde", "putain", "bordel", "connard", "connards", "bande d'escrocs",
+    "vous etes des escrocs", "vous etes des voleurs", "bande de voleurs", "je vais porter plainte",
+    "porter plainte contre vous", "mon avocat va", "wtf", "shit", "fuck", "fucking", "bullshit", "crap",
+    "pissed", "you are scammers", "you're scammers", "sue you", "take legal action", "my lawyer will",
+}
+FRUSTRATION_TERMS = {
+    # French
+    "toujours pas": 0.4, "encore une fois": 0.4, "depuis des jours": 0.4, "depuis des semaines": 0.4,
+    "aucune reponse": 0.4, "sans reponse": 0.4, "personne ne": 0.3, "plusieurs fois": 0.3,
+    "troisieme fois": 0.4, "decu": 0.4, "decue": 0.4, "deception": 0.4, "frustre": 0.4,
+    "frustree": 0.4, "frustrant": 0.4, "agace": 0.4, "pas content": 0.5, "pas satisfait": 0.5,
+    "encore": 0.2, "impossible": 0.2, "bloque": 0.2,
+    # English
+    "still not": 0.4, "once again": 0.4, "for days": 0.4, "for weeks": 0.4, "no answer": 0.4,
+    "no response": 0.4, "nobody": 0.3, "several times": 0.3, "third time": 0.4, "disappointed": 0.4,
+    "frustrated": 0.4, "frustrating": 0.4, "annoyed": 0.4, "annoying": 0.4, "not happy": 0.5,
+    "unhappy": 0.5, "again": 0.2, "stuck": 0.2,
+}
+POSITIVE_TERMS = {
+    "merci": 1.0, "super": 1.0, "genial": 1.0, "parfait": 1.0, "bravo": 1.0, "excellent": 1.0,
+    "thanks": 1.0, "thank you": 1.0, "great": 1.0, "awesome": 1.0, "perfect": 1.0, "love": 1.0,
+}
+# A term repeated more than this many times does not add to the score
+MAX_TERM_OCCURRENCES = 2
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower().replace("’", "'"))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _phrase_pattern(terms: dict) -> re.Pattern:
+    # Longest phrases first so "j'en ai marre" wins over "marre"
+    alternatives = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
+
+
+class SentimentScorer:
+    """
+    Lexicon scorer returning the labels of the LLM evaluator (angry, frustrated, neutral, positive)
+    with an anger score in [0, 1]. Shouting (capitals, "!!!") only adds to negative evidence.
+    """
+
+    def __init__(self, angry_threshold: float = SENTIMENT_ANGRY_THRESHOLD,
+                 escalation_threshold: float = SENTIMENT_ESCALATION_THRESHOLD):
+        self.angry_threshold = angry_threshold
+        self.escalation_threshold = escalation_threshold
+        self._anger = _phrase_pattern(ANGER_TERMS)
+        self._frustration = _phrase_pattern(FRUSTRATION_TERMS)
+        self._positive = _phrase_pattern(POSITIVE_TERMS)
+        self._shouted_word = re.compile(r"\b[^\W\d_]{3,}\b")
+
+    @staticmethod
+    def _matches(pattern: re.Pattern, terms: dict, text: str) -> tuple:
+        counts = {}
+        for match in pattern.finditer(text):
+            counts[match.group(0)] = counts.get(match.group(0), 0) + 1
+        weight = sum(terms[term] * min(n, MAX_TERM_OCCURRENCES) for term, n in counts.items())
+        return weight, sorted(counts)
+
+    def _shouting(self, text: str) -> float:
+        words = self._shouted_word.findall(text)
+        shouted = [w for w in words if w.isupper()]
+        intensity = 0.0
+        if len(shouted) >= 2 and len(shouted) >= 0.3 * len(words):
+            intensity += 0.5
+        if "!!" in text or "?!" in text:
+            intensity += 0.3
+        return intensity
+
+    def score(self, text: str) -> dict:
+        normalized = _normalize(text or "")
+        anger, anger_terms = self._matches(self._anger, ANGER_TERMS, normalized)
+        frustration, frustration_terms = self._matches(self._frustration, FRUSTRATION_TERMS, normalized)
+        positive, _ = self._matches(self._positive, POSITIVE_TERMS, normalized)
+
+        raw = anger + frustration
+        shouting = self._shouting(text) if raw > 0 else 0.0
+        score = 1 - math.exp(-(raw + shouting))
+
+        if anger > 0 and score >= self.angry_threshold:
+            label = "angry"
+        elif raw > 0 and (anger > 0 or frustration >= 0.4):
+            label = "frustrated"
+        elif positive > 0:
+            label = "positive"
+        else:
+            label = "neutral"
+        return {
+            "label": label,
+            "score": round(score, 3),
+            "terms": anger_terms + frustration_terms,
+            "marked": shouting > 0 or any(term in ANGER_MARKERS for term in anger_terms)
+        }
+
+    def should_escalate(self, sentiment: dict) -> bool:
+        # A high score alone is not enough: an insult, a threat or shouting must be present
+        return (sentiment["label"] == "angry" and sentiment["score"] >= self.escalation_threshold
+                and sentiment.get("marked", False))
+
+
+def sentiment_agrees(local_label: str | None, llm_label: str | None) -> bool | None:
+    """
+    Whether the local and LLM labels agree on the escalation decision (angry or not);
+    None when either label is missing.
+    """
+    if not local_label or not llm_label:
+        return None
+    return (local_label == "angry") == (llm_label == "angry")
+
+
+if __name__ == "__main__":
+    scorer = SentimentScorer()
+    for sample in [
+        "Bonjour, comment réinitialiser mon mot de passe ?",
+        "Ça fait trois jours que j'attends, toujours pas de réponse. Je suis déçu.",
+        "C'est INADMISSIBLE !!! Votre service est une arnaque, je vais porter plainte.",
+        "This is unacceptable, the worst support ever. I'm FED UP!!",
+        "Thanks, the export works perfectly now.",
+        "How do I report a scam or fraud attempt to your team?",
+    ]:
+        result = scorer.score(sample)
+        print(f"{result['label']:<10} {result['score']:.3f} escalate={scorer.should_escalate(result)}  {sample}")
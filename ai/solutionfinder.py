@@ -1,19 +1,38 @@
 # solution_finder.py
 import os
 import json
+import time
+import asyncio
+import threading
 import numpy as np
 import chromadb
 from chromadb.utils import embedding_functions
-from mistralai import Mistral
+from chromadb.api.types import Documents, Embeddings as ChromaEmbeddings
 from dotenv import load_dotenv, find_dotenv
 try:
     from .pdf_processor import convert_pdf_to_markdown
+    from .pipeline_metrics import timed_stage, retry_recorder, mark_stage_flag
+    from .llm_calls import chat_complete, chat_complete_async, embed, embed_async
+    from .rate_limiter import budgeted_retry
+    from .embedding_cache import EmbeddingCache, CachedEmbeddingFunction
+    from .bm25_index import BM25Index, reciprocal_rank_fusion
+    from .vector_store import VECTOR_STORE_BACKEND, VectorStore, ChromaVectorStore, NumpyVectorStore, copy_vectors, cosine_distance
+    from .mistral_client import get_client
+    from . import pipeline_metrics
 except ImportError:
     from pdf_processor import convert_pdf_to_markdown
+    from pipeline_metrics import timed_stage, retry_recorder, mark_stage_flag
+    from llm_calls import chat_complete, chat_complete_async, embed, embed_async
+    from rate_limiter import budgeted_retry
+    from embedding_cache import EmbeddingCache, CachedEmbeddingFunction
+    from bm25_index import BM25Index, reciprocal_rank_fusion
+    from vector_store import VECTOR_STORE_BACKEND, VectorStore, ChromaVectorStore, NumpyVectorStore, copy_vectors, cosine_distance
+    from mistral_client import get_client
+    import pipeline_metrics
 from langchain_experimental.text_splitter import SemanticChunker
-from langchain_mistralai import MistralAIEmbeddings
+from langchain_core.embeddings import Embeddings
 from tenacity import retry, stop_after_attempt, wait_exponential
-from circuitbreaker import circuit
+from circuitbreaker import circuit, CircuitBreaker, CircuitBreakerError
 
 # Load env
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
@@ -21,41 +40,184 @@ API_KEY = os.getenv("MISTRAL_API_KEY")
 if not API_KEY:
     raise ValueError("MISTRAL_API_KEY not found")
 
-client = Mistral(api_key=API_KEY)
-
-# LangChain embeddings for semantic chunking
-lc_embeddings = MistralAIEmbeddings(model="mistral-embed", api_key=API_KEY)
+# Shared, connection-pooled Mistral client
+client = get_client()
 
 # -----------------------------
 # ChromaDB Setup
 # -----------------------------
-# Initialize ChromaDB client (persistent storage)
 # Path is now relative to this file (ai/chroma_db)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 db_path = os.path.join(current_dir, "chroma_db")
-chroma_client = chromadb.PersistentClient(path=db_path)
+os.makedirs(db_path, exist_ok=True)
+# Memory-mapped NumPy stores (VECTOR_STORE_BACKEND=numpy) live next to the Chroma files
+vector_store_path = os.path.join(db_path, "vectors")
+# ChromaDB client (persistent storage), opened on first use: never with the numpy backend
+_chroma_client = None
+_chroma_lock = threading.Lock()
+
+def get_chroma_client():
+    global _chroma_client
+    with _chroma_lock:
+        if _chroma_client is None:
+            _chroma_client = chromadb.PersistentClient(path=db_path)
+        return _chroma_client
+
+# Hybrid retrieval: dense (Chroma) and lexical (BM25) hits fused by reciprocal rank.
+# Each side is over-fetched to HYBRID_FETCH_K candidates before fusion.
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "1") == "1"
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))
+# Multi-query retrieval: the query and at most MAX_QUERY_VARIANTS - 1 other wordings per search
+MAX_QUERY_VARIANTS = int(os.getenv("MAX_QUERY_VARIANTS", "4"))
+# Degraded mode (embedding circuit open): BM25 hits alone, scored up to this pseudo-similarity
+LEXICAL_ONLY_MAX_SCORE = float(os.getenv("LEXICAL_ONLY_MAX_SCORE", "0.5"))
+
+# Shared by the sync and async embedding requests: after 3 consecutive failures the
+# embedding API is left alone for 60 seconds and retrieval serves lexical hits only.
+embedding_circuit = CircuitBreaker(failure_threshold=3, recovery_timeout=60, name="mistral_embedding")
+
+class PooledMistralEmbeddingFunction(embedding_functions.MistralEmbeddingFunction):
+    """
+    ChromaDB's built-in Mistral embedding function (same name and config), sending its
+    requests with the shared client, through the rate limiter and retry budget.
+    """
+
+    @embedding_circuit
+    def __call__(self, input: Documents) -> ChromaEmbeddings:
+        return [np.array(vector) for vector in embed("embedding", client, model=self.model, inputs=list(input))]
 
-# Use ChromaDB's built-in Mistral embedding function
 # It will automatically use the MISTRAL_API_KEY from the environment
-mistral_ef = embedding_functions.MistralEmbeddingFunction(
+mistral_ef = PooledMistralEmbeddingFunction(
     model="mistral-embed"
 )
 
+class ChunkerEmbeddings(Embeddings):
+    """
+    LangChain view of mistral_ef for the semantic chunker, in batches of `batch_size` texts.
+    """
+
+    def __init__(self, embedding_function, batch_size: int = 50):
+        self.embedding_function = embedding_function
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: list) -> list:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(np.asarray(v, dtype=float).tolist() for v in self.embedding_function(texts[i:i + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+# Embeddings for semantic chunking (ingestion only, not cached)
+lc_embeddings = ChunkerEmbeddings(mistral_ef)
+
+# Query embeddings are cached (in-process LRU, optional on-disk store) and shared by
+# the sync and async paths: the category search, the global fallback and repeated
+# queries embed a given text only once.
+embedding_cache = EmbeddingCache(model="mistral-embed")
+cached_ef = CachedEmbeddingFunction(mistral_ef, embedding_cache)
+# Texts being embedded right now, per event loop: concurrent stages asking for the
+# same text (speculative retrieval, ticket embedding) wait for the same request.
+_pending_embeddings = {}
+
+# Knowledge base version, bumped on every ingestion. Stored next to the Chroma files so
+# that ingestions run from another process (CLI, scripts) are seen too; caches of
+# answers built on the knowledge base compare it before serving an entry.
+kb_version_path = os.path.join(db_path, "kb_version")
+# ((inode, mtime) of the version file, version): the file is only read again when it
+# changes. bump_kb_version replaces the file, so every bump gets a new inode.
+_kb_version = (None, "0")
+
+def get_kb_version() -> str:
+    global _kb_version
+    try:
+        stat = os.stat(kb_version_path)
+    except FileNotFoundError:
+        return "0"
+    signature = (stat.st_ino, stat.st_mtime_ns)
+    if signature != _kb_version[0]:
+        with open(kb_version_path, "r", encoding="utf-8") as f:
+            _kb_version = (signature, f.read().strip())
+    return _kb_version[1]
+
+def bump_kb_version() -> str:
+    version = str(time.time_ns())
+    tmp_path = f"{kb_version_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, kb_version_path)
+    return version
+
 def get_or_create_collection(name="ticket_knowledge_base"):
-    return chroma_client.get_or_create_collection(
+    return get_chroma_client().get_or_create_collection(
         name=name, 
         embedding_function=mistral_ef
     )
 
+# One store per collection name, backend chosen by VECTOR_STORE_BACKEND
+_vector_stores = {}
+_vector_store_lock = threading.Lock()
+
+def get_vector_store(collection_name="ticket_knowledge_base") -> VectorStore:
+    with _vector_store_lock:
+        store = _vector_stores.get(collection_name)
+        if store is None:
+            if VECTOR_STORE_BACKEND == "numpy":
+                store = NumpyVectorStore(vector_store_path, collection_name)
+            else:
+                store = ChromaVectorStore(get_or_create_collection(collection_name))
+            _vector_stores[collection_name] = store
+        return store
+
+def export_to_numpy(collection_name="ticket_knowledge_base") -> NumpyVectorStore:
+    """
+    Copies the chunks and embeddings of the Chroma collection into the NumPy store
+    (to switch an existing knowledge base to VECTOR_STORE_BACKEND=numpy without re-embedding it).
+    """
+    target = NumpyVectorStore(vector_store_path, collection_name)
+    copy_vectors(ChromaVectorStore(get_or_create_collection(collection_name)), target)
+    return target
+
+# BM25 index of each collection, persisted next to the Chroma files
+_lexical_indexes = {}
+_lexical_lock = threading.Lock()
+
+def _lexical_index_path(collection_name: str) -> str:
+    return os.path.join(db_path, f"bm25_{collection_name}.json")
+
+def get_lexical_index(collection_name="ticket_knowledge_base") -> BM25Index:
+    """
+    BM25 index over the chunks of the collection. Loaded from disk, and rebuilt from the
+    collection when it was built for another knowledge base version (e.g. an ingestion
+    made by another process).
+    """
+    kb_version = get_kb_version()
+    with _lexical_lock:
+        index = _lexical_indexes.get(collection_name)
+        if index is not None and index.kb_version == kb_version:
+            return index
+        path = _lexical_index_path(collection_name)
+        if index is None and os.path.exists(path):
+            index = BM25Index.load(path)
+        if index is None or index.kb_version != kb_version:
+            print(f"🔤 Construction de l'index lexical ({collection_name})...")
+            index = BM25Index()
+            index.add(*get_vector_store(collection_name).get_all())
+            index.kb_version = kb_version
+            index.save(path)
+        _lexical_indexes[collection_name] = index
+        return index
+
 # -----------------------------
 # Ingestion
 # -----------------------------
 def ingest_pdf_to_chroma(pdf_path: str, category: str = "general", collection_name="ticket_knowledge_base"):
     """
-    Converts PDF to Markdown via Mistral OCR and stores in ChromaDB.
-    ChromaDB handles the embedding automatically.
+    Converts PDF to Markdown via Mistral OCR and stores the chunks in the vector store
+    (VECTOR_STORE_BACKEND) and the lexical index.
     """
-    collection = get_or_create_collection(collection_name)
+    store = get_vector_store(collection_name)
     
     # 1. Convert PDF to Markdown
     markdown_content = convert_pdf_to_markdown(pdf_path)
@@ -65,80 +227,193 @@ def ingest_pdf_to_chroma(pdf_path: str, category: str = "general", collection_na
     chunks = text_splitter.split_text(markdown_content)
     chunks = [c.strip() for c in chunks if c.strip()]
     
-    # 3. Add to Chroma (Embeddings are handled by mistral_ef automatically)
-    print(f"Ingesting {len(chunks)} chunks into ChromaDB (Category: {category})...")
+    # 3. Embed and add to the vector store
+    print(f"Ingesting {len(chunks)} chunks into the {VECTOR_STORE_BACKEND} vector store (Category: {category})...")
     ids = [f"{os.path.basename(pdf_path)}_{i}" for i in range(len(chunks))]
     metadatas = [{"source": pdf_path, "category": category} for _ in chunks]
     
     # Batching to avoid "Too many inputs" error from Mistral API
     batch_size = 50
+    embeddings = []
     for i in range(0, len(chunks), batch_size):
-        batch_chunks = chunks[i:i + batch_size]
-        batch_ids = ids[i:i + batch_size]
-        batch_metadatas = metadatas[i:i + batch_size]
-        
-        collection.add(
-            documents=batch_chunks,
-            ids=batch_ids,
-            metadatas=batch_metadatas
-        )
+        embeddings.extend(mistral_ef(chunks[i:i + batch_size]))
+    store.add(ids, chunks, embeddings, metadatas)
+
+    # 4. Same chunks in the lexical index, saved with the new knowledge base version
+    lexical_index = get_lexical_index(collection_name)
+    lexical_index.add(ids, chunks, metadatas)
+    lexical_index.kb_version = bump_kb_version()
+    lexical_index.save(_lexical_index_path(collection_name))
     print("Ingestion complete.")
 
 # -----------------------------
 # RAG Core
 # -----------------------------
-def retrieve_from_chroma(query, category: str = None, collection_name="ticket_knowledge_base", k=5):
-    collection = get_or_create_collection(collection_name)
-    
-    # Prepare filter if category is provided
-    where_filter = {"category": category} if category else None
-
-    # ChromaDB handles the query embedding automatically
-    results = collection.query(
-        query_texts=[query],
-        n_results=k,
-        where=where_filter
-    )
-    
-    # Format results to match previous structure
-    formatted_results = []
-    if results['documents']:
-        for i in range(len(results['documents'][0])):
-            # ChromaDB returns distances (lower is better). 
-            # We convert distance to a similarity score (0 to 1).
-            # Common formula: 1 / (1 + distance)
-            distance = results['distances'][0][i] if 'distances' in results and results['distances'] else 1.0
-            similarity = 1.0 / (1.0 + distance)
-            
-            formatted_results.append((
-                similarity,
-                {
-                    "id": results['ids'][0][i],
-                    "content": results['documents'][0][i],
-                    "category": results['metadatas'][0][i].get("category") if results['metadatas'] else "N/A"
-                }
-            ))
-    return formatted_results
+def query_variants(query, variants=None) -> list:
+    """
+    The query followed by its distinct, non-empty variants (e.g. the raw ticket, the summary,
+    the keywords), at most MAX_QUERY_VARIANTS texts.
+    """
+    texts = []
+    for text in [query] + list(variants or []):
+        text = (text or "").strip()
+        if text and text.lower() not in {t.lower() for t in texts}:
+            texts.append(text)
+    return texts[:MAX_QUERY_VARIANTS] or [query]
 
-def generate_answer(query, retrieved_docs):
+def _fuse_hits(store, query_embedding, rankings, k) -> list:
     """
-    Generate grounded answer using retrieved snippets
+    Reciprocal rank fusion of the rankings (the dense hits of the main query first, then
+    those of the other variants and the lexical hits), in fused order. Every hit keeps its
+    dense similarity to the main query as score (computed for the hits it did not return),
+    so the score thresholds downstream keep their meaning.
     """
-    if not retrieved_docs:
-        return "Désolé, je n'ai trouvé aucune information pertinente dans la base de connaissances pour répondre à votre demande."
+    fused = reciprocal_rank_fusion(rankings)[:k]
+    scores = {doc["id"]: score for score, doc in rankings[0]}
+    scores.update(store.similarities(query_embedding, [doc["id"] for _, doc in fused if doc["id"] not in scores]))
+    return [(scores.get(doc["id"], 0.0), doc) for _, doc in fused]
 
-    context = "\n\n".join(
+def _lexical_only_hits(query, category, collection_name, k, keywords) -> list:
+    """
+    Degraded mode, while the embedding circuit is open or when embedding the query
+    failed (timeout, 5xx after retries): BM25 hits alone.
+    """
+    pipeline_metrics.increment("lexical_only_retrievals")
+    mark_stage_flag("lexical_only")
+    hits = get_lexical_index(collection_name).search(query, k, category=category, extra_terms=keywords)
+    top = hits[0][0] if hits else 0.0
+    return [(LEXICAL_ONLY_MAX_SCORE * score / top, doc) for score, doc in hits]
+
+def _hybrid_search(queries, query_embeddings, category, collection_name, k, keywords) -> list:
+    store = get_vector_store(collection_name)
+    fetch_k = max(k, HYBRID_FETCH_K) if HYBRID_RETRIEVAL_ENABLED or len(queries) > 1 else k
+    with timed_stage("vector_search"):
+        rankings = store.query_many(query_embeddings, fetch_k, category=category)
+    if HYBRID_RETRIEVAL_ENABLED:
+        with timed_stage("lexical_search"):
+            lexical_index = get_lexical_index(collection_name)
+            rankings += [
+                lexical_index.search(text, fetch_k, category=category, extra_terms=keywords if i == 0 else None)
+                for i, text in enumerate(queries)
+            ]
+    if len(rankings) == 1:
+        return rankings[0]
+    return _fuse_hits(store, query_embeddings[0], rankings, k)
+
+def retrieve_from_chroma(query, category: str = None, collection_name="ticket_knowledge_base", k=5, keywords=None, variants=None):
+    """
+    Hybrid search: vector hits fused with BM25 hits (query terms plus `keywords`, e.g. the
+    analyser's). `variants` are other wordings of the query (e.g. the raw ticket, the summary):
+    they are embedded together with the query in one request, searched in one store call and
+    fused by reciprocal rank. Falls back to BM25 alone while the embedding circuit is open
+    or when the embedding call fails.
+    """
+    queries = query_variants(query, variants)
+    try:
+        # The query embeddings go through the cache instead of the store's embedding function
+        query_embeddings = cached_ef(queries)
+    except CircuitBreakerError:
+        return _lexical_only_hits(query, category, collection_name, k, keywords)
+    except Exception as e:
+        print(f"⚠️ [RAG] Échec de l'embedding de la requête ({type(e).__name__}), recherche lexicale seule.")
+        pipeline_metrics.increment("embedding_failures")
+        return _lexical_only_hits(query, category, collection_name, k, keywords)
+    return _hybrid_search(queries, query_embeddings, category, collection_name, k, keywords)
+
+@embedding_circuit
+async def _embed_remote_async(texts: list) -> list:
+    return await embed_async("embedding", client, model="mistral-embed", inputs=texts)
+
+async def embed_texts_async(texts: list) -> list:
+    """
+    Embeds several texts (same model as mistral_ef), in input order.
+    Cached texts are served from embedding_cache; the others are sent in a single
+    request with the async Mistral client, unless another stage is already embedding them.
+    """
+    texts = list(texts)
+    vectors = embedding_cache.get_many(texts)
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+    if not missing:
+        return vectors
+
+    loop = asyncio.get_running_loop()
+    waiting = {text: _pending_embeddings[(loop, text)] for text in missing if (loop, text) in _pending_embeddings}
+    to_fetch = [text for text in missing if text not in waiting]
+    futures = {text: loop.create_future() for text in to_fetch}
+    for text, future in futures.items():
+        _pending_embeddings[(loop, text)] = future
+
+    fetched = {}
+    try:
+        if to_fetch:
+            with timed_stage("embedding"):
+                embeddings = await _embed_remote_async(to_fetch)
+            stored = embedding_cache.put_many(to_fetch, embeddings)
+            fetched = dict(zip(to_fetch, stored))
+            for text, vector in fetched.items():
+                futures[text].set_result(vector)
+    except BaseException:
+        for future in futures.values():
+            future.cancel()
+        raise
+    finally:
+        for text in to_fetch:
+            _pending_embeddings.pop((loop, text), None)
+
+    for text, future in waiting.items():
+        await asyncio.wait([future])
+        if future.cancelled():
+            # The stage embedding it was cancelled or failed: embed it here
+            fetched[text] = (await embed_texts_async([text]))[0]
+        else:
+            fetched[text] = future.result()
+    return [vector if vector is not None else fetched[text] for text, vector in zip(texts, vectors)]
+
+async def embed_query_async(query: str):
+    """
+    Embeds a query (see embed_texts_async).
+    """
+    return (await embed_texts_async([query]))[0]
+
+async def retrieve_from_chroma_async(query, category: str = None, collection_name="ticket_knowledge_base", k=5, keywords=None, variants=None):
+    """
+    Async variant of retrieve_from_chroma.
+    The query is embedded with the async Mistral client; the local Chroma and BM25
+    searches run in a worker thread since PersistentClient is sync-only.
+    """
+    queries = query_variants(query, variants)
+    try:
+        query_embeddings = await embed_texts_async(queries)
+    except CircuitBreakerError:
+        return await asyncio.to_thread(_lexical_only_hits, query, category, collection_name, k, keywords)
+    except Exception as e:
+        print(f"⚠️ [RAG] Échec de l'embedding de la requête ({type(e).__name__}), recherche lexicale seule.")
+        pipeline_metrics.increment("embedding_failures")
+        return await asyncio.to_thread(_lexical_only_hits, query, category, collection_name, k, keywords)
+    return await asyncio.to_thread(_hybrid_search, queries, query_embeddings, category, collection_name, k, keywords)
+
+def format_context(retrieved_docs) -> str:
+    """
+    Renders (score, doc) hits as the numbered context block given to the LLM.
+    """
+    return "\n\n".join(
         f"[Doc {i+1} - Catégorie: {doc.get('category', 'N/A')}] {doc['content'][:500]}"
         for i, (_, doc) in enumerate(retrieved_docs)
     )
 
+def _build_answer_messages(query, retrieved_docs) -> list:
+    """
+    Builds the grounded-answer chat messages from the retrieved snippets.
+    """
+    context = format_context(retrieved_docs)
+
     system_prompt = """You are a solution finder for Doxa.
 Use ONLY the provided documents to answer.
 If the information is not in the documents, say clearly that you don't have the information.
 Answer in French.
 """
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {
             "role": "user",
@@ -154,12 +429,33 @@ Answer with a clear solution and short explanation.
         }
     ]
 
-    response = client.chat.complete(
+NO_DOCUMENTS_ANSWER = "Désolé, je n'ai trouvé aucune information pertinente dans la base de connaissances pour répondre à votre demande."
+
+def generate_answer(query, retrieved_docs):
+    """
+    Generate grounded answer using retrieved snippets
+    """
+    if not retrieved_docs:
+        return NO_DOCUMENTS_ANSWER
+
+    return chat_complete(
+        "generation", client,
         model="mistral-small-latest",
-        messages=messages
+        messages=_build_answer_messages(query, retrieved_docs)
     )
 
-    return response.choices[0].message.content
+async def generate_answer_async(query, retrieved_docs):
+    """
+    Async variant of generate_answer.
+    """
+    if not retrieved_docs:
+        return NO_DOCUMENTS_ANSWER
+
+    return await chat_complete_async(
+        "generation", client,
+        model="mistral-small-latest",
+        messages=_build_answer_messages(query, retrieved_docs)
+    )
 
 def is_refusal(answer: str) -> bool:
     """
@@ -180,43 +476,37 @@ def is_refusal(answer: str) -> bool:
 # -----------------------------
 # Main API
 # -----------------------------
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+# Similarity threshold under which the category search falls back to a global search
+SIMILARITY_THRESHOLD = 0.8
+# Speculative retrieval (run on the raw ticket while the analyser is working):
+# number of global hits fetched so that category filtering still leaves enough documents,
+# and minimum embedding similarity between the raw ticket and the optimized query for those
+# hits to be reused (the analyser rewrites the query with synonyms, so word overlap is no guide).
+SPECULATIVE_FETCH_K = 15
+SPECULATIVE_REUSE_SIMILARITY = float(os.getenv("SPECULATIVE_REUSE_SIMILARITY", "0.85"))
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=budgeted_retry)
 @circuit(failure_threshold=3, recovery_timeout=60)
-def solution_finder(query, category: str = None, collection_name="ticket_knowledge_base", top_k=5):
+def solution_finder(query, category: str = None, collection_name="ticket_knowledge_base", top_k=5, keywords=None, variants=None):
     """
-    Finds a solution by searching in the specified category first.
-    If no relevant documents are found OR if the answer is a refusal,
-    it falls back to a global search across all categories.
+    Finds a solution by searching in the specified category and across all categories.
+    The global hits are used when the category ones score under SIMILARITY_THRESHOLD and
+    the global ones score higher; the answer is generated once, on the chosen hits.
+    A refusal is flagged in the result (the caller escalates) instead of generating again.
     """
-    # 1. Try with the specific category
     print(f"🔍 [RAG] Recherche dans la catégorie : {category or 'Toutes'}")
-    retrieved = retrieve_from_chroma(query, category=category, collection_name=collection_name, k=top_k)
-    
-    # Similarity threshold
-    SIMILARITY_THRESHOLD = 0.8
-    best_score = retrieved[0][0] if retrieved else 0
-    
-    answer = generate_answer(query, retrieved)
-    is_fallback = False
-
-    # Check if we should fallback:
-    # - Either the score is too low
-    # - Or the LLM says it didn't find the info in the provided context
-    if category and (best_score < SIMILARITY_THRESHOLD or is_refusal(answer)):
-        reason = "score faible" if best_score < SIMILARITY_THRESHOLD else "information non trouvée dans cette catégorie"
-        print(f"🔄 [RAG] Fallback ({reason}). Recherche élargie à toutes les catégories...")
-        
-        # 2. Fallback: Search in all categories
-        retrieved_global = retrieve_from_chroma(query, category=None, collection_name=collection_name, k=top_k)
-        
-        # Only use global results if they are better or if we had a refusal
-        best_global_score = retrieved_global[0][0] if retrieved_global else 0
-        
-        if best_global_score > best_score or is_refusal(answer):
-            retrieved = retrieved_global
-            answer = generate_answer(query, retrieved)
-            is_fallback = True
+    retrieved = retrieve_from_chroma(query, category=category, collection_name=collection_name, k=top_k, keywords=keywords, variants=variants)
+    # Same query and variants: their embeddings come from the cache
+    retrieved_global = retrieve_from_chroma(query, category=None, collection_name=collection_name, k=top_k, keywords=keywords, variants=variants) if category else None
+
+    hits, is_fallback = select_hits(retrieved, retrieved_global, category)
+    if is_fallback:
+        print("🔄 [RAG] Fallback (score faible). Recherche élargie à toutes les catégories...")
+    answer = generate_answer(query, hits)
+    return build_rag_result(query, hits, answer, is_fallback, refusal=is_refusal(answer))
+
 
+def build_rag_result(query, retrieved, answer, is_fallback, refusal=False) -> dict:
     return {
         "query": query,
         "used_documents": [
@@ -224,19 +514,133 @@ def solution_finder(query, category: str = None, collection_name="ticket_knowled
             for score, doc in retrieved
         ],
         "answer": answer,
-        "fallback_used": is_fallback
+        "fallback_used": is_fallback,
+        "refusal": refusal
     }
 
 
+async def query_differs_async(original: str, candidate: str, threshold: float = SPECULATIVE_REUSE_SIMILARITY) -> bool:
+    """
+    Semantic check used to decide whether hits retrieved for `original` can be reused for `candidate`.
+    Returns True when the cosine similarity of their embeddings is below the threshold.
+    `original` was embedded by the search that produced the hits and `candidate` is embedded
+    for the retrieval anyway, so both usually come from the embedding cache.
+    """
+    if (original or "").strip() == (candidate or "").strip():
+        return False
+    original_embedding, candidate_embedding = await embed_texts_async([original, candidate])
+    return 1.0 - cosine_distance(original_embedding, candidate_embedding) < threshold
+
+
+def _category_hits(prefetched, category, top_k) -> list:
+    """
+    Keeps the prefetched (global) hits belonging to `category`, best first.
+    """
+    if not category:
+        return prefetched[:top_k]
+    return [hit for hit in prefetched if hit[1].get("category") == category][:top_k]
+
+
+def best_score(retrieved) -> float:
+    # Hybrid hits are in fused order, not necessarily by similarity
+    return max((score for score, _ in retrieved), default=0)
+
+
+def needs_fallback(retrieved, category) -> bool:
+    """
+    True when a category search should be widened to all categories (best score under SIMILARITY_THRESHOLD).
+    """
+    return bool(category) and best_score(retrieved) < SIMILARITY_THRESHOLD
+
+
+def select_hits(retrieved, retrieved_global, category):
+    """
+    Picks the global hits over the category ones when the category search needs a
+    fallback (see needs_fallback) and the global hits score higher.
+    Returns (hits, fallback_used).
+    """
+    if (retrieved_global is not None and needs_fallback(retrieved, category)
+            and best_score(retrieved_global) > best_score(retrieved)):
+        mark_stage_flag("fallback_used")
+        return retrieved_global, True
+    return retrieved, False
+
+
+async def retrieve_category_async(query, category: str = None, collection_name="ticket_knowledge_base", top_k=5, prefetched=None, keywords=None, variants=None):
+    """
+    Category-first search of solution_finder_async.
+    `prefetched` may hold category-agnostic hits already retrieved for this query
+    (over-fetched, e.g. SPECULATIVE_FETCH_K); they are then filtered instead of searching again.
+    """
+    print(f"🔍 [RAG] Recherche dans la catégorie : {category or 'Toutes'}")
+    if prefetched is not None:
+        print("⚡ [RAG] Réutilisation des résultats de la recherche spéculative.")
+        return _category_hits(prefetched, category, top_k)
+    return await retrieve_from_chroma_async(query, category=category, collection_name=collection_name, k=top_k, keywords=keywords, variants=variants)
+
+
+async def retrieve_global_async(query, collection_name="ticket_knowledge_base", top_k=5, prefetched=None, keywords=None, variants=None):
+    """
+    Global search used by the fallback (served from `prefetched` when available).
+    """
+    if prefetched is not None:
+        return prefetched[:top_k]
+    with timed_stage("global_retrieval"):
+        return await retrieve_from_chroma_async(query, category=None, collection_name=collection_name, k=top_k, keywords=keywords, variants=variants)
+
+
+async def retrieve_with_fallback_async(query, category: str = None, collection_name="ticket_knowledge_base", top_k=5, prefetched=None, keywords=None, variants=None):
+    """
+    Runs the category and global searches together, before any generation.
+    Both share the query embeddings (concurrent embeddings of a text are deduplicated),
+    and are split from `prefetched` when available. Returns (retrieved, retrieved_global);
+    retrieved_global is None without a category.
+    """
+    if not category:
+        return await retrieve_category_async(query, None, collection_name=collection_name, top_k=top_k, prefetched=prefetched, keywords=keywords, variants=variants), None
+    return await asyncio.gather(
+        retrieve_category_async(query, category, collection_name=collection_name, top_k=top_k, prefetched=prefetched, keywords=keywords, variants=variants),
+        retrieve_global_async(query, collection_name=collection_name, top_k=top_k, prefetched=prefetched, keywords=keywords, variants=variants)
+    )
+
+
+async def generate_with_fallback_async(query, category, retrieved, retrieved_global=None) -> dict:
+    """
+    Generation step of solution_finder_async: the answer is generated once, on the hits
+    chosen by select_hits. A refusal is flagged in the result ("refusal") so the caller
+    escalates instead of generating a second answer.
+    """
+    hits, is_fallback = select_hits(retrieved, retrieved_global, category)
+    if is_fallback:
+        print("🔄 [RAG] Fallback (score faible). Recherche élargie à toutes les catégories...")
+
+    answer = await generate_answer_async(query, hits)
+    refusal = is_refusal(answer)
+    if refusal:
+        print("⚠️ [RAG] Information non trouvée dans les documents retenus.")
+    return build_rag_result(query, hits, answer, is_fallback, refusal=refusal)
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=budgeted_retry, before_sleep=retry_recorder("solution_finder"))
+@circuit(failure_threshold=3, recovery_timeout=60)
+async def solution_finder_async(query, category: str = None, collection_name="ticket_knowledge_base", top_k=5, prefetched=None, keywords=None, variants=None):
+    """
+    Async variant of solution_finder (same selection rules): both searches run
+    concurrently and the answer is generated once.
+    """
+    retrieved, retrieved_global = await retrieve_with_fallback_async(
+        query, category, collection_name=collection_name, top_k=top_k, prefetched=prefetched, keywords=keywords, variants=variants
+    )
+    return await generate_with_fallback_async(query, category, retrieved, retrieved_global)
+
+
 def test_similarity_on_kb_sample(sample_queries, collection_name="ticket_knowledge_base", threshold=0.8):
     """
     Tests similarity scores on sample KB entries.
     Queries the KB with sample queries and asserts that the best similarity score > threshold.
     """
-    collection = get_or_create_collection(collection_name)
-    
-    # Check if collection has documents
-    if collection.count() == 0:
+    # Check if the knowledge base has documents
+    if get_vector_store(collection_name).count() == 0:
         print("❌ KB is empty. Please ingest documents first.")
         return False
     
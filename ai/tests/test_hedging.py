@@ -0,0 +1,100 @@
+import time
+import asyncio
+
+import pytest
+from mistralai import Mistral
+
+from ai import hedging, llm_cache, llm_calls, pipeline_metrics
+from ai.llm_concurrency import limit_llm_calls
+from ai.mock_mistral_server import MockSettings, TEXT_COMPLETION, serve
+
+STAGE = "generation"
+FAST = 0.05
+SLOW = 1.5
+
+
+class ScriptedSettings(MockSettings):
+    """
+    Answers the n-th request after delays[n] seconds, the others after FAST.
+    """
+
+    def __init__(self, delays: list):
+        super().__init__(FAST, 0.0, 0.0, 0.0, 0.0, 0.0)
+        self.delays = list(delays)
+
+    def delay(self) -> float:
+        with self.lock:
+            index = self.requests - 1
+        return self.delays[index] if index < len(self.delays) else FAST
+
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    servers = []
+
+    def start(delays: list, calls_in_window: int = 10, max_rate: float = 0.1):
+        settings = ScriptedSettings(delays)
+        server = serve(0, settings)
+        servers.append(server)
+        # p90 of the samples is FAST: a call still running after 0.2 s (min delay) is hedged
+        policy = hedging.HedgePolicy(min_samples=5, min_delay=0.2, max_rate=max_rate)
+        for _ in range(10):
+            policy.record(STAGE, FAST)
+        for _ in range(calls_in_window):
+            policy.record_call()
+        monkeypatch.setattr(hedging, "LLM_HEDGING_ENABLED", True)
+        monkeypatch.setattr(hedging, "policy", policy)
+        monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+        client = Mistral(api_key="test", server_url=f"http://127.0.0.1:{server.server_address[1]}")
+        return settings, client
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def complete(client, text: str):
+    return llm_calls.chat_complete_async(
+        STAGE, client, model="mistral-small-latest", messages=[{"role": "user", "content": text}]
+    )
+
+
+def test_slow_call_is_hedged_and_fastest_answer_wins(mock_api):
+    settings, client = mock_api([SLOW])
+    won = pipeline_metrics.get_counters().get("hedges_won", 0)
+
+    started = time.perf_counter()
+    content = asyncio.run(complete(client, "first"))
+    elapsed = time.perf_counter() - started
+
+    assert content == TEXT_COMPLETION
+    assert settings.requests == 2
+    # The duplicate went out after the hedge delay and answered before the slow original
+    assert 0.2 + FAST <= elapsed < SLOW
+    assert pipeline_metrics.get_counters()["hedges_won"] == won + 1
+
+
+def test_hedge_rate_cap(mock_api):
+    # 10 calls in the window + 2 slow ones at a 10% cap: only the first slow call is hedged
+    settings, client = mock_api([SLOW, FAST, SLOW], calls_in_window=10, max_rate=0.1)
+
+    async def run():
+        await complete(client, "first")
+        started = time.perf_counter()
+        await complete(client, "second")
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) >= SLOW
+    assert settings.requests == 3
+
+
+def test_no_hedge_without_a_free_slot(mock_api):
+    settings, client = mock_api([SLOW], max_rate=1.0)
+
+    async def run():
+        with limit_llm_calls(1):
+            return await complete(client, "first")
+
+    assert asyncio.run(run()) == TEXT_COMPLETION
+    assert settings.requests == 1
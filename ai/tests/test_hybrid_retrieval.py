@@ -0,0 +1,75 @@
+import os
+import asyncio
+
+import pytest
+
+from ai.bm25_index import BM25Index, reciprocal_rank_fusion
+
+# solutionfinder needs a key to create its client; no request is sent by these tests
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+
+CORPUS = {
+    "refund": ("Pour obtenir un remboursement, ouvrez la page Commandes et cliquez sur Rembourser.", "billing"),
+    "invoice": ("Les factures sont disponibles dans l'espace client, rubrique Facturation.", "billing"),
+    "password": ("Pour réinitialiser votre mot de passe, utilisez le lien Mot de passe oublié.", "account"),
+    "error": ("L'erreur ERR-1042 indique une session expirée : reconnectez-vous.", "technical"),
+}
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add(list(CORPUS), [content for content, _ in CORPUS.values()],
+              [{"category": category} for _, category in CORPUS.values()])
+    return index
+
+
+def doc(doc_id):
+    return {"id": doc_id, "content": CORPUS[doc_id][0], "category": CORPUS[doc_id][1]}
+
+
+def test_bm25_ranks_matching_chunks_and_filters_categories(index):
+    assert [d["id"] for _, d in index.search("remboursement de ma commande", 2)][0] == "refund"
+    assert [d["id"] for _, d in index.search("err-1042", 2)] == ["error"]
+    assert index.search("remboursement", 2, category="account") == []
+    # Analyser keywords extend the query terms
+    assert [d["id"] for _, d in index.search("aide", 1, extra_terms=["factures"])] == ["invoice"]
+
+
+def test_rrf_favours_documents_ranked_well_by_both_retrievers():
+    dense = [(0.9, doc("password")), (0.8, doc("refund")), (0.7, doc("invoice"))]
+    lexical = [(7.0, doc("refund")), (5.0, doc("invoice")), (1.0, doc("error"))]
+
+    fused = [d["id"] for _, d in reciprocal_rank_fusion([dense, lexical])]
+
+    # refund: 1/62 + 1/61 > password: 1/61 alone; invoice (3rd + 2nd) beats error (3rd only)
+    assert fused == ["refund", "invoice", "password", "error"]
+
+
+def test_lexical_only_hits_while_the_embedding_circuit_is_open(index, monkeypatch):
+    sf = pytest.importorskip("ai.solutionfinder")
+    calls = []
+
+    async def failing_embed(*args, **kwargs):
+        calls.append(kwargs.get("inputs"))
+        raise TimeoutError("embedding API down")
+
+    monkeypatch.setattr(sf, "embed_async", failing_embed)
+    monkeypatch.setattr(sf, "get_lexical_index", lambda collection_name="ticket_knowledge_base": index)
+    monkeypatch.setattr(sf, "get_vector_store", lambda *args: pytest.fail("vector store queried"))
+    try:
+        # Failed embeddings degrade to BM25 and open the circuit after 3 failures
+        for query in ["remboursement commande", "remboursement rapide", "remboursement svp"]:
+            hits = asyncio.run(sf.retrieve_from_chroma_async(query, k=2))
+            assert hits[0][1]["id"] == "refund"
+        assert sf.embedding_circuit.opened
+
+        hits = asyncio.run(sf.retrieve_from_chroma_async("mot de passe oublié", k=2))
+
+        # Open circuit: no embedding request, BM25 hits scored up to LEXICAL_ONLY_MAX_SCORE
+        assert len(calls) == 3
+        assert hits[0][1]["id"] == "password"
+        assert hits[0][0] == sf.LEXICAL_ONLY_MAX_SCORE
+        assert all(score <= sf.LEXICAL_ONLY_MAX_SCORE for score, _ in hits)
+    finally:
+        sf.embedding_circuit.reset()
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from ai.pipeline_dag import Node, Outcome, PipelineDAG
+
+
+def node(name, inputs=(), outputs=(), result=None, delay=0.0, log=None, when=None):
+    """
+    Stub node: records its start and end in `log`, waits `delay`, returns `result`
+    (by default its outputs derived from its inputs).
+    """
+    async def run(**kwargs):
+        if log is not None:
+            log.append(f"start:{name}")
+        await asyncio.sleep(delay)
+        if log is not None:
+            log.append(f"end:{name}")
+        if result is not None:
+            return result
+        return {output: f"{name}({','.join(str(kwargs[i]) for i in inputs)})" for output in outputs}
+    return Node(name, run, inputs=tuple(inputs), outputs=tuple(outputs), when=when)
+
+
+def test_nodes_run_in_dependency_order_and_receive_their_inputs():
+    log = []
+    dag = PipelineDAG([
+        node("answer", inputs=("analysis", "context"), outputs=("response",), log=log),
+        node("analysis", inputs=("ticket",), outputs=("analysis",), delay=0.02, log=log),
+        node("retrieval", inputs=("ticket",), outputs=("context",), delay=0.01, log=log),
+    ], initial_inputs=("ticket",))
+
+    run = asyncio.run(dag.run({"ticket": "t"}))
+
+    assert run.values["response"] == "answer(analysis(t),retrieval(t))"
+    # Independent nodes start together; the join waits for both
+    assert log[:2] == ["start:analysis", "start:retrieval"]
+    assert log.index("start:answer") > max(log.index("end:analysis"), log.index("end:retrieval"))
+    assert run.outcome is None and not run.timed_out
+
+
+def test_when_false_skips_the_node_and_sets_its_outputs_to_none():
+    dag = PipelineDAG([
+        node("faq", inputs=("ticket",), outputs=("faq_hit",), when=lambda ticket: ticket == "faq"),
+        node("after", inputs=("faq_hit",), outputs=("done",)),
+    ], initial_inputs=("ticket",))
+
+    run = asyncio.run(dag.run({"ticket": "other"}))
+
+    assert run.skipped == ["faq"]
+    assert run.started == ["after"]
+    assert run.values["faq_hit"] is None
+    assert run.values["done"] == "after(None)"
+
+
+def test_outcome_stops_the_run_and_cancels_siblings():
+    log = []
+    rejected = Outcome({"status": "rejected"})
+    dag = PipelineDAG([
+        node("precheck", inputs=("ticket",), result=rejected, log=log),
+        node("slow", inputs=("ticket",), outputs=("analysis",), delay=5, log=log),
+        node("after", inputs=("analysis",), outputs=("response",), log=log),
+    ], initial_inputs=("ticket",))
+
+    run = asyncio.run(dag.run({"ticket": "t"}))
+
+    assert run.outcome is rejected
+    assert run.cancelled == ["slow"]
+    assert "end:slow" not in log and "start:after" not in log
+
+
+def test_timeout_cancels_running_nodes_and_keeps_produced_values():
+    dag = PipelineDAG([
+        node("fast", inputs=("ticket",), outputs=("analysis",)),
+        node("slow", inputs=("analysis",), outputs=("response",), delay=5),
+    ], initial_inputs=("ticket",))
+
+    run = asyncio.run(dag.run({"ticket": "t"}, timeout=0.1))
+
+    assert run.timed_out
+    assert run.values["analysis"] == "fast(t)"
+    assert "response" not in run.values
+    assert run.cancelled == ["slow"]
+
+
+def test_undeclared_output_is_an_error():
+    dag = PipelineDAG([node("bad", inputs=("ticket",), outputs=("a",), result={"b": 1})], initial_inputs=("ticket",))
+    with pytest.raises(ValueError):
+        asyncio.run(dag.run({"ticket": "t"}))
+
+
+@pytest.mark.parametrize("nodes", [
+    [node("a", inputs=("b",), outputs=("a",)), node("b", inputs=("a",), outputs=("b",))],
+    [node("a", inputs=("missing",), outputs=("a",))],
+    [node("a", outputs=("x",)), node("b", outputs=("x",))],
+])
+def test_invalid_graphs_are_rejected(nodes):
+    with pytest.raises(ValueError):
+        PipelineDAG(nodes)
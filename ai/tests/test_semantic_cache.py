@@ -0,0 +1,68 @@
+import pytest
+
+from ai import semantic_cache
+from ai.semantic_cache import SemanticCache
+
+RESULT = {"status": "Résolu", "response": "Voici la procédure."}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(semantic_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_near_duplicate_of_the_same_category_is_served():
+    cache = SemanticCache(threshold=0.95)
+    cache.put([1.0, 0.0, 0.0], "billing", RESULT, "v1")
+
+    result, similarity = cache.get([0.99, 0.05, 0.0], "billing", "v1")
+    assert result == RESULT and similarity >= 0.95
+    assert cache.get([0.99, 0.05, 0.0], "account", "v1") is None
+    assert cache.get([0.0, 1.0, 0.0], "billing", "v1") is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SemanticCache(ttl_seconds=60)
+    cache.put([1.0, 0.0], "billing", RESULT, "v1")
+
+    clock.now += 59
+    assert cache.get([1.0, 0.0], "billing", "v1") is not None
+    clock.now += 2
+    assert cache.get([1.0, 0.0], "billing", "v1") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(max_entries=2)
+    cache.put([1.0, 0.0, 0.0], "billing", {"id": "a"}, "v1")
+    cache.put([0.0, 1.0, 0.0], "billing", {"id": "b"}, "v1")
+    # A hit makes "a" the most recently used entry
+    assert cache.get([1.0, 0.0, 0.0], "billing", "v1")[0] == {"id": "a"}
+
+    cache.put([0.0, 0.0, 1.0], "billing", {"id": "c"}, "v1")
+
+    assert len(cache) == 2
+    assert cache.get([0.0, 1.0, 0.0], "billing", "v1") is None
+    assert cache.get([1.0, 0.0, 0.0], "billing", "v1")[0] == {"id": "a"}
+    assert cache.get([0.0, 0.0, 1.0], "billing", "v1")[0] == {"id": "c"}
+
+
+def test_knowledge_base_change_empties_the_cache():
+    cache = SemanticCache()
+    cache.put([1.0, 0.0], "billing", RESULT, "v1")
+
+    assert cache.get([1.0, 0.0], "billing", "v2") is None
+    assert len(cache) == 0
+    # Entries answered with the new knowledge base are served again
+    cache.put([1.0, 0.0], "billing", RESULT, "v2")
+    assert cache.get([1.0, 0.0], "billing", "v2") is not None
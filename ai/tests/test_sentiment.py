@@ -0,0 +1,33 @@
+import pytest
+
+from ai.sentiment import SentimentScorer
+
+scorer = SentimentScorer()
+
+
+@pytest.mark.parametrize("ticket", [
+    "How do I report a scam or fraud attempt to your team?",
+    "Comment signaler une arnaque ou une escroquerie sur mon compte ?",
+    "I received a phishing email, is it a fraud? My lawyer asked me to check with you.",
+    "Je pense être victime d'une escroquerie, comment porter plainte et bloquer ma carte ?",
+])
+def test_calm_fraud_reports_are_not_escalated(ticket):
+    sentiment = scorer.score(ticket)
+    assert sentiment["label"] != "angry"
+    assert not scorer.should_escalate(sentiment)
+
+
+@pytest.mark.parametrize("ticket", [
+    "C'est INADMISSIBLE !!! Votre service est une arnaque, je vais porter plainte.",
+    "This is unacceptable, the worst support ever. I'm FED UP!!",
+    "You are scammers, this is a total scam and I will sue you.",
+])
+def test_angry_tickets_with_a_marker_are_escalated(ticket):
+    assert scorer.should_escalate(scorer.score(ticket))
+
+
+def test_high_score_without_marker_is_not_escalated():
+    sentiment = scorer.score("C'est inadmissible et scandaleux, un service lamentable.")
+    assert sentiment["label"] == "angry"
+    assert sentiment["score"] >= scorer.escalation_threshold
+    assert not scorer.should_escalate(sentiment)
@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from ai.vector_store import NumpyVectorStore
+
+K = 5
+
+
+@pytest.fixture(scope="module")
+def chunks():
+    """
+    (ids, documents, embeddings, metadatas): 2000 unit vectors around 4 category centres.
+    """
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(4, 64))
+    labels = rng.integers(0, 4, size=2000)
+    embeddings = centres[labels] + 1.5 * rng.normal(size=(2000, 64))
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return ([f"chunk_{i}" for i in range(2000)], [f"Chunk {i}" for i in range(2000)],
+            embeddings.astype(np.float32), [{"category": f"category_{label}"} for label in labels])
+
+
+@pytest.fixture(scope="module")
+def queries(chunks):
+    _, _, embeddings, _ = chunks
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(embeddings), size=20, replace=False)
+    return [embeddings[row] + 0.05 * rng.normal(size=embeddings.shape[1]) for row in rows]
+
+
+def exact_top_k(chunks, query, category=None) -> list:
+    ids, _, embeddings, metadatas = chunks
+    scores = embeddings.astype(np.float64) @ (query / np.linalg.norm(query))
+    if category:
+        scores = np.where([m["category"] == category for m in metadatas], scores, -np.inf)
+    return [ids[row] for row in np.argsort(-scores)[:K]]
+
+
+@pytest.mark.parametrize("quantization", ["none", "float16", "int8"])
+@pytest.mark.parametrize("category", [None, "category_2"])
+def test_quantized_top_k_matches_exact_search(tmp_path, chunks, queries, quantization, category):
+    store = NumpyVectorStore(str(tmp_path), "kb", quantization=quantization)
+    store.add(*chunks)
+
+    for query in queries:
+        hits = store.query(query.tolist(), K, category=category)
+        assert [doc["id"] for _, doc in hits] == exact_top_k(chunks, query, category)
+        if category:
+            assert all(doc["category"] == category for _, doc in hits)
+        # Scores come from the exact float32 rescoring, best first
+        scores = [score for score, _ in hits]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_unknown_category_returns_no_hits(tmp_path, chunks, queries):
+    store = NumpyVectorStore(str(tmp_path), "kb", quantization="int8")
+    store.add(*chunks)
+    assert store.query(queries[0].tolist(), K, category="unknown") == []
+
+
+def test_readers_switch_to_the_new_manifest_atomically(tmp_path, chunks, queries):
+    ids, documents, embeddings, metadatas = chunks
+    writer = NumpyVectorStore(str(tmp_path), "kb")
+    reader = NumpyVectorStore(str(tmp_path), "kb")
+    writer.add(ids[:1000], documents[:1000], embeddings[:1000], metadatas[:1000])
+    assert reader.count() == 1000
+    first_files = set(os.listdir(tmp_path))
+
+    writer.add(ids[1000:], documents[1000:], embeddings[1000:], metadatas[1000:])
+
+    # Another process picks up the new version on its next query
+    assert reader.count() == 2000
+    assert reader.query(queries[0].tolist(), K)[0][1]["id"] == exact_top_k(chunks, queries[0])[0]
+    # The previous version's matrix is removed, the manifest points to existing files only
+    with open(tmp_path / "kb.vectors.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    files = set(os.listdir(tmp_path))
+    assert manifest["matrix"] in files and manifest["matrix"] not in first_files
+    assert not (first_files - {"kb.vectors.json"}) & files
+    assert "kb.vectors.json.tmp" not in files
+
+
+def test_failed_write_keeps_the_previous_version(tmp_path, chunks, monkeypatch):
+    ids, documents, embeddings, metadatas = chunks
+    writer = NumpyVectorStore(str(tmp_path), "kb")
+    writer.add(ids[:1000], documents[:1000], embeddings[:1000], metadatas[:1000])
+
+    def crash(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        writer.add(ids[1000:], documents[1000:], embeddings[1000:], metadatas[1000:])
+    monkeypatch.undo()
+
+    reader = NumpyVectorStore(str(tmp_path), "kb")
+    assert reader.count() == 1000
+    assert reader.get_all()[0] == ids[:1000]
@@ -0,0 +1,379 @@
+# vector_store.py
+import os
+import json
+import time
+import threading
+import numpy as np
+
+# "chroma": Chroma collection (HNSW index in SQLite files)
+# "numpy": normalized float32 matrix memory-mapped from disk, searched by brute force
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+CHROMA_ADD_BATCH = 1000
+# Matrix scanned by the numpy backend: "none" (float32), "float16", or "int8" with one scale
+# per vector. The float32 vectors stay on disk to rescore the best candidates exactly.
+VECTOR_STORE_QUANTIZATION = os.getenv("VECTOR_STORE_QUANTIZATION", "none")
+# Candidates rescored in full precision: k * VECTOR_STORE_RESCORE_FACTOR
+VECTOR_STORE_RESCORE_FACTOR = int(os.getenv("VECTOR_STORE_RESCORE_FACTOR", "4"))
+QUANTIZATION_DTYPES = {"float16": np.float16, "int8": np.int8}
+# Rows converted to float32 at a time when scanning a quantized matrix (the block stays in cache)
+SCAN_BLOCK_ROWS = 256
+
+
+def similarity_from_distance(distance: float) -> float:
+    # Chroma returns distances (cosine space of the Mistral embedding function: 1 - cosine),
+    # lower is better: converted to a 0-1 similarity
+    return 1.0 / (1.0 + distance)
+
+
+def cosine_distance(a, b) -> float:
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    return 1.0 - float(np.dot(a, b) / max(np.linalg.norm(a) * np.linalg.norm(b), 1e-12))
+
+
+def _normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(matrix: np.ndarray, quantization: str) -> tuple:
+    """
+    (quantized matrix, per-row scales or None) of a float32 matrix.
+    int8: symmetric, row / scale rounded to [-127, 127] with scale = max(|row|) / 127.
+    """
+    if quantization == "float16":
+        return matrix.astype(np.float16), None
+    if quantization == "int8":
+        scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12).astype(np.float32) / 127.0
+        return np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8), scales
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+
+class VectorStore:
+    """
+    Knowledge base chunks and their embeddings, searched by embedding.
+    Hits are (similarity, {"id", "content", "category"}) tuples, best first, with the
+    similarity on the scale of the Chroma backend (see similarity_from_distance).
+    """
+
+    def add(self, ids: list, documents: list, embeddings: list, metadatas: list) -> None:
+        raise NotImplementedError
+
+    def query(self, query_embedding, k: int = 5, category: str = None) -> list:
+        return self.query_many([query_embedding], k, category)[0]
+
+    def query_many(self, query_embeddings: list, k: int = 5, category: str = None) -> list:
+        """
+        Hits of several query embeddings searched together (one list of hits per query).
+        """
+        raise NotImplementedError
+
+    def similarities(self, query_embedding, ids: list) -> dict:
+        """
+        Similarity of the given chunks to the query embedding (ids missing from the store are left out).
+        """
+        raise NotImplementedError
+
+    def get_all(self) -> tuple:
+        """
+        (ids, documents, metadatas) of every chunk.
+        """
+        raise NotImplementedError
+
+    def get_embeddings(self) -> tuple:
+        """
+        (ids, embeddings) of every chunk.
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, collection):
+        self.collection = collection
+
+    @staticmethod
+    def format_results(results, query_index: int = 0) -> list:
+        """
+        Converts the hits of one query of a raw collection.query() result into (similarity, doc) tuples.
+        """
+        formatted_results = []
+        if results['documents']:
+            q = query_index
+            for i in range(len(results['documents'][q])):
+                distance = results['distances'][q][i] if 'distances' in results and results['distances'] else 1.0
+                formatted_results.append((
+                    similarity_from_distance(distance),
+                    {
+                        "id": results['ids'][q][i],
+                        "content": results['documents'][q][i],
+                        "category": results['metadatas'][q][i].get("category") if results['metadatas'] else "N/A"
+                    }
+                ))
+        return formatted_results
+
+    def add(self, ids, documents, embeddings, metadatas) -> None:
+        # Chroma rejects batches above its maximum batch size (a few thousand records)
+        for i in range(0, len(ids), CHROMA_ADD_BATCH):
+            self.collection.upsert(
+                ids=ids[i:i + CHROMA_ADD_BATCH],
+                documents=documents[i:i + CHROMA_ADD_BATCH],
+                embeddings=[list(map(float, e)) for e in embeddings[i:i + CHROMA_ADD_BATCH]],
+                metadatas=metadatas[i:i + CHROMA_ADD_BATCH]
+            )
+
+    def query_many(self, query_embeddings, k=5, category=None) -> list:
+        results = self.collection.query(
+            query_embeddings=[list(map(float, e)) for e in query_embeddings],
+            n_results=k,
+            where={"category": category} if category else None
+        )
+        return [self.format_results(results, i) for i in range(len(query_embeddings))]
+
+    def similarities(self, query_embedding, ids) -> dict:
+        if not ids:
+            return {}
+        stored = self.collection.get(ids=ids, include=["embeddings"])
+        return {
+            doc_id: similarity_from_distance(cosine_distance(embedding, query_embedding))
+            for doc_id, embedding in zip(stored["ids"], stored["embeddings"])
+        }
+
+    def get_all(self) -> tuple:
+        stored = self.collection.get(include=["documents", "metadatas"])
+        return stored["ids"], stored["documents"], stored["metadatas"]
+
+    def get_embeddings(self) -> tuple:
+        stored = self.collection.get(include=["embeddings"])
+        return stored["ids"], stored["embeddings"]
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+class _NumpySnapshot:
+    """
+    One loaded version of a NumpyVectorStore (replaced as a whole on reload).
+    """
+
+    def __init__(self, ids: list, documents: list, categories: list, matrix: np.ndarray,
+                 quantized: np.ndarray = None, scales: np.ndarray = None):
+        self.ids = ids
+        self.documents = documents
+        self.categories = categories
+        self.matrix = matrix
+        self.quantized = quantized
+        self.scales = scales
+        self.rows = {doc_id: row for row, doc_id in enumerate(ids)}
+        labels = np.array(categories, dtype=object)
+        self.masks = {category: labels == category for category in set(categories)}
+
+    def approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarities (rows x queries) of every row to the normalized queries, on the quantized matrix.
+        """
+        scores = np.empty((len(self.ids), len(queries)), dtype=np.float32)
+        block = np.empty((SCAN_BLOCK_ROWS, self.quantized.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.ids), SCAN_BLOCK_ROWS):
+            rows = self.quantized[start:start + SCAN_BLOCK_ROWS]
+            np.copyto(block[:len(rows)], rows, casting="unsafe")
+            scores[start:start + len(rows)] = block[:len(rows)] @ queries.T
+        return scores * self.scales[:, None] if self.scales is not None else scores
+
+    def hit(self, row: int, cosine: float) -> tuple:
+        # Same cosine distance as the Chroma collection
+        return (
+            similarity_from_distance(1.0 - cosine),
+            {"id": self.ids[row], "content": self.documents[row], "category": self.categories[row]}
+        )
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Brute-force store for knowledge bases of up to ~100k chunks:
+    - the L2-normalized embeddings live in a float32 file memory-mapped read-only, so
+      every worker process shares the same page cache instead of holding its own copy;
+    - a query is one matrix-vector product and an argpartition of the top k (several
+      queries searched together share one matrix-matrix product);
+    - category filters use boolean row masks computed when the store is loaded.
+    With a quantization (float16, int8), the query scans a quantized copy of the matrix
+    (2x / 4x smaller) and only the k * rescore_factor best rows are read from the float32
+    file and rescored exactly; the float32 pages of the other rows are never touched.
+    Writes (ingestion) rewrite the matrices under a new version name and then replace the
+    JSON manifest atomically; other processes reload on their next query.
+    """
+
+    def __init__(self, directory: str, name: str = "ticket_knowledge_base",
+                 quantization: str = VECTOR_STORE_QUANTIZATION, rescore_factor: int = VECTOR_STORE_RESCORE_FACTOR):
+        if quantization != "none" and quantization not in QUANTIZATION_DTYPES:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.directory = directory
+        self.name = name
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.manifest_path = os.path.join(directory, f"{name}.vectors.json")
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._current = _NumpySnapshot([], [], [], np.zeros((0, 0), dtype=np.float32))
+        os.makedirs(directory, exist_ok=True)
+
+    def _memmap(self, filename: str, dtype, shape: tuple) -> np.ndarray:
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, filename), dtype=dtype, mode="r", shape=shape)
+
+    def _snapshot(self) -> _NumpySnapshot:
+        """
+        The loaded store, reloaded first when the manifest changed on disk.
+        """
+        with self._lock:
+            try:
+                mtime = os.stat(self.manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                return self._current
+            if mtime != self._manifest_mtime:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                n, dim = len(manifest["ids"]), manifest["dim"]
+                matrix = self._memmap(manifest["matrix"], np.float32, (n, dim))
+                quantized = scales = None
+                if self.quantization != "none":
+                    stored = manifest.get("quantized", {}).get(self.quantization)
+                    if stored:
+                        quantized = self._memmap(stored["matrix"], QUANTIZATION_DTYPES[self.quantization], (n, dim))
+                        scales = self._memmap(stored["scales"], np.float32, (n,)) if stored.get("scales") else None
+                    else:
+                        # Written with another quantization: quantized in memory until the next write
+                        quantized, scales = quantize(np.asarray(matrix), self.quantization)
+                self._current = _NumpySnapshot(
+                    manifest["ids"], manifest["documents"], manifest["categories"], matrix, quantized, scales
+                )
+                self._manifest_mtime = mtime
+            return self._current
+
+    def add(self, ids, documents, embeddings, metadatas) -> None:
+        current = self._snapshot()
+        vectors = _normalize_rows(embeddings)
+        replaced = set(ids)
+        keep = [row for row, doc_id in enumerate(current.ids) if doc_id not in replaced]
+        matrix = np.concatenate([np.asarray(current.matrix[keep]), vectors]) if keep else vectors
+
+        version = str(time.time_ns())
+        manifest = {
+            "matrix": f"{self.name}.{version}.f32",
+            "dim": int(matrix.shape[1]),
+            "ids": [current.ids[row] for row in keep] + list(ids),
+            "documents": [current.documents[row] for row in keep] + list(documents),
+            "categories": [current.categories[row] for row in keep] + [(m or {}).get("category") for m in metadatas],
+            "quantized": {},
+        }
+        matrix.astype(np.float32).tofile(os.path.join(self.directory, manifest["matrix"]))
+        if self.quantization != "none":
+            quantized, scales = quantize(matrix, self.quantization)
+            stored = {"matrix": f"{self.name}.{version}.{self.quantization}"}
+            quantized.tofile(os.path.join(self.directory, stored["matrix"]))
+            if scales is not None:
+                stored["scales"] = f"{self.name}.{version}.scales"
+                scales.tofile(os.path.join(self.directory, stored["scales"]))
+            manifest["quantized"][self.quantization] = stored
+
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+        self._snapshot()
+        self._remove_stale_files(version)
+
+    def _remove_stale_files(self, version: str) -> None:
+        prefix = f"{self.name}."
+        for filename in os.listdir(self.directory):
+            file_version = filename[len(prefix):].split(".")[0] if filename.startswith(prefix) else ""
+            if file_version.isdigit() and file_version != version:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    # Still mapped by a process (Windows): removed by a later ingestion
+                    pass
+
+    def query_many(self, query_embeddings, k=5, category=None) -> list:
+        current = self._snapshot()
+        if not len(current.ids) or not len(query_embeddings):
+            return [[] for _ in query_embeddings]
+        queries = _normalize_rows(query_embeddings)
+        if current.quantized is None:
+            scores = current.matrix @ queries.T
+        else:
+            scores = current.approximate_scores(queries)
+        if category:
+            mask = current.masks.get(category)
+            if mask is None:
+                return [[] for _ in query_embeddings]
+            scores = np.where(mask[:, None], scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(current.ids))
+        if k <= 0:
+            return [[] for _ in query_embeddings]
+        if current.quantized is None:
+            return [
+                [current.hit(int(row), float(column[row])) for row in _top_rows(column, k)]
+                for column in scores.T
+            ]
+
+        # Exact rescoring of the best candidates, read in row order from the float32 file
+        results = []
+        for query, column in zip(queries, scores.T):
+            candidates = np.sort(_top_rows(column, min(len(column), k * self.rescore_factor)))
+            if category:
+                candidates = candidates[np.isfinite(column[candidates])]
+            exact = np.asarray(current.matrix[candidates]) @ query
+            results.append([current.hit(int(candidates[i]), float(exact[i])) for i in _top_rows(exact, min(k, len(candidates)))])
+        return results
+
+    def similarities(self, query_embedding, ids) -> dict:
+        current = self._snapshot()
+        rows = [(doc_id, current.rows[doc_id]) for doc_id in ids if doc_id in current.rows]
+        if not rows:
+            return {}
+        scores = np.asarray(current.matrix[[row for _, row in rows]]) @ _normalize_rows(query_embedding)
+        return {doc_id: current.hit(row, float(score))[0] for (doc_id, row), score in zip(rows, scores)}
+
+    def get_all(self) -> tuple:
+        current = self._snapshot()
+        return list(current.ids), list(current.documents), [{"category": c} for c in current.categories]
+
+    def get_embeddings(self) -> tuple:
+        current = self._snapshot()
+        return list(current.ids), np.asarray(current.matrix)
+
+    def count(self) -> int:
+        return len(self._snapshot().ids)
+
+    def scanned_bytes(self) -> int:
+        """
+        Size of the matrix read by every query (the quantized one and its scales, if any).
+        """
+        current = self._snapshot()
+        if current.quantized is None:
+            return current.matrix.nbytes
+        return current.quantized.nbytes + (current.scales.nbytes if current.scales is not None else 0)
+
+
+def copy_vectors(source: VectorStore, target: VectorStore) -> int:
+    """
+    Copies every chunk of `source`, with its stored embedding, into `target` (no re-embedding).
+    Returns the number of chunks copied.
+    """
+    ids, documents, metadatas = source.get_all()
+    embedding_ids, embeddings = source.get_embeddings()
+    by_id = dict(zip(embedding_ids, embeddings))
+    if ids:
+        target.add(list(ids), list(documents), [by_id[doc_id] for doc_id in ids], list(metadatas))
+    return len(ids)
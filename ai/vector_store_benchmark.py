@@ -0,0 +1,197 @@
+"""
+Vector store benchmark: the same chunks searched through the Chroma collection and the
+memory-mapped NumPy store (see vector_store.py), unquantized and quantized. Reports the
+p50/p95 query latency of each backend, its recall@k against an exact float64 brute-force
+search, its overlap with the Chroma hits (what retrieve_from_chroma serves today) and the
+size of the matrix scanned by every query.
+
+    python vector_store_benchmark.py --synthetic 20000 --queries 200 --k 5 --quantization none,int8
+    python vector_store_benchmark.py --queries 200 --json vectors.json   # current knowledge base
+    python vector_store_benchmark.py --export                            # Chroma -> NumPy store
+
+Queries are stored embeddings plus Gaussian noise, every other one filtered on the
+category of its source chunk, as the category search of the pipeline does.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import numpy as np
+import chromadb
+
+try:
+    from .vector_store import ChromaVectorStore, NumpyVectorStore, copy_vectors, VECTOR_STORE_RESCORE_FACTOR
+except ImportError:
+    from vector_store import ChromaVectorStore, NumpyVectorStore, copy_vectors, VECTOR_STORE_RESCORE_FACTOR
+
+AI_DIR = os.path.dirname(os.path.abspath(__file__))
+# Same locations as solutionfinder.py (not imported: it needs the Mistral credentials)
+DB_PATH = os.path.join(AI_DIR, "chroma_db")
+VECTOR_STORE_PATH = os.path.join(DB_PATH, "vectors")
+COLLECTION_NAME = "ticket_knowledge_base"
+# mistral-embed
+EMBEDDING_DIM = 1024
+
+
+def synthetic_chunks(n: int, dim: int, categories: int, seed: int = 0) -> tuple:
+    """
+    (ids, documents, embeddings, metadatas) of n unit vectors grouped around one centre per
+    category, like the embeddings of a knowledge base.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(categories, dim))
+    labels = rng.integers(0, categories, size=n)
+    embeddings = centres[labels] + 1.5 * rng.normal(size=(n, dim))
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    ids = [f"chunk_{i}" for i in range(n)]
+    return ids, [f"Synthetic chunk {i}" for i in range(n)], embeddings.astype(np.float32), \
+        [{"category": f"category_{label}"} for label in labels]
+
+
+def make_queries(ids, embeddings, metadatas, count: int, noise: float = 0.05, seed: int = 1) -> list:
+    """
+    [(query_embedding, category or None)]: noisy copies of random chunks.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(ids), size=count, replace=count > len(ids))
+    queries = []
+    for i, row in enumerate(rows):
+        vector = np.asarray(embeddings[row], dtype=np.float64) + noise * rng.normal(size=len(embeddings[row]))
+        vector /= np.linalg.norm(vector)
+        queries.append((vector.astype(np.float32), metadatas[row].get("category") if i % 2 else None))
+    return queries
+
+
+def exact_top_k(ids, embeddings, metadatas, queries, k: int) -> list:
+    """
+    Ids of the k nearest chunks (cosine distance, float64) of every query.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float64)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    categories = np.array([m.get("category") for m in metadatas], dtype=object)
+    results = []
+    for query, category in queries:
+        query = np.asarray(query, dtype=np.float64)
+        distances = 1.0 - matrix @ (query / np.linalg.norm(query))
+        if category:
+            distances = np.where(categories == category, distances, np.inf)
+        order = np.argsort(distances)[:k]
+        results.append({ids[row] for row in order if np.isfinite(distances[row])})
+    return results
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def overlap(found: list, expected: list) -> float:
+    return sum(len(f & e) for f, e in zip(found, expected)) / max(1, sum(len(e) for e in expected))
+
+
+def run_backend(store, queries, expected, k: int, runs: int) -> tuple:
+    """
+    Latency percentiles over `runs` passes on the queries (after one warm-up pass) and recall@k,
+    with the ids found for every query.
+    """
+    found = [{doc["id"] for _, doc in store.query(query.tolist(), k, category=category)} for query, category in queries]
+    latencies = []
+    for _ in range(runs):
+        for query, category in queries:
+            start = time.perf_counter()
+            store.query(query.tolist(), k, category=category)
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "recall_at_k": overlap(found, expected),
+    }, found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Chroma vs memory-mapped NumPy vector store benchmark")
+    parser.add_argument("--synthetic", type=int, default=None, metavar="N",
+                        help="benchmark N synthetic chunks instead of the current knowledge base")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="dimension of the synthetic embeddings")
+    parser.add_argument("--categories", type=int, default=8, help="number of synthetic categories")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3, help="timed passes over the queries")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--quantization", default="none,float16,int8",
+                        help="comma-separated quantizations of the NumPy store to benchmark")
+    parser.add_argument("--rescore-factor", type=int, default=VECTOR_STORE_RESCORE_FACTOR,
+                        help="candidates rescored in full precision: k * this factor")
+    parser.add_argument("--export", action="store_true",
+                        help="copy the Chroma collection into the NumPy store (VECTOR_STORE_BACKEND=numpy) and exit")
+    parser.add_argument("--json", dest="json_path", default=None, help="write the results to this file")
+    args = parser.parse_args()
+
+    if args.export:
+        collection = chromadb.PersistentClient(path=DB_PATH).get_or_create_collection(args.collection)
+        copied = copy_vectors(ChromaVectorStore(collection), NumpyVectorStore(VECTOR_STORE_PATH, args.collection))
+        print(f"✅ {copied} chunks copied to {VECTOR_STORE_PATH}")
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix="vector_store_benchmark_")
+    try:
+        chroma_dir = os.path.join(workdir, "chroma")
+        if args.synthetic:
+            ids, documents, embeddings, metadatas = synthetic_chunks(args.synthetic, args.dim, args.categories)
+            # Same distance as the knowledge base collection (cosine space of the Mistral embedding function)
+            collection = chromadb.PersistentClient(path=chroma_dir).get_or_create_collection(
+                args.collection, metadata={"hnsw:space": "cosine"}
+            )
+            chroma = ChromaVectorStore(collection)
+            chroma.add(ids, documents, embeddings, metadatas)
+        else:
+            chroma_dir = DB_PATH
+            collection = chromadb.PersistentClient(path=DB_PATH).get_or_create_collection(args.collection)
+            chroma = ChromaVectorStore(collection)
+            ids, documents, metadatas = chroma.get_all()
+            embedding_ids, stored = chroma.get_embeddings()
+            by_id = dict(zip(embedding_ids, stored))
+            embeddings = np.asarray([by_id[doc_id] for doc_id in ids], dtype=np.float32)
+        if not ids:
+            print("❌ KB is empty. Please ingest documents first (or use --synthetic N).")
+            return 1
+
+        queries = make_queries(ids, embeddings, metadatas, args.queries)
+        expected = exact_top_k(ids, embeddings, metadatas, queries, args.k)
+        result, chroma_found = run_backend(chroma, queries, expected, args.k, args.runs)
+        results = {"chroma": {**result, "chroma_overlap": 1.0, "scanned_bytes": None, "disk_bytes": directory_size(chroma_dir)}}
+
+        for quantization in args.quantization.split(","):
+            store = NumpyVectorStore(os.path.join(workdir, quantization), args.collection,
+                                     quantization=quantization, rescore_factor=args.rescore_factor)
+            store.add(ids, documents, embeddings, metadatas)
+            result, found = run_backend(store, queries, expected, args.k, args.runs)
+            results[f"numpy-{quantization}"] = {
+                **result, "chroma_overlap": overlap(found, chroma_found),
+                "scanned_bytes": store.scanned_bytes(), "disk_bytes": directory_size(store.directory)
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{len(ids)} chunks, dim {len(embeddings[0])}, {len(queries)} queries x {args.runs} runs, k={args.k}")
+    print(f"  {'backend':<14} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9} {'vs chroma':>10} {'scanned MB':>11} {'disk MB':>9}")
+    for name, r in results.items():
+        scanned = f"{r['scanned_bytes'] / 1e6:11.1f}" if r["scanned_bytes"] is not None else f"{'-':>11}"
+        print(f"  {name:<14} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['recall_at_k']:9.3f} "
+              f"{r['chroma_overlap']:10.3f} {scanned} {r['disk_bytes'] / 1e6:9.1f}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "chunks": len(ids), "dim": len(embeddings[0]), "queries": len(queries), "runs": args.runs,
+                "k": args.k, "backends": results
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
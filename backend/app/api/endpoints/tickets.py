@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 import asyncio
+import json
 import time
 import requests
 import uuid
 
 from app.crud import ticket as ticket_crud, user as user_crud
+from app.database import SessionLocal
 from app.dependencies import get_db
 from app.schemas.ticket import (
     TicketCreate, 
@@ -17,13 +20,18 @@ from app.schemas.ticket import (
     AgentResponseResponse,
     AIProcessingRequest,
     AIProcessingStatus,
-    AIPipelineLogResponse
+    AIPipelineLogResponse,
+    AIPipelineMetricsResponse
 )
 from app.models.ticket import TicketStatus, TicketType
-from app.services.ai_service import process_user_request
+
+from app.services.ai_service import process_user_request_async, get_pipeline_metrics, AI_DEADLINE_SECONDS
 
 router = APIRouter(prefix="/tickets", tags=["tickets"])
 
+# Marge laissée au pipeline au-delà de son délai avant l'abandon (filet de sécurité)
+AI_TIMEOUT_GRACE_SECONDS = 5.0
+
 
 def verify_agent(db: Session, agent_id: int) -> bool:
     """
@@ -585,10 +593,12 @@ async def process_ticket_ai_background(
     start_time = time.time()
     
     try:
-        # Timeout de 30 secondes pour le traitement AI
+        # Le pipeline reçoit un délai (AI_DEADLINE_SECONDS) : à l'expiration il renvoie
+        # la réponse proposée ou une escalade. Le wait_for n'est qu'un filet de sécurité.
+        # Le pipeline est async : il est attendu directement, sans thread dédié
         ai_result = await asyncio.wait_for(
-            asyncio.get_event_loop().run_in_executor(None, process_user_request, ticket_content),
-            timeout=30.0
+            process_user_request_async(ticket_content, deadline_seconds=AI_DEADLINE_SECONDS),
+            timeout=AI_DEADLINE_SECONDS + AI_TIMEOUT_GRACE_SECONDS
         )
         
         processing_time = time.time() - start_time
@@ -630,7 +640,7 @@ async def process_ticket_ai_background(
             log_id=log_id,
             ai_results={},
             processing_time=processing_time,
-            error_message="AI processing timeout (30 seconds)"
+            error_message=f"AI processing timeout ({AI_DEADLINE_SECONDS:.0f} seconds)"
         )
         
         # Notifier via webhook si fourni
@@ -680,7 +690,7 @@ async def process_ticket_ai_background(
     
     **Fonctionnalités:**
     - Traitement en arrière-plan (non-bloquant)
-    - Timeout de 30 secondes
+    - Délai de 30 secondes (AI_DEADLINE_SECONDS) : à l'expiration, réponse partielle ou escalade
     - Sauvegarde automatique des résultats
     - Notification webhook optionnelle
     - Suivi via trace_id
@@ -740,6 +750,113 @@ async def process_ticket_ai(
     }
 
 
+# Tâches de streaming en cours (référence conservée jusqu'à la fin du traitement)
+_streaming_tasks: set[asyncio.Task] = set()
+
+
+def _sse_event(event: str, payload) -> str:
+    """Formate un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.get(
+    "/ai/stream/{ticket_id}",
+    summary="Traiter un ticket avec l'IA en streaming (Server-Sent Events)",
+    description="""
+    Lance le traitement AI d'un ticket et diffuse sa progression en Server-Sent Events.
+    
+    **Événements envoyés:**
+    - **started**: trace_id du traitement
+    - **precheck**, **analysed**, **retrieved**, **evaluated**: progression des étapes du pipeline
+    - **token**: morceau de la réponse finale, diffusé au fil de la génération
+    - **result**: résultat complet du pipeline (identique à /ai/process)
+    - **error**: échec ou timeout (délai AI_DEADLINE_SECONDS dépassé sans résultat)
+    
+    Les résultats sont sauvegardés comme pour /ai/process, même si le client se déconnecte.
+    """
+)
+async def stream_ticket_ai(
+    ticket_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Traite un ticket avec l'IA et diffuse les étapes puis les tokens de la réponse.
+    """
+    ticket = ticket_crud.get_ticket(db=db, ticket_id=ticket_id)
+    if not ticket:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ticket not found",
+        )
+    
+    trace_id = str(uuid.uuid4())
+    log = ticket_crud.create_ai_pipeline_log(db=db, ticket_id=ticket_id, trace_id=trace_id)
+    log_id = log.id
+    ticket_content = f"{ticket.title}\n\n{ticket.description}"
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def on_event(event: str, payload: dict):
+        await queue.put((event, payload))
+    
+    async def run_pipeline():
+        # Session dédiée : le traitement peut survivre à la requête (déconnexion du client)
+        session = SessionLocal()
+        start_time = time.time()
+        try:
+            ai_result = await asyncio.wait_for(
+                process_user_request_async(ticket_content, on_event=on_event, deadline_seconds=AI_DEADLINE_SECONDS),
+                timeout=AI_DEADLINE_SECONDS + AI_TIMEOUT_GRACE_SECONDS
+            )
+            processing_time = time.time() - start_time
+            ticket_crud.update_ai_pipeline_log_with_results(
+                db=session,
+                log_id=log_id,
+                ai_results=ai_result,
+                processing_time=processing_time
+            )
+            ticket_crud.update_ticket_with_ai_results(db=session, ticket_id=ticket_id, ai_results=ai_result)
+            await queue.put(("result", ai_result))
+        except asyncio.TimeoutError:
+            ticket_crud.update_ai_pipeline_log_with_results(
+                db=session,
+                log_id=log_id,
+                ai_results={},
+                processing_time=time.time() - start_time,
+                error_message=f"AI processing timeout ({AI_DEADLINE_SECONDS:.0f} seconds)"
+            )
+            await queue.put(("error", {"status": "timeout", "error": "AI processing timeout"}))
+        except Exception as e:
+            ticket_crud.update_ai_pipeline_log_with_results(
+                db=session,
+                log_id=log_id,
+                ai_results={},
+                processing_time=time.time() - start_time,
+                error_message=str(e)
+            )
+            await queue.put(("error", {"status": "failed", "error": str(e)}))
+        finally:
+            session.close()
+            await queue.put(None)
+    
+    task = asyncio.create_task(run_pipeline())
+    _streaming_tasks.add(task)
+    task.add_done_callback(_streaming_tasks.discard)
+    
+    async def event_stream():
+        yield _sse_event("started", {"ticket_id": ticket_id, "trace_id": trace_id})
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield _sse_event(*item)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get(
     "/ai/status/{ticket_id}",
     response_model=AIProcessingStatus,
@@ -800,6 +917,7 @@ def get_ai_processing_status(
     - Scores de confiance
     - Réponses générées
     - Raisons d'escalade
+    - Durées par étape (analyse, embedding, recherche Chroma, génération, fallback, évaluation, composition)
     """
 )
 def get_ai_pipeline_logs(
@@ -820,3 +938,21 @@ def get_ai_pipeline_logs(
     logs = ticket_crud.get_ai_pipeline_logs_by_ticket(db=db, ticket_id=ticket_id)
     return logs
 
+
+@router.get(
+    "/ai/metrics",
+    response_model=AIPipelineMetricsResponse,
+    summary="Compteurs du pipeline AI",
+    description="""
+    Retourne les compteurs du pipeline AI depuis le démarrage du worker.
+    
+    **Informations incluses:**
+    - Compositions spéculatives lancées, utilisées et gaspillées (escalade)
+    - Taux de gaspillage des compositions spéculatives
+    """
+)
+def get_ai_pipeline_metrics():
+    """
+    Récupère les compteurs du pipeline AI pour le processus courant.
+    """
+    return get_pipeline_metrics()
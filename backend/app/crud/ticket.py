@@ -4,7 +4,7 @@ from datetime import datetime, timezone
 from typing import Optional
 import json
 
-from app.models.ticket import Ticket, TicketType, TicketStatus, TicketFeedback, AIPipelineLog
+from app.models.ticket import Ticket, TicketType, TicketStatus, TicketFeedback, AIPipelineLog, AIPipelineStageTiming
 from app.schemas.ticket import TicketCreate, TicketUpdate, TicketFeedbackCreate, AgentResponseCreate
 from app.services.email_service import email_service
 
@@ -376,6 +376,8 @@ def update_ai_pipeline_log_with_results(
         log.summary = analysis.get("summary")
         log.keywords = json.dumps(analysis.get("keywords", []))
         log.category = analysis.get("category")
+        log.agent_role = analysis.get("agent_role")
+        log.analysis_source = analysis.get("source", "llm")
     
     if "rag_result" in ai_results:
         rag = ai_results["rag_result"]
@@ -392,10 +394,29 @@ def update_ai_pipeline_log_with_results(
     
     if "evaluation" in ai_results:
         eval_data = ai_results["evaluation"]
-        log.confidence_score = eval_data.get("confidence")
+        log.confidence_score = eval_data.get("confidence_score", eval_data.get("confidence"))
         log.sentiment = eval_data.get("sentiment")
         log.sensitive_data_detected = eval_data.get("sensitive_data", False)
     
+    local_sentiment = (ai_results.get("precheck") or {}).get("sentiment")
+    if local_sentiment:
+        log.local_sentiment = local_sentiment.get("label")
+        log.local_sentiment_score = local_sentiment.get("score")
+        log.sentiment_agreement = ai_results.get("sentiment_agreement")
+    
+    if "timings" in ai_results:
+        timings = ai_results["timings"]
+        log.fallback_ran = timings.get("fallback_ran")
+        log.stage_timings = [
+            AIPipelineStageTiming(
+                stage=stage,
+                duration_seconds=entry.get("duration_seconds", 0.0),
+                calls=entry.get("calls", 1),
+                retries=entry.get("retries", 0)
+            )
+            for stage, entry in timings.get("stages", {}).items()
+        ]
+    
     if "status" in ai_results:
         if ai_results["status"] == "escalated":
             log.escalation_reason = ai_results.get("reason", "Unknown")
@@ -1,5 +1,6 @@
 import sys
 import os
+import asyncio
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from fastapi import FastAPI, Request, status
@@ -14,6 +15,15 @@ from app.api.endpoints import users, admin, tickets
 from app.models import user, ticket
 from app.models.user import User
 from app.security import hash_password
+from app.services import ai_service
+
+# Warm up the AI pipeline in the background at startup; /ready answers 503 until it is done
+AI_WARM_UP_ON_STARTUP = os.getenv("AI_WARM_UP_ON_STARTUP", "1") == "1"
+# Failed attempts are retried with exponential backoff (10s, 20s, 40s... up to the max delay);
+# after AI_WARM_UP_MAX_ATTEMPTS the pipeline is built on the first ticket instead
+AI_WARM_UP_RETRY_SECONDS = float(os.getenv("AI_WARM_UP_RETRY_SECONDS", "10"))
+AI_WARM_UP_MAX_RETRY_SECONDS = float(os.getenv("AI_WARM_UP_MAX_RETRY_SECONDS", "300"))
+AI_WARM_UP_MAX_ATTEMPTS = int(os.getenv("AI_WARM_UP_MAX_ATTEMPTS", "5"))
 
 app = FastAPI()
 
@@ -61,6 +71,22 @@ def create_default_admin():
         db.close()
 
 
+async def warm_up_ai():
+    """Warm up the AI pipeline ahead of the first ticket, with a bounded number of attempts"""
+    for attempt in range(1, AI_WARM_UP_MAX_ATTEMPTS + 1):
+        try:
+            steps = await ai_service.warm_up_async()
+            print(f"✅ AI pipeline ready: {steps}")
+            return
+        except Exception as e:
+            if attempt == AI_WARM_UP_MAX_ATTEMPTS:
+                print(f"❌ Error warming up the AI pipeline: {e} (giving up after {attempt} attempts, see /ready)")
+                return
+            delay = min(AI_WARM_UP_MAX_RETRY_SECONDS, AI_WARM_UP_RETRY_SECONDS * 2 ** (attempt - 1))
+            print(f"❌ Error warming up the AI pipeline: {e} (attempt {attempt}/{AI_WARM_UP_MAX_ATTEMPTS}, retrying in {delay:.0f}s)")
+            await asyncio.sleep(delay)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and create default admin on startup"""
@@ -76,6 +102,11 @@ async def startup_event():
     
     create_default_admin()
 
+    if AI_WARM_UP_ON_STARTUP:
+        # Runs on the serving event loop without delaying startup; a ticket arriving
+        # meanwhile waits for the same AgentManager build
+        app.state.ai_warm_up = asyncio.create_task(warm_up_ai())
+
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -108,6 +139,15 @@ def root_from_tc():
     return {"message": "Backend is running 🚀"}
 
 
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 503 until the AI pipeline is warmed up (always ready when warm-up is disabled)"""
+    state = ai_service.readiness()
+    if AI_WARM_UP_ON_STARTUP and not state["ready"]:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=jsonable_encoder(state))
+    return state
+
+
 app.include_router(users.router)
 app.include_router(admin.router)
 app.include_router(tickets.router)
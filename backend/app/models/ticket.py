@@ -99,6 +99,8 @@ class AIPipelineLog(Base):
     summary = Column(String, nullable=True)  # From query analyser
     keywords = Column(Text, nullable=True)  # JSON array of keywords
     category = Column(String, nullable=True)  # Auto-detected category
+    agent_role = Column(String, nullable=True)  # Routing: 'agt_tech', 'agt_sales'
+    analysis_source = Column(String, nullable=True)  # 'llm' (analyser), 'local' (local classifier), 'faq'
 
     # RAG results
     rag_docs = Column(Text, nullable=True)  # JSON array of retrieved documents with scores
@@ -108,6 +110,9 @@ class AIPipelineLog(Base):
     confidence_score = Column(Float, nullable=True)  # 0.0 to 1.0
     sentiment = Column(String, nullable=True)  # 'positive', 'negative', 'neutral', 'angry'
     sensitive_data_detected = Column(Boolean, default=False)
+    local_sentiment = Column(String, nullable=True)  # Local lexicon scorer label, computed before any LLM call
+    local_sentiment_score = Column(Float, nullable=True)  # Anger score of the local scorer (0.0 to 1.0)
+    sentiment_agreement = Column(Boolean, nullable=True)  # Local and LLM labels agree on "angry" (None if no LLM label)
     escalation_reason = Column(String, nullable=True)  # Why it was escalated
 
     # Final response (if AI handled it)
@@ -115,10 +120,12 @@ class AIPipelineLog(Base):
 
     # Processing metadata
     processing_time_seconds = Column(Float, nullable=True)
+    fallback_ran = Column(Boolean, nullable=True)  # Recherche élargie à toutes les catégories
     error_message = Column(Text, nullable=True)
 
     # Relationships
     ticket = relationship("Ticket", back_populates="pipeline_logs")
+    stage_timings = relationship("AIPipelineStageTiming", back_populates="log", cascade="all, delete-orphan")
 
     __table_args__ = (
         # Composite index for efficient queries
@@ -126,14 +133,15 @@ class AIPipelineLog(Base):
     )
 
 
+class AIPipelineStageTiming(Base):
+    """Per-stage latency breakdown of one AI pipeline run"""
+    __tablename__ = "ai_pipeline_stage_timings"
 
+    id = Column(Integer, primary_key=True, index=True)
+    log_id = Column(Integer, ForeignKey("ai_pipeline_logs.id"), nullable=False, index=True)
+    stage = Column(String, nullable=False)  # 'precheck', 'analysis', 'embedding', 'vector_search', 'generation', ...
+    duration_seconds = Column(Float, nullable=False)  # Cumulated wall time of the stage
+    calls = Column(Integer, nullable=False, default=1)  # Number of times the stage ran
+    retries = Column(Integer, nullable=False, default=0)  # Tenacity retries
 
-
-
-
-
-
-
-
-
-
+    log = relationship("AIPipelineLog", back_populates="stage_timings")
@@ -205,6 +205,17 @@ class AIProcessingStatus(BaseModel):
     error_message: str | None = Field(None, description="Message d'erreur si échec")
 
 
+class AIPipelineStageTimingResponse(BaseModel):
+    """Schema pour la durée d'une étape du pipeline AI"""
+    stage: str = Field(..., description="Nom de l'étape (precheck, analysis, embedding, vector_search, generation, fallback, evaluation, composition, ...)")
+    duration_seconds: float = Field(..., description="Durée cumulée de l'étape en secondes")
+    calls: int = Field(1, description="Nombre d'exécutions de l'étape")
+    retries: int = Field(0, description="Nombre de nouvelles tentatives (tenacity)")
+    
+    class Config:
+        from_attributes = True
+
+
 class AIPipelineLogResponse(BaseModel):
     """Schema pour les résultats détaillés du pipeline AI"""
     id: int = Field(..., description="ID du log")
@@ -218,17 +229,30 @@ class AIPipelineLogResponse(BaseModel):
     summary: str | None = Field(None, description="Résumé du ticket")
     keywords: str | None = Field(None, description="Mots-clés (JSON)")
     category: str | None = Field(None, description="Catégorie détectée")
+    agent_role: str | None = Field(None, description="Agent cible (agt_tech, agt_sales)")
+    analysis_source: str | None = Field(None, description="Origine de l'analyse (llm, local, faq)")
     rag_docs: str | None = Field(None, description="Documents RAG utilisés (JSON)")
     proposed_answer: str | None = Field(None, description="Réponse proposée par l'AI")
     confidence_score: float | None = Field(None, description="Score de confiance (0-1)")
     sentiment: str | None = Field(None, description="Sentiment détecté")
     sensitive_data_detected: bool = Field(False, description="Données sensibles détectées")
+    local_sentiment: str | None = Field(None, description="Sentiment détecté localement (avant tout appel LLM)")
+    local_sentiment_score: float | None = Field(None, description="Score de colère du classifieur local (0-1)")
+    sentiment_agreement: bool | None = Field(None, description="Accord des sentiments local et LLM sur la colère")
     escalation_reason: str | None = Field(None, description="Raison de l'escalade")
     final_response: str | None = Field(None, description="Réponse finale de l'AI")
     
     processing_time_seconds: float | None = Field(None, description="Temps de traitement")
+    fallback_ran: bool | None = Field(None, description="Recherche élargie à toutes les catégories")
+    stage_timings: list[AIPipelineStageTimingResponse] = Field(default_factory=list, description="Durées par étape du pipeline")
     error_message: str | None = Field(None, description="Message d'erreur")
     
     class Config:
         from_attributes = True
 
+
+
+class AIPipelineMetricsResponse(BaseModel):
+    """Schema pour les compteurs du pipeline AI (processus courant)"""
+    counters: dict[str, int] = Field(default_factory=dict, description="Compteurs bruts (spéculation, caches, ...)")
+    rates: dict[str, float | None] = Field(default_factory=dict, description="Taux dérivés des compteurs (None si aucun échantillon)")
@@ -1,29 +1,107 @@
 import sys
 import os
+import time
+import asyncio
+import threading
 
 # Add the root directory to sys.path to import from 'ai'
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 if root_path not in sys.path:
     sys.path.append(root_path)
 
-from ai.agent_manager import AgentManager
+# Light modules only (stdlib): the AI stack (chromadb, langchain, Mistral client, models)
+# is imported and built on first use, or by warm_up_async(), so importing the backend stays fast
+# and does not need MISTRAL_API_KEY.
+from ai import pipeline_metrics
+from ai.deadline import Deadline
 
-agent_manager = AgentManager()
+_agent_manager = None
+_agent_manager_lock = threading.Lock()
 
-def process_user_request(content: str):
+
+def get_agent_manager():
+    """
+    Returns the process-wide AgentManager, importing and building the AI stack on first call.
+    """
+    global _agent_manager
+    if _agent_manager is None:
+        with _agent_manager_lock:
+            if _agent_manager is None:
+                from ai.agent_manager import AgentManager
+                _agent_manager = AgentManager()
+    return _agent_manager
+
+
+# Warm-up progress, reported by the readiness endpoint
+_warm_up_state = {"status": "pending", "steps": {}, "duration_seconds": None, "error": None, "attempts": 0}
+
+
+async def warm_up_async() -> dict:
+    """
+    Explicit warm-up hook: builds the AgentManager (in a worker thread), then warms the
+    pipeline on the caller's event loop, the one serving the tickets (collection, language
+    profiles, Mistral connections, FAQ embeddings). Returns the duration of each step.
+    The error of the last failed attempt is kept until an attempt succeeds.
+    """
+    started = time.perf_counter()
+    _warm_up_state.update(status="running", attempts=_warm_up_state["attempts"] + 1)
+    try:
+        agent_manager = await asyncio.to_thread(get_agent_manager)
+        steps = await agent_manager.warm_up_async()
+    except Exception as e:
+        _warm_up_state.update(status="failed", error=f"{type(e).__name__}: {e}")
+        raise
+    _warm_up_state.update(status="ready", steps=steps, error=None,
+                          duration_seconds=round(time.perf_counter() - started, 4))
+    return steps
+
+
+def readiness() -> dict:
+    """
+    Returns the warm-up state; "ready" is True once warm_up_async has completed.
+    """
+    return {"ready": _warm_up_state["status"] == "ready", **_warm_up_state}
+
+# Time budget of one ticket processed through the API
+AI_DEADLINE_SECONDS = float(os.getenv("AI_DEADLINE_SECONDS", "30"))
+
+async def process_user_request_async(content: str, on_event=None, deadline_seconds: float | None = None):
     """
-    Processes the user request through the AI pipeline.
+    Processes the user request through the AI pipeline, awaited on the
+    caller's event loop instead of occupying an executor thread.
     Returns the result from AgentManager.
+    on_event (optional) receives the pipeline progress and token events.
+    deadline_seconds (optional) bounds the pipeline; a best-effort result
+    (answer or escalation) is returned when it expires.
     """
-    return agent_manager.process_ticket(content)
+    deadline = Deadline(deadline_seconds) if deadline_seconds is not None else None
+    # The first request builds the AI stack off the event loop
+    agent_manager = _agent_manager or await asyncio.to_thread(get_agent_manager)
+    return await agent_manager.process_ticket_async(content, on_event=on_event, deadline=deadline)
 
 
-def process_user_request_with_metadata(content: str, trace_id: str = None):
+def get_pipeline_metrics() -> dict:
     """
-    Processes the user request with additional metadata for logging.
-    Returns the result from AgentManager with trace_id included.
+    Returns the process-wide AI pipeline counters with the derived rates.
     """
-    result = agent_manager.process_ticket(content)
-    if trace_id:
-        result['trace_id'] = trace_id
-    return result
+    return {
+        "counters": pipeline_metrics.get_counters(),
+        "rates": {
+            "speculative_composition_waste_rate": pipeline_metrics.ratio(
+                "speculative_composition_wasted", "speculative_composition_started"
+            ),
+            "speculative_retrieval_reuse_rate": pipeline_metrics.ratio(
+                "speculative_retrieval_used", "speculative_retrieval_checks"
+            ),
+            "faq_hit_rate": pipeline_metrics.ratio("faq_hits", "faq_lookups"),
+            "semantic_cache_hit_rate": pipeline_metrics.ratio("semantic_cache_hits", "semantic_cache_lookups"),
+            "llm_cache_hit_rate": pipeline_metrics.ratio("llm_cache_hits", "llm_cache_lookups"),
+            "embedding_cache_hit_rate": pipeline_metrics.ratio("embedding_cache_hits", "embedding_cache_lookups"),
+            "llm_retry_rate": pipeline_metrics.ratio("llm_retries", "llm_requests"),
+            "rate_limit_wait_ms_per_request": pipeline_metrics.ratio("rate_limit_wait_ms", "llm_requests"),
+            "hedge_rate": pipeline_metrics.ratio("hedges_sent", "llm_requests"),
+            "hedge_win_rate": pipeline_metrics.ratio("hedges_won", "hedges_sent"),
+            "local_classifier_hit_rate": pipeline_metrics.ratio("local_classifier_hits", "local_classifier_lookups"),
+            "sentiment_agreement_rate": pipeline_metrics.ratio("sentiment_agreements", "sentiment_comparisons"),
+        },
+    }
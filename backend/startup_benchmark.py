@@ -0,0 +1,106 @@
+"""
+Cold-start benchmark of the backend: runs `python -X importtime -c "import app.main"`
+in fresh interpreters and reports the import time of app.main, the slowest packages
+and any heavy AI dependency imported at startup (they must stay lazy, see
+app/services/ai_service.py).
+
+    python startup_benchmark.py --runs 5 --budget-ms 2000 --json startup.json
+
+Exits with status 1 when the median exceeds --budget-ms or a heavy module is imported.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Imported on first use of the AI pipeline only
+HEAVY_MODULES = [
+    "ai.agent_manager", "chromadb", "langchain_experimental", "langchain_core",
+    "langdetect", "mistralai", "torch", "transformers", "numpy"
+]
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Returns (module, self_us, cumulative_us) for every line of -X importtime output.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def run_once(module: str) -> dict:
+    env = dict(os.environ)
+    # Startup must not need the AI credentials
+    env.pop("MISTRAL_API_KEY", None)
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    rows = parse_importtime(completed.stderr)
+    imported = {name for name, _, _ in rows}
+    by_package = Counter()
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    return {
+        "wall_ms": wall * 1000,
+        "import_ms": next((cum for name, _, cum in rows if name == module), 0) / 1000,
+        "packages_ms": {name: us / 1000 for name, us in by_package.items()},
+        "heavy_modules": [m for m in HEAVY_MODULES if m in imported],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backend cold-start import benchmark")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest packages to show")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail above this median import time")
+    parser.add_argument("--json", dest="json_path", default=None, help="write the results to this file")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    wall_ms = statistics.median(r["wall_ms"] for r in runs)
+    packages = Counter()
+    for r in runs:
+        packages.update(r["packages_ms"])
+    slowest = [(name, total / len(runs)) for name, total in packages.most_common(args.top)]
+    heavy = sorted({m for r in runs for m in r["heavy_modules"]})
+
+    print(f"import {args.module}: median {import_ms:.0f} ms (interpreter wall time {wall_ms:.0f} ms, {args.runs} runs)")
+    print("Slowest packages (self time):")
+    for name, ms in slowest:
+        print(f"  {name:<30} {ms:8.1f} ms")
+    if heavy:
+        print(f"Heavy modules imported at startup: {', '.join(heavy)}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "module": args.module, "runs": args.runs, "import_ms": import_ms, "wall_ms": wall_ms,
+                "slowest_packages_ms": dict(slowest), "heavy_modules": heavy
+            }, f, indent=2)
+
+    if heavy or (args.budget_ms is not None and import_ms > args.budget_ms):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
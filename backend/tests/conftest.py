@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests run from the backend directory or the repository root: `app` must be importable
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
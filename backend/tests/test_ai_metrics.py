@@ -0,0 +1,21 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import tickets
+from ai import pipeline_metrics
+from ai.rate_limiter import RateLimiter
+
+
+def test_ai_metrics_after_rate_limit_wait():
+    # A throttled Mistral call records a fractional wait
+    RateLimiter._record_wait(0.37)
+    pipeline_metrics.increment("llm_requests")
+
+    app = FastAPI()
+    app.include_router(tickets.router)
+    response = TestClient(app).get("/tickets/ai/metrics")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["counters"]["rate_limit_wait_ms"] >= 370
+    assert body["rates"]["rate_limit_wait_ms_per_request"] > 0